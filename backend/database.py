@@ -1,8 +1,9 @@
 import os
 import logging
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,21 +16,68 @@ logger = logging.getLogger(__name__)
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 SQLITE_FALLBACK = "sqlite:///./data/lextrace.db"
 
+# SQLite 生产配置（每个连接建立时执行）
+# WAL：读写互不阻塞；synchronous=NORMAL 在 WAL 下仅在检查点时 fsync，掉电最多丢失最后几个事务但不会损坏
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))  # 等待写锁的时间，超时才报 "database is locked"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "32768"))  # 每个连接的页缓存
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# 默认不限制溢出连接（SQLite 连接很廉价）：同步路由在线程中执行，已执行完但尚未序列化/清理的请求仍占着连接，
+# 连接池有上限时，占满线程池的请求都在等连接，持有连接的请求却等不到线程，会互相卡死到 pool_timeout
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "-1"))
+
+# PostgreSQL 连接池（每个 worker 进程一个池）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 秒；避免使用被 Supabase/pgbouncer 回收的空闲连接
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # SQLite 默认不执行外键约束，ON DELETE CASCADE 需要每个连接单独开启
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+    cursor.close()
+
 def create_db_engine(url: str):
     """根据数据库类型创建引擎"""
     if url.startswith("sqlite"):
-        return create_engine(
-            url, 
-            connect_args={"check_same_thread": False}
-        )
+        if _is_memory_sqlite(url):
+            # 内存数据库只存在于单个连接中，保留 SQLAlchemy 默认的连接池
+            engine = create_engine(url, connect_args={"check_same_thread": False})
+        else:
+            # 文件数据库：连接池复用连接（pragma 与页缓存随连接保留），busy_timeout 同时交给驱动
+            engine = create_engine(
+                url,
+                poolclass=QueuePool,
+                pool_size=SQLITE_POOL_SIZE,
+                max_overflow=SQLITE_MAX_OVERFLOW,
+                connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+            )
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+        return engine
     else:
         # PostgreSQL (Supabase) 配置
         return create_engine(
             url,
-            pool_size=5,
-            max_overflow=10,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
             pool_pre_ping=True,
-            connect_args={"connect_timeout": 10}
+            connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}
         )
 
 def get_working_engine():
@@ -72,6 +120,66 @@ def get_db():
     finally:
         db.close()
 
+# 异步引擎：连接同步引擎最终选定的数据库（SQLite 用 aiosqlite，PostgreSQL 用 asyncpg）。
+# 读多写少、以 I/O 为主的接口用它，等待数据库时不占用线程池；首次使用时才创建，工具脚本不需要异步驱动。
+_async_engine = None
+_async_sessionmaker = None
+
+def create_async_db_engine(url):
+    """按同步引擎的 URL 创建对应的异步引擎"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    if url.get_backend_name() == "sqlite":
+        async_url = url.set(drivername="sqlite+aiosqlite")
+        if _is_memory_sqlite(str(url)):
+            async_engine = create_async_engine(async_url)
+        else:
+            async_engine = create_async_engine(
+                async_url,
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=SQLITE_POOL_SIZE,
+                max_overflow=SQLITE_MAX_OVERFLOW,
+                connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+            )
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return async_engine
+
+    # asyncpg 不识别 libpq 的 sslmode 参数，改为 ssl 连接参数
+    connect_args = {"timeout": DB_CONNECT_TIMEOUT}
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        connect_args["ssl"] = sslmode
+        url = url.difference_update_query(["sslmode"])
+    return create_async_engine(
+        url.set(drivername="postgresql+asyncpg"),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args=connect_args
+    )
+
+def get_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_engine = create_async_db_engine(engine.url)
+        # 提交后不过期属性：异步会话中访问过期属性会触发隐式 I/O
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
 def get_db_info():
     """返回当前数据库连接信息"""
     url = str(engine.url)
@@ -0,0 +1,159 @@
+import os
+import json
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# AI 结果缓存配置
+# 缓存存放在数据库中，因此重启后仍然有效，并且多个 worker 共享同一份缓存
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+
+
+def make_cache_key(kind: str, model: str, template_version: str, payload: Any) -> str:
+    """
+    根据 (分析类型, 模型, 提示词模板版本, 规范化后的输入) 生成内容寻址的缓存键。
+    payload 以排序键、紧凑分隔符的 JSON 序列化，保证相同输入得到相同的键。
+    """
+    normalized = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha256()
+    for part in (kind, model, template_version, normalized):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def get_cached(key: str) -> Optional[Dict[str, Any]]:
+    """
+    读取缓存结果，过期条目视为未命中。命中时更新访问时间和命中次数（用于 LRU 淘汰）。
+    """
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        entry = db.query(models.AICacheEntry).filter(models.AICacheEntry.key == key).first()
+        if not entry:
+            return None
+
+        now = datetime.utcnow()
+        if entry.created_at and entry.created_at < now - timedelta(seconds=AI_CACHE_TTL_SECONDS):
+            db.delete(entry)
+            db.commit()
+            return None
+
+        entry.last_accessed_at = now
+        entry.hit_count = (entry.hit_count or 0) + 1
+        db.commit()
+        return json.loads(entry.result)
+    except Exception as e:
+        db.rollback()
+        print(f"AI cache read failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def set_cached(key: str, kind: str, model: str, result: Dict[str, Any]) -> None:
+    """
+    写入（或覆盖）缓存结果，并执行 TTL 与容量淘汰。
+    """
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.merge(models.AICacheEntry(
+            key=key,
+            kind=kind,
+            model=model,
+            result=json.dumps(result, ensure_ascii=False),
+            created_at=now,
+            last_accessed_at=now,
+            hit_count=0,
+        ))
+        db.commit()
+        _evict(db)
+    except Exception as e:
+        # 并发写入同一键等情况下直接放弃本次写入，不影响主流程
+        db.rollback()
+        print(f"AI cache write failed: {e}")
+    finally:
+        db.close()
+
+
+def _evict(db) -> None:
+    """
+    删除过期条目；若条目数仍超过上限，按最近访问时间淘汰最旧的条目。
+    """
+    import models
+
+    expire_before = datetime.utcnow() - timedelta(seconds=AI_CACHE_TTL_SECONDS)
+    db.query(models.AICacheEntry).filter(
+        models.AICacheEntry.created_at < expire_before
+    ).delete(synchronize_session=False)
+
+    total = db.query(models.AICacheEntry).count()
+    overflow = total - AI_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale_keys = [
+            row.key for row in db.query(models.AICacheEntry.key)
+            .order_by(models.AICacheEntry.last_accessed_at)
+            .limit(overflow)
+        ]
+        db.query(models.AICacheEntry).filter(
+            models.AICacheEntry.key.in_(stale_keys)
+        ).delete(synchronize_session=False)
+
+    db.commit()
+
+
+async def lookup_cached(key: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    在线程池中读取缓存，命中时返回附带 "cached": True 的结果。缓存关闭或 refresh=True 时直接返回 None。
+    """
+    if not AI_CACHE_ENABLED or refresh:
+        return None
+    cached = await asyncio.to_thread(get_cached, key)
+    return dict(cached, cached=True) if cached is not None else None
+
+
+async def store_cached(key: str, kind: str, model: str, result: Dict[str, Any]) -> None:
+    """
+    在线程池中写入缓存；缓存关闭时跳过，带 "partial": True 的部分结果不缓存。
+    """
+    if AI_CACHE_ENABLED and not result.get("partial"):
+        await asyncio.to_thread(set_cached, key, kind, model, result)
+
+
+async def cached_ai_call(
+    kind: str,
+    model: str,
+    template_version: str,
+    payload: Any,
+    compute: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    refresh: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    先查缓存，未命中（或 refresh=True 强制刷新）时 await compute() 并写入缓存。
+    数据库读写在线程池中执行，不阻塞事件循环。
+    compute() 返回 None 表示调用失败，失败结果不会被缓存；带 "partial": True 的部分结果同样不缓存。
+    返回值附带 "cached" 字段，标记结果是否来自缓存。
+    """
+    key = make_cache_key(kind, model, template_version, payload)
+    cached = await lookup_cached(key, refresh)
+    if cached is not None:
+        return cached
+
+    result = await compute()
+    if result is None:
+        return None
+
+    await store_cached(key, kind, model, result)
+    return dict(result, cached=False)
@@ -1,17 +1,33 @@
 import os
+import re
 import json
+import asyncio
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
 from dotenv import load_dotenv
+from lib.ai_cache import cached_ai_call, lookup_cached, make_cache_key, store_cached
+from lib.prompt_builder import build_change_batches, compact_evolution, estimate_tokens, to_prompt_json
+from lib.prescreen import prescreen_changes
+from lib.llm_client import LLMClient, LLMUnavailableError
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+# 可通过 AI_BASE_URL 指向任意 OpenAI 兼容服务（例如本地 stub 服务器）
+OPENROUTER_BASE_URL = os.getenv("AI_BASE_URL", "https://openrouter.ai/api/v1")
 
 # 默认使用的模型
-DEFAULT_MODEL = "google/gemini-2.0-flash-001"
+DEFAULT_MODEL = os.getenv("DEFAULT_AI_MODEL", "google/gemini-2.0-flash-001")
 
+# 提示词模板版本：修改下方 prompt 内容时需要递增，使旧的缓存结果失效
+DIFF_ANALYSIS_PROMPT_VERSION = "diff-v2"
+CLAUSE_EVOLUTION_PROMPT_VERSION = "evolution-v2"
+CLAUSE_EVOLUTION_BATCH_PROMPT_VERSION = "evolution-batch-v1"
+
+# 大变更集分批分析：单个请求的 token 预算（超出时切分批次或截断）与最大并发请求数
+AI_BATCH_TOKEN_BUDGET = int(os.getenv("AI_BATCH_TOKEN_BUDGET", "6000"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+
+# 共享的异步模型客户端（超时、舱壁、重试、熔断），未配置有效 API Key 时为 None
 client = None
 # 检查 API Key 是否有效（非空、非占位符、仅包含 ASCII 字符）
 def _is_valid_api_key(key: str) -> bool:
@@ -26,35 +42,131 @@ def _is_valid_api_key(key: str) -> bool:
         return False
 
 if _is_valid_api_key(OPENROUTER_API_KEY):
-    client = OpenAI(
+    client = LLMClient(
         base_url=OPENROUTER_BASE_URL,
         api_key=OPENROUTER_API_KEY,
     )
 
-def analyze_diffs(diffs: List[Dict[str, Any]]) -> Dict[str, Any]:
+
+# 变更分析累计的 token 报告（单次分析的报告随结果返回，见 _finalize_analysis）
+_token_totals = {"analyses": 0, "raw_tokens": 0, "prompt_tokens": 0, "saved_tokens": 0, "truncated_items": 0, "requests": 0}
+
+
+def get_ai_metrics() -> Dict[str, Any]:
+    """返回模型客户端的熔断器状态、舱壁占用、调用统计与累计的提示词 token 数。"""
+    if not client:
+        return {"configured": False}
+    return dict(client.metrics(), configured=True, model=DEFAULT_MODEL, prompt_tokens=dict(_token_totals))
+
+
+def _record_token_report(token_report: Dict[str, Any]) -> None:
+    _token_totals["analyses"] += 1
+    for name, value in token_report.items():
+        _token_totals[name] = _token_totals.get(name, 0) + value
+
+
+async def analyze_diffs(diffs: List[Dict[str, Any]], refresh: bool = False, chunked: bool = False) -> Dict[str, Any]:
     """
     Analyzes a list of clause diffs using AI to generate a summary and risk assessment.
-    Returns: { "summary": str, "risk_assessments": { clause_id: { risk, reason } } }
+    Results are cached by input content; pass refresh=True to bypass the cache.
+    Cosmetic changes (renumbering, renaming, whitespace/punctuation) are assessed locally by
+    lib.prescreen and never sent to the model; numeric deltas are reported under "prescreen".
+    Only the changed spans (with bounded context) are sent to the model, see lib.prompt_builder.
+    Large change sets (or chunked=True) are split into token-budgeted batches that are
+    analyzed concurrently; failed batches are reported instead of failing the whole analysis.
+    Returns: { "summary": str, "risk_assessments": { clause_id: { risk, reason } }, "cached": bool,
+               "partial": bool, "failed_batches": int, "token_report": dict, "prescreen": dict }
     """
-    if not OPENROUTER_API_KEY:
-        return {
-            "summary": "AI API Key not configured.",
+    plan = _plan_diff_analysis(diffs, chunked)
+    if "result" in plan:
+        return plan["result"]
+
+    batches = plan["batches"]
+    if plan["chunked"]:
+        compute = lambda: _analyze_batches(batches, AI_MAX_CONCURRENCY)
+    else:
+        compute = lambda: _request_diff_analysis(batches[0])
+
+    result = await cached_ai_call(
+        kind="diff_analysis",
+        model=DEFAULT_MODEL,
+        template_version=plan["template_version"],
+        payload=batches,
+        compute=compute,
+        refresh=refresh,
+    )
+    return _finalize_analysis(result, plan)
+
+
+def _finalize_analysis(result: Optional[Dict[str, Any]], plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    合并模型结果与本地预筛结果，并附加 token 报告与预筛报告。result 为 None 表示模型调用失败。
+    """
+    if result is None:
+        result = {
+            "summary": "AI analysis failed.",
             "risk_assessments": {}
         }
+    return dict(
+        result,
+        risk_assessments={**plan["local_assessments"], **(result.get("risk_assessments") or {})},
+        token_report=plan["token_report"],
+        prescreen=plan["prescreen"],
+    )
+
+
+def _plan_diff_analysis(diffs: List[Dict[str, Any]], chunked: bool = False) -> Dict[str, Any]:
+    """
+    准备一次变更分析：过滤变更、压缩并切分批次。
+    无需调用模型时返回 {"result": ...}；否则返回
+    {"batches", "token_report", "chunked", "template_version", "local_assessments", "prescreen"}。
+    """
+    if not OPENROUTER_API_KEY or not client:
+        return {"result": {
+            "summary": "AI API Key not configured.",
+            "risk_assessments": {}
+        }}
 
     # Filter only modified/added/deleted clauses to save tokens
     changes = [d for d in diffs if d['type'] in ('added', 'modified', 'deleted')]
     
     if not changes:
-        return {
+        return {"result": {
             "summary": "No significant changes detected.",
             "risk_assessments": {}
-        }
+        }}
+
+    # 本地规则预筛：纯编号/标题/格式调整不发送给模型
+    changes, local_assessments, prescreen_report = prescreen_changes(changes)
+    if not changes:
+        return {"result": {
+            "summary": f"本次修订仅涉及 {len(local_assessments)} 处编号、标题或格式调整，无实质性内容变更。",
+            "risk_assessments": local_assessments,
+            "prescreen": prescreen_report
+        }}
+
+    batches, token_report = build_change_batches(changes, AI_BATCH_TOKEN_BUDGET)
+    _record_token_report(token_report)
+
+    chunked = chunked or len(batches) > 1
+    return {
+        "batches": batches,
+        "token_report": token_report,
+        "chunked": chunked,
+        "template_version": f"{DIFF_ANALYSIS_PROMPT_VERSION}+chunked" if chunked else DIFF_ANALYSIS_PROMPT_VERSION,
+        "local_assessments": local_assessments,
+        "prescreen": prescreen_report,
+    }
+
 
-    prompt = f"""
-    你是一位法律专家AI。请分析以下合同变更内容：
+def _build_diff_analysis_prompt(changes: List[Dict[str, Any]]) -> str:
+    """
+    changes 为 prompt_builder.compact_change 压缩后的变更条目。
+    """
+    return f"""
+    你是一位法律专家AI。请分析以下合同变更内容（spans 中 old/new 为变化片段及其上下文）：
     
-    {json.dumps(changes, indent=2, ensure_ascii=False)}
+    {to_prompt_json(changes)}
     
     任务 1：生成一份简明的变更执行摘要（最多3句话）。
     任务 2：针对每一项变更，评估风险等级（高、中、低）并提供非常简短的理由。
@@ -68,35 +180,272 @@ def analyze_diffs(diffs: List[Dict[str, Any]]) -> Dict[str, Any]:
     }}
     """
 
+
+def _diff_analysis_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "你是一位乐于助人的法律助手。"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def _request_diff_analysis(changes: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    调用模型分析变更，失败时返回 None（不写入缓存）。
+    """
+    prompt = _build_diff_analysis_prompt(changes)
+
     try:
-        response = client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=[
-                {"role": "system", "content": "你是一位乐于助人的法律助手。"},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-        )
-        
-        result = json.loads(response.choices[0].message.content)
+        result = await client.chat_json(_diff_analysis_messages(prompt), model=DEFAULT_MODEL)
         
         return {
             "summary": result.get("summary", "AI analysis completed."),
             "risk_assessments": result.get("risk_assessments", {})
         }
 
+    except LLMUnavailableError as e:
+        print(f"AI Analysis skipped: {e}")
+        return None
     except Exception as e:
         print(f"AI Analysis failed: {e}")
-        return {
-            "summary": "AI analysis failed.",
-            "risk_assessments": {}
-        }
+        return None
+
+
+async def _analyze_batches(batches: List[List[Dict[str, Any]]], concurrency: int) -> Optional[Dict[str, Any]]:
+    """
+    并发分析多个批次并返回合并结果（见 _stream_batches）。全部失败时返回 None。
+    """
+    result = None
+    async for event in _stream_batches(batches, concurrency):
+        if event["event"] == "result":
+            result = event["data"]
+    return result
+
+
+async def _merge_batch_summaries(summaries: List[str]) -> str:
+    """
+    将各批次摘要合并为一份总体摘要；调用失败时直接拼接各批次摘要。
+    """
+    if not summaries:
+        return ""
+
+    prompt = f"""以下是同一份合同变更按批次分析得到的多段摘要：
+
+{to_prompt_json(summaries)}
+
+请将它们合并为一份简明的变更执行摘要（最多3句话）。输出 JSON 格式：{{"summary": "..."}}
+"""
+    try:
+        merged = (await client.chat_json(_diff_analysis_messages(prompt), model=DEFAULT_MODEL)).get("summary")
+        if merged:
+            return merged
+    except Exception as e:
+        print(f"AI summary merge failed: {e}")
+    return " ".join(summaries)
+
+
+class _StreamingAnalysisParser:
+    """
+    增量解析模型流式输出的分析 JSON：
+    - summary 字段的字符串内容随到随发
+    - risk_assessments 中每个条款的评估对象完整后立即发出
+    """
+
+    _SUMMARY_RE = re.compile(r'"summary"\s*:\s*"')
+    _RISKS_RE = re.compile(r'"risk_assessments"\s*:\s*\{')
+
+    def __init__(self):
+        self.buffer = ""
+        self.summary_sent = 0
+        self.risk_pos = None
+        self.risks_done = False
+        self.decoder = json.JSONDecoder()
 
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.buffer += chunk
+        events = []
 
-def analyze_clause_evolution(
+        summary_delta = self._summary_delta()
+        if summary_delta:
+            events.append({"event": "summary", "data": {"text": summary_delta}})
+
+        for clause_id, assessment in self._new_risks():
+            events.append({"event": "risk", "data": {"clause_id": clause_id, **assessment}})
+
+        return events
+
+    def _summary_delta(self) -> str:
+        match = self._SUMMARY_RE.search(self.buffer)
+        if not match:
+            return ""
+
+        # 找到字符串中可以安全解码的最长前缀（不截断转义序列）
+        start = match.end()
+        i = start
+        safe_end = start
+        while i < len(self.buffer):
+            ch = self.buffer[i]
+            if ch == '\\':
+                step = 6 if self.buffer[i + 1:i + 2] == 'u' else 2
+                if i + step > len(self.buffer):
+                    break
+                i += step
+            elif ch == '"':
+                break
+            else:
+                i += 1
+            safe_end = i
+
+        try:
+            decoded = json.loads('"' + self.buffer[start:safe_end] + '"')
+        except ValueError:
+            return ""
+
+        delta = decoded[self.summary_sent:]
+        self.summary_sent = len(decoded)
+        return delta
+
+    def _new_risks(self):
+        if self.risks_done:
+            return
+        if self.risk_pos is None:
+            match = self._RISKS_RE.search(self.buffer)
+            if not match:
+                return
+            self.risk_pos = match.end()
+
+        while True:
+            pos = self.risk_pos
+            while pos < len(self.buffer) and self.buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(self.buffer):
+                return
+            if self.buffer[pos] == '}':
+                self.risks_done = True
+                return
+            try:
+                clause_id, pos = self.decoder.raw_decode(self.buffer, pos)
+                while pos < len(self.buffer) and self.buffer[pos] in ' \t\r\n:':
+                    pos += 1
+                assessment, pos = self.decoder.raw_decode(self.buffer, pos)
+            except ValueError:
+                # 当前条目尚未完整到达，等待更多数据
+                return
+            self.risk_pos = pos
+            if isinstance(assessment, dict):
+                yield clause_id, assessment
+
+
+async def stream_diff_analysis(diffs: List[Dict[str, Any]], refresh: bool = False):
+    """
+    analyze_diffs 的流式版本，逐个产出事件 {"event": name, "data": dict}：
+        meta    - token 报告与本地预筛报告
+        summary - 摘要文本增量
+        risk    - 单个条款的风险评估 {clause_id, risk, reason}
+        result  - 完整的合并结果（与 analyze_diffs 返回值一致）
+    缓存命中时直接产出 result。多批次时按批次完成顺序产出 risk 事件。
+    """
+    plan = _plan_diff_analysis(diffs)
+    if "result" in plan:
+        yield {"event": "result", "data": plan["result"]}
+        return
+
+    batches = plan["batches"]
+    yield {"event": "meta", "data": {"token_report": plan["token_report"], "prescreen": plan["prescreen"]}}
+    for clause_id, assessment in plan["local_assessments"].items():
+        yield {"event": "risk", "data": {"clause_id": clause_id, **assessment}}
+
+    key = make_cache_key("diff_analysis", DEFAULT_MODEL, plan["template_version"], batches)
+    cached = await lookup_cached(key, refresh)
+    if cached is not None:
+        yield {"event": "result", "data": _finalize_analysis(cached, plan)}
+        return
+
+    result = None
+    try:
+        if plan["chunked"]:
+            async for event in _stream_batches(batches, AI_MAX_CONCURRENCY):
+                if event["event"] == "result":
+                    result = event["data"]
+                else:
+                    yield event
+        else:
+            parser = _StreamingAnalysisParser()
+            stream = client.stream_text(
+                _diff_analysis_messages(_build_diff_analysis_prompt(batches[0])),
+                model=DEFAULT_MODEL,
+            )
+            async for delta in stream:
+                for event in parser.feed(delta):
+                    yield event
+
+            parsed = json.loads(parser.buffer)
+            result = {
+                "summary": parsed.get("summary", "AI analysis completed."),
+                "risk_assessments": parsed.get("risk_assessments", {})
+            }
+    except Exception as e:
+        print(f"AI Analysis stream failed: {e}")
+
+    if result is None:
+        yield {"event": "result", "data": _finalize_analysis(None, plan)}
+        return
+
+    await store_cached(key, "diff_analysis", DEFAULT_MODEL, result)
+    yield {"event": "result", "data": _finalize_analysis(dict(result, cached=False), plan)}
+
+
+async def _stream_batches(batches: List[List[Dict[str, Any]]], concurrency: int):
+    """
+    并发分析多个批次（最多 concurrency 个同时进行），每个批次完成后立即产出其 risk 事件；
+    最后由各批次摘要（按批次顺序）生成总体摘要，产出 summary 与合并后的 result 事件。
+    部分批次失败时保留成功批次的结果并标记 partial；全部失败时不产出 result。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_batch(index: int, batch: List[Dict[str, Any]]):
+        async with semaphore:
+            try:
+                return index, await client.chat_json(
+                    _diff_analysis_messages(_build_diff_analysis_prompt(batch)),
+                    model=DEFAULT_MODEL,
+                )
+            except Exception as e:
+                print(f"AI Analysis batch {index + 1}/{len(batches)} failed: {e}")
+                return index, None
+
+    summaries = {}
+    risk_assessments = {}
+    failed_batches = 0
+    for future in asyncio.as_completed([run_batch(i, b) for i, b in enumerate(batches)]):
+        index, batch_result = await future
+        if batch_result is None:
+            failed_batches += 1
+            continue
+        if batch_result.get("summary"):
+            summaries[index] = batch_result["summary"]
+        for clause_id, assessment in (batch_result.get("risk_assessments") or {}).items():
+            risk_assessments[clause_id] = assessment
+            yield {"event": "risk", "data": {"clause_id": clause_id, **assessment}}
+
+    if failed_batches == len(batches):
+        return
+
+    ordered = [summaries[index] for index in sorted(summaries)]
+    summary = ordered[0] if len(ordered) == 1 else await _merge_batch_summaries(ordered)
+    yield {"event": "summary", "data": {"text": summary}}
+    yield {"event": "result", "data": {
+        "summary": summary or "AI analysis completed.",
+        "risk_assessments": risk_assessments,
+        "partial": failed_batches > 0,
+        "failed_batches": failed_batches,
+    }}
+
+
+async def analyze_clause_evolution(
     clause_id: str,
     clause_path: List[str],
-    version_changes: List[Dict[str, Any]]
+    version_changes: List[Dict[str, Any]],
+    refresh: bool = False
 ) -> Dict[str, Any]:
     """
     分析条款在多个版本中的演变，生成 AI 总结。
@@ -108,6 +457,7 @@ def analyze_clause_evolution(
             - versionNumber: 版本号
             - content: 该版本的条款内容
             - changeFromPrev: 与上一版本的变化 {type, summary}
+        refresh: 为 True 时跳过缓存，强制重新调用模型
     
     返回:
         {
@@ -120,32 +470,43 @@ def analyze_clause_evolution(
         # 回退到基于规则的简单总结
         return _generate_fallback_summary(version_changes)
     
-    # 过滤出有变化的版本
-    changes_with_content = []
-    for vc in version_changes:
-        if vc.get('content'):
-            change_info = {
-                "版本号": f"V{vc['versionNumber']}",
-                "内容": vc['content'][:500] if vc['content'] else "(无内容)",  # 限制长度
-            }
-            if vc.get('changeFromPrev'):
-                change_info["变化类型"] = vc['changeFromPrev'].get('type', 'unknown')
-                change_info["变化摘要"] = vc['changeFromPrev'].get('summary', '')
-            changes_with_content.append(change_info)
+    # 过滤出有内容的版本；首个版本发送全文，之后只发送相对上一版本的变化片段
+    changes_with_content = compact_evolution(version_changes)
     
     if not changes_with_content:
         return _generate_fallback_summary(version_changes)
     
     clause_path_str = " > ".join(clause_path) if clause_path else clause_id
-    
+
+    result = await cached_ai_call(
+        kind="clause_evolution",
+        model=DEFAULT_MODEL,
+        template_version=CLAUSE_EVOLUTION_PROMPT_VERSION,
+        payload={"clause": clause_path_str, "clauseId": clause_id, "changes": changes_with_content},
+        compute=lambda: _request_clause_evolution(clause_id, clause_path_str, changes_with_content),
+        refresh=refresh,
+    )
+    if result is None:
+        return _generate_fallback_summary(version_changes)
+    return result
+
+
+async def _request_clause_evolution(
+    clause_id: str,
+    clause_path_str: str,
+    changes_with_content: List[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    调用模型分析条款演变，失败时返回 None（不写入缓存）。
+    """
     prompt = f"""你是一位资深法律顾问，正在审查合同条款的多版本演变历史。
 
 ## 条款信息
 - 条款路径: {clause_path_str}
 - 条款 ID: {clause_id}
 
-## 各版本内容演变
-{json.dumps(changes_with_content, indent=2, ensure_ascii=False)}
+## 各版本内容演变（"变化" 中 old/new 为相对上一版本的变化片段及其上下文）
+{to_prompt_json(changes_with_content)}
 
 ## 任务
 请分析该条款在各版本中的演变，输出 JSON 格式：
@@ -163,31 +524,121 @@ def analyze_clause_evolution(
 """
 
     try:
-        response = client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=[
+        result = await client.chat_json(
+            [
                 {"role": "system", "content": "你是一位专业的法律顾问，擅长合同审查和风险分析。请用中文回复。"},
                 {"role": "user", "content": prompt}
             ],
-            response_format={"type": "json_object"},
+            model=DEFAULT_MODEL,
         )
         
-        result = json.loads(response.choices[0].message.content)
-        
         return {
             "oneLiner": result.get("oneLiner", "条款经历了多次修改"),
             "evolutionSummary": result.get("evolutionSummary", "该条款在多个版本中有所调整。"),
             "riskNotes": result.get("riskNotes")
         }
 
+    except LLMUnavailableError as e:
+        # 熔断打开或舱壁已满：直接走规则降级，不等待上游
+        print(f"Clause evolution analysis skipped: {e}")
+        return None
     except Exception as e:
         print(f"Clause evolution analysis failed: {e}")
-        return _generate_fallback_summary(version_changes)
+        return None
+
+
+async def analyze_clause_evolution_batch(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    批量分析多个条款的演变，按 token 预算把多个条款打包进同一个请求，并发发送。
+    
+    参数:
+        items: [{"clause_id", "clause_path", "version_changes"}]，version_changes 格式同 analyze_clause_evolution
+    
+    返回:
+        {clause_id: {"oneLiner", "evolutionSummary", "riskNotes"}}；失败批次中的条款不在结果中
+    """
+    if not OPENROUTER_API_KEY or not client:
+        return {}
+
+    # 压缩并按 token 预算打包
+    batches = []
+    current = []
+    current_tokens = 0
+    for item in items:
+        versions = compact_evolution(item["version_changes"])
+        if not versions:
+            continue
+        entry = {
+            "clause_id": item["clause_id"],
+            "条款路径": " > ".join(item.get("clause_path") or []) or item["clause_id"],
+            "各版本": versions,
+        }
+        tokens = estimate_tokens(to_prompt_json(entry))
+        if current and current_tokens + tokens > AI_BATCH_TOKEN_BUDGET:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(entry)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+
+    semaphore = asyncio.Semaphore(max(1, AI_MAX_CONCURRENCY))
+
+    async def run_batch(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        prompt = f"""你是一位资深法律顾问，正在审查同一份合同中多个条款的多版本演变历史。
+
+## 各条款的版本演变（"变化" 中 old/new 为相对上一版本的变化片段及其上下文）
+{to_prompt_json(batch)}
+
+## 任务
+请逐个分析每个条款在各版本中的演变，输出 JSON 格式，clauses 的键为输入中的 clause_id：
+
+{{
+    "clauses": {{
+        "clause_id": {{
+            "oneLiner": "用一句话概括该条款的主要变化趋势（最多30字）",
+            "evolutionSummary": "详细分析各版本的关键变更点，说明变化的方向和影响（100-200字）",
+            "riskNotes": "如果发现潜在风险点，请指出；如果没有明显风险，返回 null"
+        }}
+    }}
+}}
+
+注意：
+1. 重点关注数字、比例、金额、期限等实质性变化
+2. 分析变化对合同双方权益的影响
+3. 如果条款变化幅度大或涉及关键权益，务必在 riskNotes 中提醒
+"""
+        async with semaphore:
+            result = await client.chat_json(
+                [
+                    {"role": "system", "content": "你是一位专业的法律顾问，擅长合同审查和风险分析。请用中文回复。"},
+                    {"role": "user", "content": prompt}
+                ],
+                model=DEFAULT_MODEL,
+            )
+        return result.get("clauses") or {}
+
+    results = await asyncio.gather(*(run_batch(b) for b in batches), return_exceptions=True)
+
+    summaries = {}
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            print(f"Clause evolution batch {index + 1}/{len(batches)} failed: {result}")
+            continue
+        for clause_id, summary in result.items():
+            if isinstance(summary, dict) and summary.get("oneLiner"):
+                summaries[clause_id] = {
+                    "oneLiner": summary.get("oneLiner"),
+                    "evolutionSummary": summary.get("evolutionSummary", "该条款在多个版本中有所调整。"),
+                    "riskNotes": summary.get("riskNotes")
+                }
+    return summaries
 
 
 def _generate_fallback_summary(version_changes: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    当 AI 不可用时，生成基于规则的简单总结。
+    当 AI 不可用时，生成基于规则的简单总结（带 "source": "rule" 标记，不会被持久化）。
     """
     total_versions = len(version_changes)
     modified_count = sum(
@@ -199,17 +650,20 @@ def _generate_fallback_summary(version_changes: List[Dict[str, Any]]) -> Dict[st
         return {
             "oneLiner": "本条款在所有版本中保持稳定",
             "evolutionSummary": f"该条款在 {total_versions} 个版本中未发生实质性变化，内容保持一致。",
-            "riskNotes": None
+            "riskNotes": None,
+            "source": "rule"
         }
     elif modified_count <= 2:
         return {
             "oneLiner": f"本条款经历了 {modified_count} 次小幅调整",
             "evolutionSummary": f"该条款在 {total_versions} 个版本中有 {modified_count} 次修改，整体保持稳定。",
-            "riskNotes": None
+            "riskNotes": None,
+            "source": "rule"
         }
     else:
         return {
             "oneLiner": f"本条款变化频繁，共修改 {modified_count} 次",
             "evolutionSummary": f"该条款在 {total_versions} 个版本中经历了 {modified_count} 次修改，变化较为频繁，建议仔细审查各版本变更内容。",
-            "riskNotes": "条款变化频繁，建议关注各版本的具体修改内容。"
+            "riskNotes": "条款变化频繁，建议关注各版本的具体修改内容。",
+            "source": "rule"
         }
@@ -0,0 +1,229 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+import models
+from lib.uploads import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, ZIP_SIGNATURE
+from lib.blob_refs import place_blob, rendered_html_for, store_blob
+from lib.worker_pool import detect_date, map_ordered, render_html
+
+# 每个数据库事务创建的版本数（同时也是一次提交给进程池识别日期/渲染的文件数）
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "100"))
+# 允许通过接口按服务器路径导入的目录（为空时只能上传压缩包）
+IMPORT_ROOT = os.getenv("IMPORT_ROOT", "")
+# 上传的压缩包大小上限（字节，默认 2GB）
+IMPORT_MAX_ARCHIVE_BYTES = int(os.getenv("IMPORT_MAX_ARCHIVE_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+IMPORT_STAGING_DIR = os.path.join("uploads", "imports")
+
+# progress(stage, done, total)：stage 为 extract / dates / versions，total 未知时为 None
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+
+
+def _is_document(name: str) -> bool:
+    base = os.path.basename(name)
+    return (
+        base.lower().endswith(".docx")
+        and not base.startswith(("~$", "."))  # Word 锁文件、隐藏文件
+        and "__MACOSX" not in name.split("/")
+    )
+
+
+def _natural_key(name: str) -> List[Any]:
+    # "v2" 排在 "v10" 之前
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def resolve_import_source(source_path: str) -> str:
+    """
+    校验接口传入的服务器路径必须位于 IMPORT_ROOT 之内。
+    """
+    if not IMPORT_ROOT:
+        raise PermissionError("Server-side imports are disabled (IMPORT_ROOT is not set)")
+    root = os.path.realpath(IMPORT_ROOT)
+    path = os.path.realpath(os.path.join(root, source_path))
+    if os.path.commonpath([root, path]) != root:
+        raise PermissionError("Import path is outside IMPORT_ROOT")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Import path not found: {source_path}")
+    return path
+
+
+def iter_source_documents(source_path: str) -> Iterator[Tuple[str, Callable[[], BinaryIO]]]:
+    """
+    逐个产出 (文件名, 打开函数)。source_path 可以是 zip 压缩包或目录；
+    压缩包只读取中央目录，每个条目在打开时才解压，不会整体载入内存。
+    """
+    if os.path.isdir(source_path):
+        names = []
+        for dirpath, _, filenames in os.walk(source_path):
+            for filename in filenames:
+                names.append(os.path.relpath(os.path.join(dirpath, filename), source_path).replace(os.sep, "/"))
+        for name in sorted(names, key=_natural_key):
+            if _is_document(name):
+                path = os.path.join(source_path, name)
+                yield name, lambda path=path: open(path, "rb")
+        return
+
+    if not zipfile.is_zipfile(source_path):
+        raise ValueError("Import source must be a zip archive or a directory")
+    with zipfile.ZipFile(source_path) as archive:
+        infos = [info for info in archive.infolist() if not info.is_dir() and _is_document(info.filename)]
+        for info in sorted(infos, key=lambda i: _natural_key(i.filename)):
+            yield info.filename, lambda info=info: archive.open(info)
+
+
+def _copy_hashed(src: BinaryIO, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    分块复制并计算 sha256；不是 DOCX（zip 签名）或超过大小上限时抛出 ValueError。
+    """
+    sha = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = src.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if size == 0 and not chunk.startswith(ZIP_SIGNATURE):
+                raise ValueError("not a valid DOCX document")
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"exceeds the {max_bytes} byte upload limit")
+            sha.update(chunk)
+            out.write(chunk)
+    if size == 0:
+        raise ValueError("empty file")
+    return sha.hexdigest()
+
+
+def _created_at(detected_date: Optional[str]) -> datetime:
+    # 与 batch-commit 相同：识别出的日期按 UTC 零点保存
+    if detected_date:
+        dt = datetime.fromisoformat(detected_date)
+        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def _stage_documents(source_path: str, staging_dir: str, progress: ProgressCallback):
+    staged, errors = [], []
+    for index, (name, opener) in enumerate(iter_source_documents(source_path)):
+        dest_path = os.path.join(staging_dir, f"{index}.docx")
+        try:
+            with opener() as src:
+                sha256 = _copy_hashed(src, dest_path)
+        except (ValueError, OSError, zipfile.BadZipFile) as e:
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            errors.append({"filename": name, "error": str(e)})
+            continue
+        staged.append({"filename": name, "path": dest_path, "sha256": sha256, "detected_date": None})
+        progress("extract", len(staged), None)
+    return staged, errors
+
+
+def _detect_dates(staged: List[Dict[str, Any]], progress: ProgressCallback) -> None:
+    for start in range(0, len(staged), IMPORT_BATCH_SIZE):
+        chunk = staged[start:start + IMPORT_BATCH_SIZE]
+        for item, (detected_date, error) in zip(chunk, map_ordered(detect_date, [i["path"] for i in chunk])):
+            item["detected_date"] = detected_date
+            if error:
+                print(f"Date detection failed for {item['filename']}: {error}")
+        progress("dates", start + len(chunk), len(staged))
+
+
+def _create_versions(db: Session, contract_id: int, staged: List[Dict[str, Any]], progress: ProgressCallback):
+    """
+    按顺序分批创建版本，每批一个事务。与上一版本内容完全相同的文件跳过（与单个上传的 409 规则一致）。
+    """
+    last_version = db.query(models.Version.version_number, models.Version.sha256).filter(
+        models.Version.contract_id == contract_id
+    ).order_by(models.Version.version_number.desc()).first()
+    next_version_number = (last_version.version_number + 1) if last_version else 1
+    prev_sha256 = last_version.sha256 if last_version else None
+
+    created, skipped = [], []
+    for start in range(0, len(staged), IMPORT_BATCH_SIZE):
+        batch = []
+        for item in staged[start:start + IMPORT_BATCH_SIZE]:
+            if item["sha256"] == prev_sha256:
+                skipped.append({"filename": item["filename"], "reason": "identical to the previous version"})
+                os.remove(item["path"])
+                continue
+            prev_sha256 = item["sha256"]
+            batch.append(item)
+
+        # 已渲染过的内容直接复用 HTML，其余在进程池中渲染
+        known_html = {item["sha256"]: rendered_html_for(db, item["sha256"]) for item in batch}
+        to_render = [item["path"] for item in batch if known_html[item["sha256"]] is None]
+        rendered = iter(map_ordered(render_html, to_render))
+
+        for item in batch:
+            html_content = known_html[item["sha256"]]
+            if html_content is None:
+                html_content, error = next(rendered)
+                if error:
+                    print(f"HTML rendering failed for {item['filename']}: {error}")
+                    html_content = "<p>Error rendering document.</p>"
+
+            filename = os.path.basename(item["filename"])
+            db.add(models.Version(
+                contract_id=contract_id,
+                version_number=next_version_number,
+                file_path=store_blob(db, item["path"], item["sha256"]),
+                original_filename=filename,
+                sha256=item["sha256"],
+                commit_message=f"Imported: {item['filename']}",
+                html_content=html_content,
+                created_at=_created_at(item["detected_date"])
+            ))
+            created.append(next_version_number)
+            next_version_number += 1
+
+        db.commit()
+        for item in batch:
+            place_blob(item["path"], item["sha256"])
+        progress("versions", len(created) + len(skipped), len(staged))
+
+    return created, skipped
+
+
+def import_documents(db: Session, contract_id: int, source_path: str,
+                     progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """
+    从 zip 压缩包或目录导入一个合同的完整历史：
+    1. 逐个条目流式解压到暂存目录（同时计算 sha256、校验格式与大小）
+    2. 在进程池中分批识别日期，按日期（其次文件名）排序
+    3. 分批渲染 HTML、存入 blob 存储并创建版本，每批一个事务
+    条款索引、谱系与 AI 总结由调用方在导入后排队处理。
+    """
+    progress = progress or (lambda stage, done, total: None)
+    staging_dir = os.path.join(IMPORT_STAGING_DIR, uuid.uuid4().hex)
+    os.makedirs(staging_dir, exist_ok=True)
+    try:
+        staged, errors = _stage_documents(source_path, staging_dir, progress)
+        _detect_dates(staged, progress)
+        staged.sort(key=lambda item: (item["detected_date"] or "", _natural_key(item["filename"])))
+        created, skipped = _create_versions(db, contract_id, staged, progress)
+
+        if created:
+            db.add(models.OperationLog(
+                contract_id=contract_id,
+                action="import_versions",
+                details=f"Imported v{created[0]}-v{created[-1]} ({len(created)} versions)"
+            ))
+            db.commit()
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return {
+        "created": len(created),
+        "first_version": created[0] if created else None,
+        "last_version": created[-1] if created else None,
+        "skipped": skipped,
+        "errors": errors,
+    }
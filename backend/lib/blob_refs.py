@@ -0,0 +1,169 @@
+import os
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal
+from lib.blob_store import blob_ref, blob_sha256, get_blob_store
+
+
+def _hash_file(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _upsert_statement(db: Session):
+    """SQLite 与 PostgreSQL 都支持 INSERT ... ON CONFLICT，并发上传同一内容时计数不会丢失。"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(models.Blob)
+
+
+def store_blob(db: Session, src_path: str, sha256: Optional[str] = None) -> str:
+    """
+    登记 src_path 的内容：blob 引用计数 +1，返回写入 Version.file_path 的 blob 引用。
+    计数随调用方的事务一起提交；文件此时不动，调用方在 commit 成功之后再用 place_blob 放入存储，
+    回滚（例如并发上传抢占了版本号）时不会在存储中留下无人引用的文件。
+    """
+    if sha256 is None:
+        sha256 = _hash_file(src_path)
+    size = os.path.getsize(src_path)
+
+    stmt = _upsert_statement(db).values(sha256=sha256, size=size, ref_count=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Blob.sha256],
+        set_={"ref_count": models.Blob.ref_count + 1}
+    )
+    db.execute(stmt)
+    return blob_ref(sha256)
+
+
+# 放入文件与清理文件互斥：purge_files 在锁内复查引用并删除，提交后放入的文件不会被并发的清理删掉
+_files_lock = threading.Lock()
+
+
+def place_blob(src_path: str, sha256: str) -> None:
+    """
+    store_blob 所在事务提交之后调用：把文件存入 blob 存储（src_path 会被移走）；
+    内容已存在时丢弃 src_path，刚被清理掉时重新写入。
+    """
+    with _files_lock:
+        get_blob_store().put_file(src_path, sha256)
+
+
+# 批量查询/更新时每条语句携带的 blob 数量上限（SQLite 绑定参数个数有限制）
+_CHUNK = 500
+
+
+def _chunks(items: List[str]) -> Iterable[List[str]]:
+    for i in range(0, len(items), _CHUNK):
+        yield items[i:i + _CHUNK]
+
+
+def _release_counts(db: Session, counts: Dict[str, int]) -> List[str]:
+    """
+    按 {file_path: 引用次数} 扣减 blob 引用计数，删除计数归零的 blob 记录。
+    每个 blob 一次 UPDATE（executemany），与待删除的版本数量无关。
+    """
+    legacy = [path for path in counts if blob_sha256(path) is None]
+    decrements = {}
+    for path, n in counts.items():
+        sha256 = blob_sha256(path)
+        if sha256 is not None:
+            decrements[sha256] = decrements.get(sha256, 0) + n
+    if not decrements:
+        return legacy
+
+    blobs = models.Blob.__table__
+    db.connection().execute(
+        update(blobs).where(blobs.c.sha256 == bindparam("b_sha256")).values(ref_count=blobs.c.ref_count - bindparam("b_count")),
+        [{"b_sha256": sha256, "b_count": n} for sha256, n in decrements.items()]
+    )
+    orphaned = []
+    for chunk in _chunks(list(decrements)):
+        criteria = (models.Blob.sha256.in_(chunk), models.Blob.ref_count <= 0)
+        orphaned.extend(row.sha256 for row in db.query(models.Blob.sha256).filter(*criteria))
+        db.query(models.Blob).filter(*criteria).delete(synchronize_session=False)
+    return legacy + [blob_ref(sha256) for sha256 in orphaned]
+
+
+def release_files(db: Session, file_paths: Iterable[Optional[str]]) -> List[str]:
+    """
+    版本删除前调用：每个文件对应的 blob 引用计数 -1。返回提交后需要清理的文件（计数归零的 blob 引用，或旧版路径），
+    调用方在 commit 之后把返回值交给 purge_files。
+    """
+    return _release_counts(db, Counter(path for path in file_paths if path))
+
+
+def release_versions(db: Session, *criteria) -> List[str]:
+    """
+    删除合同/项目前调用：按条件选出的所有版本释放其文件。引用次数在数据库中按 file_path 聚合，
+    不逐行读取版本。返回值同 release_files。
+    """
+    rows = db.query(models.Version.file_path, func.count(models.Version.id)).filter(
+        models.Version.file_path.isnot(None), *criteria
+    ).group_by(models.Version.file_path)
+    return _release_counts(db, {file_path: n for file_path, n in rows})
+
+
+def purge_files(db: Session, file_paths: Iterable[Optional[str]]) -> None:
+    """
+    删除已提交事务中不再被引用的内容。引用复查与删除在同一把锁内进行：blob 在此期间被重新上传时，
+    要么复查时已能看到提交的记录而跳过，要么上传方的 place_blob 等到删除完成后重新写入。
+    """
+    store = get_blob_store()
+    paths = [path for path in file_paths if path]
+    for file_path in paths:
+        if blob_sha256(file_path) is None:
+            try:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            except Exception as e:
+                print(f"Error deleting file {file_path}: {e}")
+
+    shas = [sha256 for sha256 in map(blob_sha256, paths) if sha256]
+    for chunk in _chunks(shas):
+        with _files_lock:
+            # 结束之前的读事务，复查读到的是最新提交的引用
+            db.rollback()
+            referenced = {row.sha256 for row in db.query(models.Blob.sha256).filter(models.Blob.sha256.in_(chunk))}
+            for sha256 in chunk:
+                if sha256 in referenced:
+                    continue
+                try:
+                    store.delete(sha256)
+                except Exception as e:
+                    print(f"Error deleting file {blob_ref(sha256)}: {e}")
+
+
+def purge_files_task(file_paths: List[str]) -> None:
+    """
+    后台任务版本（删除大项目时可能有上万个文件）：使用独立会话，在响应返回之后执行。
+    """
+    if not file_paths:
+        return
+    db = SessionLocal()
+    try:
+        purge_files(db, file_paths)
+    finally:
+        db.close()
+
+
+def rendered_html_for(db: Session, sha256: str) -> Optional[str]:
+    """
+    同一内容（任意合同）已渲染过的 HTML；渲染失败的占位内容不复用。
+    """
+    row = db.query(models.Version.html_content).filter(
+        models.Version.sha256 == sha256,
+        models.Version.html_content.isnot(None),
+        models.Version.html_content != "<p>Error rendering document.</p>"
+    ).first()
+    return row.html_content if row else None
@@ -0,0 +1,251 @@
+import os
+import shutil
+import uuid
+import threading
+from typing import BinaryIO, Optional
+
+# 存储后端：local（本地分片目录）或 s3（S3 兼容对象存储）
+BLOB_STORE = os.getenv("BLOB_STORE", "local")
+# 本地后端的根目录
+BLOB_ROOT = os.getenv("BLOB_ROOT", os.path.join("uploads", "blobs"))
+# S3 后端：桶、键前缀、endpoint（MinIO 等兼容服务）
+BLOB_S3_BUCKET = os.getenv("BLOB_S3_BUCKET", "")
+BLOB_S3_PREFIX = os.getenv("BLOB_S3_PREFIX", "blobs/")
+BLOB_S3_ENDPOINT_URL = os.getenv("BLOB_S3_ENDPOINT_URL") or None
+# 设置后 S3 后端使用本地目录模拟对象存储（开发/测试用，不需要 boto3）
+BLOB_S3_LOCAL_ROOT = os.getenv("BLOB_S3_LOCAL_ROOT", "")
+# S3 后端解析/渲染文档前把对象下载到本地的缓存目录（内容寻址，缓存永不过期）
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", os.path.join("uploads", "blob-cache"))
+
+# Version.file_path 中的 blob 引用前缀；不带前缀的是旧版按文件名保存的路径
+BLOB_REF_PREFIX = "blob:"
+
+
+def blob_ref(sha256: str) -> str:
+    return f"{BLOB_REF_PREFIX}{sha256}"
+
+
+def blob_sha256(ref: Optional[str]) -> Optional[str]:
+    """blob 引用中的内容哈希；旧路径返回 None。"""
+    if ref and ref.startswith(BLOB_REF_PREFIX):
+        return ref[len(BLOB_REF_PREFIX):]
+    return None
+
+
+def _shard(sha256: str) -> str:
+    # 两级分片目录，避免单个目录中文件过多
+    return os.path.join(sha256[:2], sha256[2:4], sha256)
+
+
+def _atomic_move(src_path: str, dest_path: str) -> None:
+    """
+    先移动（跨设备时复制）到目标目录下的临时文件，再原子重命名为最终文件名，
+    读者不会看到写了一半的 blob。
+    """
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    temp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.replace(src_path, temp_path)
+    except OSError:
+        shutil.copyfile(src_path, temp_path)
+        os.remove(src_path)
+    os.replace(temp_path, dest_path)
+
+
+class BlobStore:
+    """
+    内容寻址的文档存储接口：blob 以 sha256 为键，写入后不可变。
+    """
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def put_file(self, src_path: str, sha256: str) -> None:
+        """把 src_path 存为 sha256 对应的 blob（src_path 会被移走或删除）；已存在时直接丢弃 src_path。"""
+        raise NotImplementedError
+
+    def open(self, sha256: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def local_path(self, sha256: str) -> str:
+        """供 python-docx 等需要文件路径的解析器使用的本地路径。"""
+        raise NotImplementedError
+
+    def delete(self, sha256: str) -> None:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """
+    本地文件系统后端：root/ab/cd/<sha256>。
+    """
+
+    def __init__(self, root: str = BLOB_ROOT):
+        self.root = root
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.root, _shard(sha256))
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self._path(sha256))
+
+    def put_file(self, src_path: str, sha256: str) -> None:
+        if self.exists(sha256):
+            os.remove(src_path)
+            return
+        _atomic_move(src_path, self._path(sha256))
+
+    def open(self, sha256: str) -> BinaryIO:
+        return open(self._path(sha256), "rb")
+
+    def local_path(self, sha256: str) -> str:
+        return self._path(sha256)
+
+    def delete(self, sha256: str) -> None:
+        try:
+            os.remove(self._path(sha256))
+        except FileNotFoundError:
+            pass
+
+
+class ObjectNotFound(Exception):
+    """LocalObjectClient 找不到对象时抛出，结构与 botocore 的 ClientError 一致。"""
+
+    def __init__(self, key: str):
+        super().__init__(f"Object not found: {key}")
+        self.response = {"Error": {"Code": "404"}}
+
+
+class LocalObjectClient:
+    """
+    S3 客户端的本地替身：实现 S3BlobStore 用到的 boto3 方法子集，对象保存在 root/<bucket>/<key>。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ObjectNotFound(Key)
+        return {"ContentLength": os.path.getsize(path)}
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str) -> None:
+        dest_path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        temp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(Filename, temp_path)
+        os.replace(temp_path, dest_path)
+
+    def download_file(self, Bucket: str, Key: str, Filename: str) -> None:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ObjectNotFound(Key)
+        shutil.copyfile(path, Filename)
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ObjectNotFound(Key)
+        return {"Body": open(path, "rb"), "ContentLength": os.path.getsize(path)}
+
+    def delete_object(self, Bucket: str, Key: str) -> None:
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+
+
+def _is_not_found(error: Exception) -> bool:
+    code = str(getattr(error, "response", {}).get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3BlobStore(BlobStore):
+    """
+    S3 兼容对象存储后端。client 是 boto3 S3 客户端或任何实现相同方法的对象（如 LocalObjectClient）。
+    解析/渲染需要本地文件时下载到 cache_dir，按内容寻址，下载一次后一直有效。
+    """
+
+    def __init__(self, client, bucket: str, prefix: str = BLOB_S3_PREFIX, cache_dir: str = BLOB_CACHE_DIR):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+
+    def _key(self, sha256: str) -> str:
+        return f"{self.prefix}{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def exists(self, sha256: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(sha256))
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    def put_file(self, src_path: str, sha256: str) -> None:
+        if not self.exists(sha256):
+            self.client.upload_file(Filename=src_path, Bucket=self.bucket, Key=self._key(sha256))
+        # 刚上传的文件直接作为本地缓存，避免随后的解析/渲染再下载一次
+        cached_path = os.path.join(self.cache_dir, _shard(sha256))
+        if os.path.exists(cached_path):
+            os.remove(src_path)
+        else:
+            _atomic_move(src_path, cached_path)
+
+    def open(self, sha256: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(sha256))["Body"]
+
+    def local_path(self, sha256: str) -> str:
+        cached_path = os.path.join(self.cache_dir, _shard(sha256))
+        if not os.path.exists(cached_path):
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            temp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+            self.client.download_file(Bucket=self.bucket, Key=self._key(sha256), Filename=temp_path)
+            os.replace(temp_path, cached_path)
+        return cached_path
+
+    def delete(self, sha256: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(sha256))
+        try:
+            os.remove(os.path.join(self.cache_dir, _shard(sha256)))
+        except FileNotFoundError:
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _build_store() -> BlobStore:
+    if BLOB_STORE == "s3":
+        if BLOB_S3_LOCAL_ROOT:
+            client = LocalObjectClient(BLOB_S3_LOCAL_ROOT)
+        else:
+            import boto3
+            client = boto3.client("s3", endpoint_url=BLOB_S3_ENDPOINT_URL)
+        return S3BlobStore(client, BLOB_S3_BUCKET or "lextrace")
+    return LocalBlobStore()
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = _build_store()
+        return _store
+
+
+def resolve_path(file_path: Optional[str]) -> Optional[str]:
+    """
+    把 Version.file_path 解析为可直接打开的本地路径：blob 引用交给存储后端，旧路径原样返回。
+    """
+    sha256 = blob_sha256(file_path)
+    if sha256 is None:
+        return file_path
+    return get_blob_store().local_path(sha256)
@@ -0,0 +1,122 @@
+from typing import List, Dict, Any, Optional, Tuple
+from lib.smart_diff import calculate_similarity
+
+
+class ClauseTracker:
+    """
+    跟踪单个条款在连续版本中的状态，按版本顺序调用 record 生成 version_states。
+    """
+
+    def __init__(self, clause_id: str):
+        self.clause_id = clause_id
+        self.prev_content = None
+        self.clause_path = []
+        self.version_states = []
+
+    def record(self, index: int, version, matching_clause: Optional[Dict[str, Any]]):
+        # Determine status and change info
+        if matching_clause:
+            content = matching_clause['text']
+            preview = content[:100] + ('...' if len(content) > 100 else '')
+
+            # Build clause path
+            if not self.clause_path:
+                parts = []
+                if matching_clause.get('number'):
+                    parts.append(matching_clause['number'])
+                if matching_clause.get('title'):
+                    parts.append(matching_clause['title'])
+                self.clause_path = [' '.join(parts)] if parts else [f"条款 {self.clause_id}"]
+
+            self.version_states.append({
+                "versionId": version.id,
+                "versionNumber": version.version_number,
+                "createdAt": version.created_at.isoformat(),
+                "status": "exists",
+                "content": content,
+                "preview": preview,
+                "changeFromPrev": describe_change(self.prev_content, content) if index > 0 else None
+            })
+
+            self.prev_content = content
+        else:
+            # Clause doesn't exist in this version
+            change_from_prev = None
+            if index > 0 and self.prev_content:
+                change_from_prev = {
+                    "type": "deleted",
+                    "summary": "本版本删除此条款"
+                }
+
+            self.version_states.append({
+                "versionId": version.id,
+                "versionNumber": version.version_number,
+                "createdAt": version.created_at.isoformat(),
+                "status": "not_exists",
+                "content": None,
+                "preview": "（本版本不包含此条款）",
+                "changeFromPrev": change_from_prev
+            })
+
+            self.prev_content = None
+
+
+def describe_change(prev_content: Optional[str], content: str) -> Dict[str, str]:
+    """
+    描述条款相对上一版本的变化 {type, summary}。
+    """
+    if prev_content is None:
+        return {
+            "type": "added",
+            "summary": "本版本新增此条款"
+        }
+    if content == prev_content:
+        return {
+            "type": "unchanged",
+            "summary": "无变化"
+        }
+
+    # Generate change summary
+    similarity = calculate_similarity(prev_content, content)
+    if similarity > 0.95:
+        summary = "细微调整"
+    elif similarity > 0.8:
+        summary = "部分内容修改"
+    else:
+        summary = "重大内容变更"
+
+    # Try to detect specific changes
+    if len(content) > len(prev_content) * 1.5:
+        summary = "新增大量内容"
+    elif len(content) < len(prev_content) * 0.7:
+        summary = "删减部分内容"
+
+    return {
+        "type": "modified",
+        "summary": summary
+    }
+
+
+def version_changes_for_ai(version_states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    从 version_states 中提取 AI 演变分析所需的数据。
+    """
+    return [
+        {
+            "versionNumber": vs["versionNumber"],
+            "content": vs["content"],
+            "changeFromPrev": vs.get("changeFromPrev")
+        }
+        for vs in version_states
+    ]
+
+
+def changed_clause_ids(histories: Dict[str, Tuple[List[str], List[Dict[str, Any]]]]) -> List[str]:
+    """
+    返回历史中至少发生过一次新增/修改/删除的条款 ID。
+    """
+    changed = []
+    for clause_id, (_, states) in histories.items():
+        if any((s.get("changeFromPrev") or {}).get("type") in ("added", "modified", "deleted") for s in states):
+            changed.append(clause_id)
+    return changed
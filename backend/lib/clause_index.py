@@ -0,0 +1,219 @@
+import hashlib
+from typing import List, Dict, Any, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer
+import models
+from lib.doc_parser import extract_clauses
+
+# 返回给条款树的字段
+INDEX_FIELDS = ("has_changes", "change_type", "risk_level", "version_count", "first_version", "last_modified_version")
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def apply_version(
+    clause_info: Dict[str, Dict[str, Any]],
+    clauses: List[Dict[str, Any]],
+    version_number: int
+) -> None:
+    """
+    把一个版本的条款并入索引（只与上一个已索引版本比较）。
+    clause_info: {clause_id: {has_changes, change_type, risk_level, version_count, first_version,
+                              last_modified_version, present, text_hash}}，原地更新。
+    """
+    current = {c['id']: _text_hash(c['text']) for c in clauses}
+    prev = {clause_id: info['text_hash'] for clause_id, info in clause_info.items() if info['present']}
+
+    for clause_id, text_hash in current.items():
+        if clause_id not in clause_info:
+            clause_info[clause_id] = {
+                'has_changes': False,
+                'change_type': 'unchanged',
+                'risk_level': 'none',
+                'version_count': 0,
+                'first_version': version_number,
+                'last_modified_version': None,
+            }
+
+        info = clause_info[clause_id]
+        info['version_count'] += 1
+
+        # Check for changes from previous version
+        if prev:
+            prev_hash = prev.get(clause_id)
+            if prev_hash is None:
+                # Clause was added in this version
+                info['has_changes'] = True
+                info['change_type'] = 'added'
+                info['last_modified_version'] = version_number
+                info['first_version'] = version_number
+            elif prev_hash != text_hash:
+                # Clause was modified
+                info['has_changes'] = True
+                if info['change_type'] == 'unchanged':
+                    info['change_type'] = 'modified'
+                info['last_modified_version'] = version_number
+
+        info['present'] = True
+        info['text_hash'] = text_hash
+
+    # Check for deleted clauses
+    for prev_id in prev:
+        if prev_id not in current:
+            info = clause_info[prev_id]
+            info['has_changes'] = True
+            info['change_type'] = 'deleted'
+            info['last_modified_version'] = version_number
+            info['present'] = False
+            info['text_hash'] = None
+
+
+def _parse(version) -> Optional[List[Dict[str, Any]]]:
+    if not version.file_path:
+        return None
+    try:
+        return extract_clauses(version.file_path)
+    except Exception as e:
+        print(f"Error extracting clauses from version {version.id}: {e}")
+        return None
+
+
+def _load(db: Session, contract_id: int) -> Dict[str, Dict[str, Any]]:
+    rows = db.query(models.ClauseIndexEntry).filter(models.ClauseIndexEntry.contract_id == contract_id).all()
+    return {
+        row.clause_id: {
+            'has_changes': row.has_changes,
+            'change_type': row.change_type,
+            'risk_level': row.risk_level,
+            'version_count': row.version_count,
+            'first_version': row.first_version,
+            'last_modified_version': row.last_modified_version,
+            'present': row.present,
+            'text_hash': row.text_hash,
+        }
+        for row in rows
+    }
+
+
+def _save(db: Session, contract_id: int, clause_info: Dict[str, Dict[str, Any]], version, version_count: int) -> None:
+    """
+    写回索引与索引状态。出现并发写入冲突时放弃本次结果，下次读取会发现状态过期并重建。
+    """
+    try:
+        existing = {
+            row.clause_id: row
+            for row in db.query(models.ClauseIndexEntry).filter(models.ClauseIndexEntry.contract_id == contract_id)
+        }
+        for clause_id, info in clause_info.items():
+            row = existing.pop(clause_id, None)
+            if row is None:
+                row = models.ClauseIndexEntry(contract_id=contract_id, clause_id=clause_id)
+                db.add(row)
+            for key, value in info.items():
+                setattr(row, key, value)
+        for row in existing.values():
+            db.delete(row)
+
+        state = db.query(models.ClauseIndexState).filter(models.ClauseIndexState.contract_id == contract_id).first()
+        if state is None:
+            state = models.ClauseIndexState(contract_id=contract_id)
+            db.add(state)
+        state.version_id = version.id if version else None
+        state.version_number = version.version_number if version else None
+        state.version_count = version_count
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def rebuild_clause_index(db: Session, contract_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    从头重建合同的条款索引（首次访问、删除版本或索引过期时使用）。
+    """
+    # 解析只需要文件路径，不加载整份 HTML
+    versions = db.query(models.Version).options(defer(models.Version.html_content)).filter(
+        models.Version.contract_id == contract_id
+    ).order_by(models.Version.version_number).all()
+
+    clause_info = {}
+    for version in versions:
+        clauses = _parse(version)
+        if clauses is None:
+            continue
+        apply_version(clause_info, clauses, version.version_number)
+
+    _save(db, contract_id, clause_info, versions[-1] if versions else None, len(versions))
+    return clause_info
+
+
+def update_clause_index(db: Session, contract_id: int, version) -> None:
+    """
+    新版本上传后增量更新索引：只解析新版本并与上一个已索引版本比较。
+    索引不是截至前一个版本的最新状态时退回到全量重建。
+    """
+    state = db.query(models.ClauseIndexState).filter(models.ClauseIndexState.contract_id == contract_id).first()
+    previous_id = db.query(models.Version.id).filter(
+        models.Version.contract_id == contract_id,
+        models.Version.version_number < version.version_number
+    ).order_by(models.Version.version_number.desc()).limit(1).scalar()
+
+    if previous_id is None:
+        up_to_date = state is None or state.version_count == 0
+    else:
+        up_to_date = state is not None and state.version_id == previous_id
+
+    if not up_to_date:
+        rebuild_clause_index(db, contract_id)
+        return
+
+    clause_info = _load(db, contract_id)
+    clauses = _parse(version)
+    if clauses is not None:
+        apply_version(clause_info, clauses, version.version_number)
+    _save(db, contract_id, clause_info, version, (state.version_count if state else 0) + 1)
+
+
+def get_clause_index(db: Session, contract_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    读取条款状态索引 {clause_id: {has_changes, change_type, risk_level, version_count,
+    first_version, last_modified_version}}。只查询索引表，开销与版本数量无关；
+    索引缺失或与当前版本不一致时（例如旧数据、写入冲突）重建一次。
+    """
+    latest_id = db.query(models.Version.id).filter(
+        models.Version.contract_id == contract_id
+    ).order_by(models.Version.version_number.desc()).limit(1).scalar()
+    if latest_id is None:
+        return {}
+
+    version_count = db.query(func.count(models.Version.id)).filter(
+        models.Version.contract_id == contract_id
+    ).scalar()
+    state = db.query(models.ClauseIndexState).filter(models.ClauseIndexState.contract_id == contract_id).first()
+
+    if state is None or state.version_id != latest_id or state.version_count != version_count:
+        clause_info = rebuild_clause_index(db, contract_id)
+    else:
+        clause_info = _load(db, contract_id)
+
+    return {
+        clause_id: {key: info[key] for key in INDEX_FIELDS}
+        for clause_id, info in clause_info.items()
+    }
+
+
+def rebuild_clause_index_task(contract_id: int) -> None:
+    """
+    后台任务入口：使用独立的数据库会话重建索引（请求会话在响应后已关闭）。
+    """
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rebuild_clause_index(db, contract_id)
+    except Exception as e:
+        print(f"Clause index rebuild failed for contract {contract_id}: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,298 @@
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session, defer
+import models
+from lib.doc_parser import extract_clauses
+from lib.smart_diff import match_clauses
+from lib.clause_history import ClauseTracker
+
+
+def stored_clauses(db: Session, version_id: int) -> List[Dict[str, Any]]:
+    """
+    从谱系表还原某个版本的条款列表（match_clauses 所需字段），无需重新解析 DOCX。
+    """
+    rows = db.query(models.ClauseLineage).filter(
+        models.ClauseLineage.version_id == version_id,
+        models.ClauseLineage.clause_id.isnot(None)
+    ).order_by(models.ClauseLineage.id).all()
+    return [
+        {"id": r.clause_id, "number": r.number, "title": r.title, "body": r.body, "text": r.content,
+         "indent": r.indent or 0}
+        for r in rows
+    ]
+
+
+def build_version_lineage(db: Session, contract_id: int, version, prev_version=None) -> int:
+    """
+    为一个版本建立谱系：解析该版本，与上一版本（从谱系表还原）做 match_clauses，
+    每个条款记录其在上一版本中的匹配条款；上一版本中未匹配的条款记录为删除。
+    返回写入的条款数。
+    """
+    try:
+        clauses = extract_clauses(version.file_path) if version.file_path else []
+    except Exception as e:
+        print(f"Error extracting clauses from version {version.id}: {e}")
+        clauses = []
+
+    prev_clauses = stored_clauses(db, prev_version.id) if prev_version else []
+
+    db.query(models.ClauseLineage).filter(models.ClauseLineage.version_id == version.id).delete()
+    db.query(models.ClauseLineageState).filter(models.ClauseLineageState.version_id == version.id).delete()
+
+    diffs = match_clauses(prev_clauses, clauses)
+    # match_clauses 按新版本条款顺序为每个条款产出一项，之后追加删除项
+    for clause, diff in zip(clauses, diffs):
+        db.add(models.ClauseLineage(
+            contract_id=contract_id,
+            version_id=version.id,
+            version_number=version.version_number,
+            clause_id=clause['id'],
+            prev_version_id=prev_version.id if prev_version and diff.get("old_clause_id") else None,
+            prev_clause_id=diff.get("old_clause_id"),
+            change_type=diff["change_type"],
+            similarity=diff.get("similarity", 0.0),
+            number=clause.get('number'),
+            title=clause.get('title'),
+            body=clause.get('body'),
+            content=clause['text'],
+            indent=clause.get('indent', 0)
+        ))
+    for diff in diffs[len(clauses):]:
+        db.add(models.ClauseLineage(
+            contract_id=contract_id,
+            version_id=version.id,
+            version_number=version.version_number,
+            clause_id=None,
+            prev_version_id=prev_version.id,
+            prev_clause_id=diff["clause_id"],
+            change_type="deleted",
+            similarity=0.0
+        ))
+
+    db.add(models.ClauseLineageState(
+        version_id=version.id,
+        contract_id=contract_id,
+        prev_version_id=prev_version.id if prev_version else None,
+        clause_count=len(clauses)
+    ))
+    db.commit()
+    return len(clauses)
+
+
+def ensure_contract_lineage(db: Session, contract_id: int) -> None:
+    """
+    按版本顺序补建缺失或过期的谱系（旧数据、上传时失败、或上一版本被删除后匹配对象已变化）。
+    谱系完整时只有两次索引查询。
+    """
+    # 只需要 id、版本号与文件路径，不加载整份 HTML
+    versions = db.query(models.Version).options(defer(models.Version.html_content)).filter(
+        models.Version.contract_id == contract_id
+    ).order_by(models.Version.version_number).all()
+    states = {
+        s.version_id: s
+        for s in db.query(models.ClauseLineageState).filter(models.ClauseLineageState.contract_id == contract_id)
+    }
+
+    prev_version = None
+    stale = False
+    for version in versions:
+        state = states.get(version.id)
+        expected_prev = prev_version.id if prev_version else None
+        # 上一版本的谱系被重建后，其条款 ID 可能变化，后续版本也需要重建
+        if stale or state is None or state.prev_version_id != expected_prev:
+            build_version_lineage(db, contract_id, version, prev_version)
+            stale = True
+        prev_version = version
+
+
+def rebuild_lineage_task(contract_id: int) -> None:
+    """
+    后台任务入口：删除版本后修复谱系（使用独立的数据库会话）。
+    """
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        ensure_contract_lineage(db, contract_id)
+    except Exception as e:
+        print(f"Clause lineage rebuild failed for contract {contract_id}: {e}")
+    finally:
+        db.close()
+
+
+def _row_clause(row) -> Dict[str, Any]:
+    return {"id": row.clause_id, "number": row.number, "title": row.title, "text": row.content}
+
+
+def _index_rows(rows) -> Tuple[Dict, Dict, Dict]:
+    """
+    为内存中的链追踪建立索引，rows 需按 id 排序（同一键取最早的一行，与逐行查询的结果一致）：
+    (version_id, clause_id) -> 行；(prev_version_id, prev_clause_id) -> 后继行；clause_id -> 最新版本中的行。
+    """
+    by_key = {}
+    successors = {}
+    latest = {}
+    for row in rows:
+        by_key.setdefault((row.version_id, row.clause_id), row)
+        if row.prev_clause_id is not None:
+            successors.setdefault((row.prev_version_id, row.prev_clause_id), row)
+        if row.clause_id not in latest or row.version_number > latest[row.clause_id].version_number:
+            latest[row.clause_id] = row
+    return by_key, successors, latest
+
+
+def _walk_chain(anchor, by_key: Dict, successors: Dict) -> Dict[int, Any]:
+    """从锚点向前沿 prev_clause_id 回溯、向后沿后继条款追踪，返回 {version_id: 行}。"""
+    chain = {anchor.version_id: anchor}
+    row = anchor
+    while row.prev_clause_id is not None:
+        row = by_key.get((row.prev_version_id, row.prev_clause_id))
+        if row is None:
+            break
+        chain[row.version_id] = row
+    row = anchor
+    while True:
+        row = successors.get((row.version_id, row.clause_id))
+        if row is None:
+            break
+        chain[row.version_id] = row
+    return chain
+
+
+def walk_lineage(db: Session, contract_id: int, clause_id: str, from_version: Optional[int] = None,
+                 to_version: Optional[int] = None) -> Dict[int, Any]:
+    """
+    沿谱系链追踪条款：以范围内最新一次出现该 clause_id 的行为锚点，
+    向前沿 prev_clause_id 回溯，向后查找以其为匹配对象的条款。
+    每一步是一次索引查询（ix_clause_lineage_clause / ix_clause_lineage_prev），只读取链上的行，
+    与合同的条款总数无关。
+    返回 {version_id: ClauseLineage 行}。
+    """
+    def in_range(number: int) -> bool:
+        return (from_version is None or number >= from_version) and (to_version is None or number <= to_version)
+
+    query = db.query(models.ClauseLineage).filter(
+        models.ClauseLineage.contract_id == contract_id,
+        models.ClauseLineage.clause_id == clause_id
+    )
+    if from_version:
+        query = query.filter(models.ClauseLineage.version_number >= from_version)
+    if to_version:
+        query = query.filter(models.ClauseLineage.version_number <= to_version)
+    anchor = query.order_by(models.ClauseLineage.version_number.desc()).first()
+    if anchor is None:
+        return {}
+
+    chain = {anchor.version_id: anchor}
+
+    row = anchor
+    while row.prev_clause_id is not None and row.prev_version_id is not None:
+        row = db.query(models.ClauseLineage).filter(
+            models.ClauseLineage.contract_id == contract_id,
+            models.ClauseLineage.clause_id == row.prev_clause_id,
+            models.ClauseLineage.version_id == row.prev_version_id
+        ).order_by(models.ClauseLineage.id).first()
+        if row is None or not in_range(row.version_number):
+            break
+        chain[row.version_id] = row
+
+    row = anchor
+    while True:
+        row = db.query(models.ClauseLineage).filter(
+            models.ClauseLineage.prev_version_id == row.version_id,
+            models.ClauseLineage.prev_clause_id == row.clause_id,
+            models.ClauseLineage.clause_id.isnot(None)
+        ).order_by(models.ClauseLineage.id).first()
+        if row is None or not in_range(row.version_number):
+            break
+        chain[row.version_id] = row
+
+    return chain
+
+
+def lineage_history(db: Session, contract_id: int, clause_id: str, versions) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    由谱系链生成与逐版本解析相同格式的 (clause_path, version_states)。
+    versions: 范围内按版本号排序的版本（只需 id、version_number、created_at）。
+    """
+    if not versions:
+        return [], []
+    chain = walk_lineage(db, contract_id, clause_id, versions[0].version_number, versions[-1].version_number)
+
+    tracker = ClauseTracker(clause_id)
+    for i, version in enumerate(versions):
+        row = chain.get(version.id)
+        tracker.record(i, version, _row_clause(row) if row is not None else None)
+    return tracker.clause_path, tracker.version_states
+
+
+def blame_clause(db: Session, contract_id: int, clause_id: str, version_number: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    类似 git blame：找出条款当前文本最早出现的版本、条款首次出现的版本以及所有修改过它的版本。
+    """
+    chain = walk_lineage(db, contract_id, clause_id, to_version=version_number)
+    if not chain:
+        return None
+
+    rows = sorted(chain.values(), key=lambda r: r.version_number)
+    current = rows[-1]
+    introduced = current
+    for row in reversed(rows[:-1]):
+        if row.content != current.content:
+            break
+        introduced = row
+
+    return {
+        "clauseId": current.clause_id,
+        "versionNumber": current.version_number,
+        "content": current.content,
+        "textIntroducedIn": introduced.version_number,
+        "firstSeenIn": rows[0].version_number,
+        "firstSeenAs": rows[0].clause_id,
+        "modifications": [
+            {
+                "versionNumber": row.version_number,
+                "changeType": row.change_type,
+                "previousClauseId": row.prev_clause_id,
+                "similarity": row.similarity,
+            }
+            for row in rows[1:]
+            if row.change_type != "unchanged"
+        ],
+    }
+
+
+def lineage_histories(
+    db: Session,
+    contract_id: int,
+    clause_ids: Optional[List[str]],
+    versions
+) -> Dict[str, Tuple[List[str], List[Dict[str, Any]]]]:
+    """
+    批量版本的 lineage_history：一次查询读出范围内的谱系行，在内存中沿链追踪多个条款。
+    clause_ids 为 None 时返回范围内出现过的所有条款。
+    返回: {clause_id: (clause_path, version_states)}
+    """
+    if not versions:
+        return {}
+    version_ids = [v.id for v in versions]
+    rows = db.query(models.ClauseLineage).filter(
+        models.ClauseLineage.version_id.in_(version_ids),
+        models.ClauseLineage.clause_id.isnot(None)
+    ).order_by(models.ClauseLineage.id).all()
+
+    by_key, successors, latest = _index_rows(rows)
+
+    if clause_ids is None:
+        clause_ids = list(latest)
+
+    histories = {}
+    for clause_id in clause_ids:
+        anchor = latest.get(clause_id)
+        chain = _walk_chain(anchor, by_key, successors) if anchor is not None else {}
+
+        tracker = ClauseTracker(clause_id)
+        for i, version in enumerate(versions):
+            row = chain.get(version.id)
+            tracker.record(i, version, _row_clause(row) if row is not None else None)
+        histories[clause_id] = (tracker.clause_path, tracker.version_states)
+    return histories
@@ -0,0 +1,135 @@
+import json
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+import models
+
+# 单元格状态码（每个版本一列，每列的状态拼成一个字符串，每个字符对应一行条款）
+STATUS_CODES = {
+    "absent": ".",
+    "added": "A",
+    "unchanged": "=",
+    "modified": "M",
+    "renumbered": "R",
+    "renamed": "R",
+    "renumbered_and_renamed": "R",
+    "deleted": "D",
+}
+SHORT_HASH_LENGTH = 8
+
+
+def _short_hash(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:SHORT_HASH_LENGTH]
+
+
+def iter_clause_rows(db: Session, version_ids: List[int]) -> Iterator[Dict[str, Any]]:
+    """
+    按版本顺序遍历范围内所有版本的谱系行，逐行产出条款 × 版本矩阵。
+    行是沿谱系链连接起来的同一条款（以最后一次出现时的 clause_id 标识），列是版本。
+    行的顺序与读取顺序无关：先是出现在最后一个版本中的条款，按该版本的文档顺序；
+    再是此前已不再出现的条款（被删除或没有匹配），按最后出现的版本、其次在该版本中的文档顺序。
+    每行包含：
+    - status: 每列一个字符的状态码字符串
+    - hashColumns / hashes: 内容发生变化（或首次出现）的列及其短哈希
+    """
+    column_index = {version_id: i for i, version_id in enumerate(version_ids)}
+    width = len(version_ids)
+
+    rows = db.query(
+        models.ClauseLineage.version_id,
+        models.ClauseLineage.clause_id,
+        models.ClauseLineage.prev_version_id,
+        models.ClauseLineage.prev_clause_id,
+        models.ClauseLineage.change_type,
+        models.ClauseLineage.content
+    ).filter(
+        models.ClauseLineage.version_id.in_(version_ids)
+    ).order_by(models.ClauseLineage.version_number, models.ClauseLineage.id).yield_per(2000)
+
+    # chain id -> {"clause_id", "live": 最后一次出现的列, "order": 该列中的文档位置, "cells": {column: (code, hash or None)}}
+    open_chains = {}
+    finished = []  # 已不再出现的行，按结束的列排列
+    previous_at = {}  # 上一列中 clause_id -> chain id
+    current_at = {}  # 当前列中 clause_id -> chain id
+    current_column = 0
+    next_chain = 0
+
+    def finish_columns(until: int) -> None:
+        # 列 current_column .. until - 1 已读完：没有延续到这些列的行已经确定
+        nonlocal current_column, previous_at, current_at
+        while current_column < until:
+            ended = [c for c, chain in open_chains.items() if chain["live"] < current_column]
+            for chain_id in sorted(ended, key=lambda c: open_chains[c]["order"]):
+                finished.append(_row(open_chains.pop(chain_id), width))
+            previous_at, current_at = current_at, {}
+            current_column += 1
+
+    for order, row in enumerate(rows):
+        column = column_index[row.version_id]
+        finish_columns(column)
+
+        prev_chain = None
+        if column > 0 and row.prev_version_id == version_ids[column - 1] and row.prev_clause_id is not None:
+            prev_chain = previous_at.get(row.prev_clause_id)
+
+        if row.clause_id is None:
+            # 删除记录：标记在删除发生的版本列
+            if prev_chain is not None:
+                open_chains[prev_chain]["cells"][column] = (STATUS_CODES["deleted"], None)
+            continue
+
+        if prev_chain is None or row.clause_id in current_at:
+            chain_id = next_chain
+            next_chain += 1
+            open_chains[chain_id] = {"clause_id": row.clause_id, "cells": {}}
+        else:
+            chain_id = prev_chain
+        chain = open_chains[chain_id]
+        chain["clause_id"] = row.clause_id
+        chain["live"] = column
+        chain["order"] = order
+        current_at.setdefault(row.clause_id, chain_id)
+
+        code = STATUS_CODES.get(row.change_type, STATUS_CODES["modified"])
+        # 首次出现或内容发生变化时给出哈希
+        text_hash = _short_hash(row.content) if code != STATUS_CODES["unchanged"] or prev_chain is None else None
+        chain["cells"][column] = (code, text_hash)
+
+    finish_columns(width)
+    for chain in sorted(open_chains.values(), key=lambda chain: chain["order"]):
+        yield _row(chain, width)
+    yield from finished
+
+
+def _row(chain: Dict[str, Any], width: int) -> Dict[str, Any]:
+    status = []
+    hash_columns = []
+    hashes = []
+    for column in range(width):
+        code, text_hash = chain["cells"].get(column, (STATUS_CODES["absent"], None))
+        status.append(code)
+        if text_hash is not None:
+            hash_columns.append(column)
+            hashes.append(text_hash)
+    return {"clauseId": chain["clause_id"], "status": "".join(status), "hashColumns": hash_columns, "hashes": hashes}
+
+
+def stream_clause_matrix(columns: List[Tuple[int, int]]) -> Iterator[str]:
+    """
+    以 JSON 片段输出矩阵：先输出状态码与版本列，再逐行输出条款（顺序见 iter_clause_rows）。
+    columns: 按版本号排序的 (版本 ID, 版本号)。响应开始后请求的数据库会话已关闭，这里使用独立的会话。
+    """
+    from database import SessionLocal
+
+    yield '{"statusCodes":' + json.dumps(STATUS_CODES, separators=(",", ":"))
+    yield ',"versions":' + json.dumps(
+        [{"versionId": version_id, "versionNumber": number} for version_id, number in columns], separators=(",", ":")
+    )
+    yield ',"rows":['
+    db = SessionLocal()
+    try:
+        for i, row in enumerate(iter_clause_rows(db, [version_id for version_id, _ in columns])):
+            yield ("," if i else "") + json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+    finally:
+        db.close()
+    yield "]}"
@@ -0,0 +1,178 @@
+import json
+import asyncio
+import hashlib
+from typing import List, Dict, Any, Optional
+from sqlalchemy.exc import IntegrityError
+
+
+def evolution_fingerprint(version_changes: List[Dict[str, Any]]) -> str:
+    """
+    条款内容演变的指纹：只取内容的变化序列（连续相同内容合并），
+    因此后续版本未修改该条款时指纹不变，已生成的总结可以直接复用。
+    指纹同时包含模型与提示词版本，提示词升级后自动失效。
+    """
+    from lib.ai_engine import CLAUSE_EVOLUTION_PROMPT_VERSION, DEFAULT_MODEL
+
+    sequence = []
+    for vc in version_changes:
+        content = vc.get("content")
+        if not sequence or sequence[-1] != content:
+            sequence.append(content)
+    # 开头缺失（条款尚未出现）的版本不影响演变内容
+    while sequence and sequence[0] is None:
+        sequence.pop(0)
+
+    payload = json.dumps([DEFAULT_MODEL, CLAUSE_EVOLUTION_PROMPT_VERSION, sequence], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def find_stored_summary(db, contract_id: int, clause_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    查找与当前内容演变一致的已存储总结。
+    """
+    import models
+
+    row = db.query(models.ClauseSummary).filter(
+        models.ClauseSummary.contract_id == contract_id,
+        models.ClauseSummary.clause_id == clause_id,
+        models.ClauseSummary.fingerprint == fingerprint
+    ).order_by(models.ClauseSummary.id.desc()).first()
+
+    if not row:
+        return None
+    return dict(json.loads(row.summary), cached=True)
+
+
+def store_summary(
+    db,
+    contract_id: int,
+    clause_id: str,
+    from_version: int,
+    to_version: int,
+    fingerprint: str,
+    summary: Dict[str, Any]
+) -> None:
+    """
+    按 (clause_id, 版本范围) 写入或更新总结。
+    """
+    import models
+
+    payload = json.dumps(
+        {k: v for k, v in summary.items() if k in ("oneLiner", "evolutionSummary", "riskNotes")},
+        ensure_ascii=False
+    )
+    try:
+        row = db.query(models.ClauseSummary).filter(
+            models.ClauseSummary.contract_id == contract_id,
+            models.ClauseSummary.clause_id == clause_id,
+            models.ClauseSummary.from_version == from_version,
+            models.ClauseSummary.to_version == to_version
+        ).first()
+        if row:
+            row.fingerprint = fingerprint
+            row.summary = payload
+        else:
+            db.add(models.ClauseSummary(
+                contract_id=contract_id,
+                clause_id=clause_id,
+                from_version=from_version,
+                to_version=to_version,
+                fingerprint=fingerprint,
+                summary=payload
+            ))
+        db.commit()
+    except IntegrityError:
+        # 另一个任务同时写入了相同范围，保留已有结果即可
+        db.rollback()
+
+
+def _collect_pending(contract_id: int) -> List[Dict[str, Any]]:
+    """
+    沿条款谱系一次性计算合同所有条款的历史，找出内容发生过变化、且尚无对应总结的条款。
+    已有相同指纹总结的条款直接为新的版本范围复用该总结，不调用 AI。
+    """
+    import models
+    from database import SessionLocal
+    from lib.clause_history import changed_clause_ids, version_changes_for_ai
+    from lib.clause_lineage import ensure_contract_lineage, lineage_histories
+    from sqlalchemy.orm import defer
+
+    db = SessionLocal()
+    try:
+        versions = db.query(models.Version).filter(
+            models.Version.contract_id == contract_id
+        ).options(defer(models.Version.html_content)).order_by(models.Version.version_number).all()
+        if len(versions) < 2:
+            return []
+
+        ensure_contract_lineage(db, contract_id)
+        histories = lineage_histories(db, contract_id, None, versions)
+
+        pending = []
+        for clause_id in changed_clause_ids(histories):
+            clause_path, states = histories[clause_id]
+            version_changes = version_changes_for_ai(states)
+            fingerprint = evolution_fingerprint(version_changes)
+            from_version = states[0]["versionNumber"]
+            to_version = states[-1]["versionNumber"]
+
+            existing = find_stored_summary(db, contract_id, clause_id, fingerprint)
+            if existing is not None:
+                store_summary(db, contract_id, clause_id, from_version, to_version, fingerprint, existing)
+                continue
+
+            pending.append({
+                "clause_id": clause_id,
+                "clause_path": clause_path,
+                "version_changes": version_changes,
+                "fingerprint": fingerprint,
+                "from_version": from_version,
+                "to_version": to_version,
+            })
+        return pending
+    finally:
+        db.close()
+
+
+def _store_generated(contract_id: int, pending: List[Dict[str, Any]], summaries: Dict[str, Dict[str, Any]]) -> int:
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        stored = 0
+        for item in pending:
+            summary = summaries.get(item["clause_id"])
+            if not summary:
+                continue
+            store_summary(
+                db, contract_id, item["clause_id"], item["from_version"], item["to_version"],
+                item["fingerprint"], summary
+            )
+            stored += 1
+        return stored
+    finally:
+        db.close()
+
+
+async def generate_contract_clause_summaries(contract_id: int) -> Dict[str, int]:
+    """
+    合同级批量任务（新版本上传后在后台执行）：为所有内容发生过变化的条款生成演变总结，
+    多个条款打包进同一个请求，结果按 (clause_id, 版本范围) 存储，供 get_clause_history 直接读取。
+    """
+    from lib.ai_engine import analyze_clause_evolution_batch, client
+
+    if not client:
+        return {"pending": 0, "stored": 0}
+
+    try:
+        pending = await asyncio.to_thread(_collect_pending, contract_id)
+        if not pending:
+            return {"pending": 0, "stored": 0}
+
+        summaries = await analyze_clause_evolution_batch(pending)
+        stored = await asyncio.to_thread(_store_generated, contract_id, pending, summaries)
+        print(f"Clause summaries for contract {contract_id}: {stored}/{len(pending)} generated")
+        return {"pending": len(pending), "stored": stored}
+    except Exception as e:
+        print(f"Clause summary batch failed for contract {contract_id}: {e}")
+        return {"pending": 0, "stored": 0}
@@ -0,0 +1,56 @@
+import os
+from starlette.datastructures import MutableHeaders
+
+# 小于该字节数的响应不压缩
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1000"))
+
+# 不经过压缩的路径后缀：SSE 需要逐个事件立即发出，压缩器会缓冲数据；
+# 导出的 zip 声明了 Content-Length 并支持 Range，压缩会破坏字节偏移
+UNCOMPRESSED_PATH_SUFFIXES = ("/stream", "/export")
+
+
+def _build_compressor(app, minimum_size: int):
+    """
+    安装了 brotli-asgi 时使用 Brotli（不支持 br 的客户端回退到 gzip），否则使用 gzip。
+    """
+    try:
+        from brotli_asgi import BrotliMiddleware
+        return BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+    except ImportError:
+        from starlette.middleware.gzip import GZipMiddleware
+        return GZipMiddleware(app, minimum_size=minimum_size)
+
+
+def _vary_and_weaken(send):
+    """
+    包装 send，调整压缩器输出的响应头：
+    - 响应内容随 Accept-Encoding 变化（包括未压缩的小响应），统一加上 Vary: Accept-Encoding，
+      避免共享缓存把 gzip 内容返回给不支持的客户端
+    - 压缩后的字节与原始表示不同，强 ETag 改为弱 ETag（W/）；If-None-Match 本来就按弱比较匹配
+    """
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if "content-encoding" in headers and etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+        await send(message)
+    return wrapped
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件，跳过流式接口。
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.compressed_app = _build_compressor(app, minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].rstrip("/").endswith(UNCOMPRESSED_PATH_SUFFIXES):
+            await self.compressed_app(scope, receive, _vary_and_weaken(send))
+        else:
+            await self.app(scope, receive, send)
@@ -1,7 +1,32 @@
 import re
-from datetime import datetime
-from docx import Document
 import os
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+# 优先使用 docProps/core.xml 中的修改/创建时间
+DATE_USE_DOCX_METADATA = os.getenv("DATE_USE_DOCX_METADATA", "true").lower() in ("1", "true", "yes")
+# 正文扫描最多检查的段落数（包括表格单元格中的段落），0 表示不限制
+DATE_SCAN_MAX_PARAGRAPHS = int(os.getenv("DATE_SCAN_MAX_PARAGRAPHS", "200"))
+
+# 合并后的日期模式：
+# - YYYY年MM月DD日
+# - YYYY/MM/DD、YYYY-MM-DD、YYYY.MM.DD（前后分隔符必须一致）
+DATE_PATTERN = re.compile(r'(\d{4})(?:年(\d{1,2})月(\d{1,2})日|([/.-])(\d{1,2})\4(\d{1,2}))')
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DCTERMS_NS = "{http://purl.org/dc/terms/}"
+
+
+def _valid_date(year: int, month: int, day: int):
+    # Basic validation
+    if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
+        try:
+            return datetime(year, month, day)
+        except ValueError:
+            return None
+    return None
+
 
 def extract_date_from_text(text: str):
     """
@@ -12,47 +37,72 @@ def extract_date_from_text(text: str):
     - YYYY-MM-DD
     - YYYY.MM.DD
     """
-    # Regex patterns for common date formats
-    patterns = [
-        r'(\d{4})年(\d{1,2})月(\d{1,2})日',  # 2023年5月12日
-        r'(\d{4})/(\d{1,2})/(\d{1,2})',      # 2023/05/12
-        r'(\d{4})-(\d{1,2})-(\d{1,2})',      # 2023-05-12
-        r'(\d{4})\.(\d{1,2})\.(\d{1,2})'     # 2023.05.12
-    ]
-
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            try:
-                year, month, day = map(int, match)
-                # Basic validation
-                if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
-                    return datetime(year, month, day)
-            except ValueError:
+    for match in DATE_PATTERN.finditer(text or ""):
+        year = int(match.group(1))
+        if match.group(2) is not None:
+            month, day = int(match.group(2)), int(match.group(3))
+        else:
+            month, day = int(match.group(5)), int(match.group(6))
+        date = _valid_date(year, month, day)
+        if date:
+            return date
+    return None
+
+
+def _date_from_core_properties(archive: zipfile.ZipFile):
+    """
+    读取 docProps/core.xml 中的 dcterms:modified（缺失时用 dcterms:created），只取日期部分。
+    """
+    try:
+        root = ElementTree.fromstring(archive.read("docProps/core.xml"))
+    except (KeyError, ElementTree.ParseError):
+        return None
+    for tag in ("modified", "created"):
+        element = root.find(f"{DCTERMS_NS}{tag}")
+        if element is not None and element.text:
+            match = re.match(r'(\d{4})-(\d{2})-(\d{2})', element.text.strip())
+            if match:
+                date = _valid_date(*map(int, match.groups()))
+                if date:
+                    return date
+    return None
+
+
+def _date_from_body(archive: zipfile.ZipFile, max_paragraphs: int):
+    """
+    流式解析 word/document.xml，按文档顺序逐段落拼接 w:t 文本并匹配，找到第一个有效日期即停止。
+    不构建 python-docx 对象，表格单元格中的段落按出现顺序一并扫描。
+    """
+    scanned = 0
+    with archive.open("word/document.xml") as document:
+        for event, element in ElementTree.iterparse(document, events=("end",)):
+            if element.tag != f"{W_NS}p":
                 continue
-    
+            text = "".join(t.text or "" for t in element.iter(f"{W_NS}t"))
+            element.clear()
+            date = extract_date_from_text(text)
+            if date:
+                return date
+            scanned += 1
+            if max_paragraphs and scanned >= max_paragraphs:
+                return None
     return None
 
-def extract_date_from_docx(file_path: str):
+
+def extract_date_from_docx(file_path: str, max_paragraphs: int = None):
     """
-    Reads a DOCX file and extracts the first date found.
+    Reads a DOCX file and extracts its date: document metadata first, then the first
+    date found in the first max_paragraphs paragraphs of the body.
     """
+    if max_paragraphs is None:
+        max_paragraphs = DATE_SCAN_MAX_PARAGRAPHS
     try:
-        doc = Document(file_path)
-        full_text = []
-        
-        # Check paragraphs
-        for para in doc.paragraphs:
-            full_text.append(para.text)
-            
-        # Check tables (sometimes dates are in headers/tables)
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    full_text.append(cell.text)
-        
-        text_content = "\n".join(full_text)
-        return extract_date_from_text(text_content)
+        with zipfile.ZipFile(file_path) as archive:
+            if DATE_USE_DOCX_METADATA:
+                date = _date_from_core_properties(archive)
+                if date:
+                    return date
+            return _date_from_body(archive, max_paragraphs)
     except Exception as e:
         print(f"Error extracting date from {file_path}: {e}")
         return None
@@ -0,0 +1,127 @@
+import hashlib
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+import models
+from lib.smart_diff import match_clauses
+from lib.clause_lineage import ensure_contract_lineage, stored_clauses
+
+
+def _text_hash(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _unchanged_item(old_c: Dict[str, Any], new_c: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    与 match_clauses 对完全相同条款产出的 diff 项格式一致。
+    """
+    return {
+        "clause_id": new_c['id'],
+        "old_clause_id": old_c['id'],
+        "type": "unchanged",
+        "change_type": "unchanged",
+        "original": old_c['text'],
+        "modified": new_c['text'],
+        "similarity": 1.0,
+        "old_number": old_c['number'],
+        "new_number": new_c['number'],
+        "old_title": old_c['title'],
+        "new_title": new_c['title'],
+        "indent": new_c.get('indent', 0)
+    }
+
+
+def compose_diff(db: Session, contract_id: int, base_version, target_version) -> Optional[List[Dict[str, Any]]]:
+    """
+    由相邻版本的匹配结果（条款谱系）组合出任意两个版本之间的 diff，无需解析 DOCX：
+    1. 沿谱系链把目标版本的条款追溯到基准版本，文本哈希相同的条款直接判定为未变化
+    2. 链断开但文本哈希在两侧都唯一且相同的条款同样直接配对
+    3. 只对剩余的条款运行 match_clauses 模糊匹配
+    谱系缺失或不一致、版本内条款 ID 重复（链路不唯一）时返回 None，由调用方回退到直接比较。
+    """
+    if base_version.version_number >= target_version.version_number:
+        return None
+
+    ensure_contract_lineage(db, contract_id)
+
+    versions = db.query(models.Version.id).filter(
+        models.Version.contract_id == contract_id,
+        models.Version.version_number >= base_version.version_number,
+        models.Version.version_number <= target_version.version_number
+    ).order_by(models.Version.version_number).all()
+    version_ids = [v.id for v in versions]
+    if version_ids[0] != base_version.id or version_ids[-1] != target_version.id:
+        return None
+
+    # 每个版本的谱系都必须是与其前一个版本匹配得到的
+    states = {
+        s.version_id: s.prev_version_id
+        for s in db.query(models.ClauseLineageState).filter(models.ClauseLineageState.version_id.in_(version_ids))
+    }
+    for prev_id, version_id in zip(version_ids, version_ids[1:]):
+        if states.get(version_id) != prev_id:
+            return None
+
+    links = {version_id: {} for version_id in version_ids[1:]}
+    rows = db.query(
+        models.ClauseLineage.version_id, models.ClauseLineage.clause_id, models.ClauseLineage.prev_clause_id
+    ).filter(
+        models.ClauseLineage.version_id.in_(version_ids[1:]),
+        models.ClauseLineage.clause_id.isnot(None)
+    ).all()
+    for row in rows:
+        version_links = links[row.version_id]
+        if row.clause_id in version_links:
+            return None  # 条款 ID 重复，链路有歧义
+        version_links[row.clause_id] = row.prev_clause_id
+
+    old_clauses = stored_clauses(db, base_version.id)
+    new_clauses = stored_clauses(db, target_version.id)
+    old_by_id = {c['id']: c for c in old_clauses}
+    if len(old_by_id) != len(old_clauses):
+        return None
+
+    # 1. 沿谱系链追溯，文本哈希相同则沿用
+    carried = {}  # new index -> old clause
+    used_old = set()
+    for new_idx, new_c in enumerate(new_clauses):
+        clause_id = new_c['id']
+        for version_id in reversed(version_ids[1:]):
+            clause_id = links[version_id].get(clause_id)
+            if clause_id is None:
+                break
+        old_c = old_by_id.get(clause_id) if clause_id is not None else None
+        if old_c is not None and old_c['id'] not in used_old and _text_hash(old_c['text']) == _text_hash(new_c['text']):
+            carried[new_idx] = old_c
+            used_old.add(old_c['id'])
+
+    # 2. 链断开（例如删除后又恢复）但文本在两侧唯一且完全相同
+    old_by_hash = {}
+    for c in old_clauses:
+        if c['id'] not in used_old:
+            old_by_hash.setdefault(_text_hash(c['text']), []).append(c)
+    new_by_hash = {}
+    for new_idx, c in enumerate(new_clauses):
+        if new_idx not in carried:
+            new_by_hash.setdefault(_text_hash(c['text']), []).append(new_idx)
+    for text_hash, new_indices in new_by_hash.items():
+        candidates = old_by_hash.get(text_hash, [])
+        if len(new_indices) == 1 and len(candidates) == 1:
+            carried[new_indices[0]] = candidates[0]
+            used_old.add(candidates[0]['id'])
+
+    # 3. 只对真正发生变化的条款做模糊匹配
+    residual_old = [c for c in old_clauses if c['id'] not in used_old]
+    residual_new_indices = [i for i in range(len(new_clauses)) if i not in carried]
+    residual_diffs = match_clauses(residual_old, [new_clauses[i] for i in residual_new_indices])
+    # match_clauses 按新条款顺序为每个条款产出一项，之后追加删除项
+    residual_by_index = dict(zip(residual_new_indices, residual_diffs))
+    deleted = residual_diffs[len(residual_new_indices):]
+
+    diffs = []
+    for new_idx, new_c in enumerate(new_clauses):
+        if new_idx in carried:
+            diffs.append(_unchanged_item(carried[new_idx], new_c))
+        else:
+            diffs.append(residual_by_index[new_idx])
+    diffs.extend(deleted)
+    return diffs
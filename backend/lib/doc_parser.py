@@ -2,6 +2,7 @@ import docx
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import re
 from typing import List, Dict, Optional, Any, Tuple
+from lib.blob_store import resolve_path
 
 def get_paragraph_info(para) -> Tuple[str, int, bool, bool]:
     """
@@ -41,7 +42,7 @@ def extract_clauses(file_path: str) -> List[Dict[str, Any]]:
     Extracts clauses from a .docx file into structured objects.
     Returns: [{'id': '...', 'number': '...', 'title': '...', 'body': '...', 'text': '...', 'indent': 0, 'level': 1}]
     """
-    doc = docx.Document(file_path)
+    doc = docx.Document(resolve_path(file_path))
     clauses = []
     
     # Current clause state
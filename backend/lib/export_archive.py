@@ -0,0 +1,318 @@
+import io
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, defer
+import models
+from database import SessionLocal
+from lib.blob_store import blob_sha256, resolve_path
+from lib.http_cache import REVALIDATE, is_not_modified, make_etag, not_modified, parse_byte_range
+from lib.zip_stream import StreamingZip, ZipEntry
+
+# HTML 与 diff 写入后不再变化：按内容键缓存其字节数（CRC 由 ZipEntry 的 crc_key 缓存），
+# 再次导出时规划压缩包无需重新读取内容
+_SIZE_CACHE_MAX = 4096
+_size_cache = OrderedDict()
+_size_lock = threading.Lock()
+
+
+def _cached_size(key: Any) -> Optional[int]:
+    with _size_lock:
+        size = _size_cache.get(key)
+        if size is not None:
+            _size_cache.move_to_end(key)
+        return size
+
+
+def _remember_size(key: Any, size: int) -> None:
+    with _size_lock:
+        _size_cache[key] = size
+        while len(_size_cache) > _SIZE_CACHE_MAX:
+            _size_cache.popitem(last=False)
+
+
+def _safe_name(name: Optional[str], fallback: str) -> str:
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', "_", (name or "").strip()).strip(". ")
+    return name or fallback
+
+
+def _version_query(db: Session, contract_id: int):
+    return db.query(
+        models.Version.id, models.Version.version_number, models.Version.file_path, models.Version.original_filename,
+        models.Version.sha256, models.Version.commit_message, models.Version.created_at
+    ).filter(models.Version.contract_id == contract_id).order_by(models.Version.version_number)
+
+
+def _stored_diffs(db: Session, versions) -> Dict[Tuple[int, int], int]:
+    """已保存的 diff：{(上一版本 ID, 版本 ID): diff ID}，同一对版本取最早的一条。"""
+    stored = {}
+    for row in db.query(models.Diff.id, models.Diff.version_id, models.Diff.previous_version_id).filter(
+        models.Diff.version_id.in_([v.id for v in versions])
+    ).order_by(models.Diff.id):
+        stored.setdefault((row.previous_version_id, row.version_id), row.id)
+    return stored
+
+
+def ensure_adjacent_diffs(db: Session, contract_id: int, versions) -> Dict[Tuple[int, int], int]:
+    """
+    确保每对相邻版本的条款 diff 已保存在 diffs 表中（缺失时由条款谱系组合，必要时直接比较），
+    返回 {(上一版本 ID, 版本 ID): diff ID}。版本上传后不再变化，保存的 diff 一直有效。
+    """
+    from lib.diff_composer import compose_diff
+    from lib.diff_engine import compare_versions
+
+    version_ids = [v.id for v in versions]
+    stored = _stored_diffs(db, versions)
+
+    missing = [(prev, version) for prev, version in zip(versions, versions[1:]) if (prev.id, version.id) not in stored]
+    if not missing:
+        return stored
+
+    full = {
+        v.id: v for v in db.query(models.Version).filter(
+            models.Version.id.in_(version_ids)
+        ).options(defer(models.Version.html_content))
+    }
+    for prev, version in missing:
+        try:
+            diffs = compose_diff(db, contract_id, full[prev.id], full[version.id])
+            if diffs is None:
+                diffs = compare_versions(prev.file_path, version.file_path)
+        except Exception as e:
+            print(f"Diff generation failed for v{prev.version_number}-v{version.version_number}: {e}")
+            continue
+        diff = models.Diff(version_id=version.id, previous_version_id=prev.id, content=json.dumps(diffs, ensure_ascii=False))
+        db.add(diff)
+        db.flush()
+        stored[(prev.id, version.id)] = diff.id
+    db.commit()
+    return stored
+
+
+def _load_html(version_id: int) -> bytes:
+    db = SessionLocal()
+    try:
+        row = db.query(models.Version.html_content).filter(models.Version.id == version_id).first()
+        return (row.html_content or "").encode("utf-8") if row else b""
+    finally:
+        db.close()
+
+
+def _diff_document(prev_number: int, version_number: int, content: str) -> bytes:
+    # 直接拼接已保存的 JSON 字符串，不必解析
+    return (
+        f'{{"base_version":{prev_number},"target_version":{version_number},"items":{content or "[]"}}}'
+    ).encode("utf-8")
+
+
+def _load_diff(diff_id: int, prev_number: int, version_number: int) -> bytes:
+    db = SessionLocal()
+    try:
+        row = db.query(models.Diff.content).filter(models.Diff.id == diff_id).first()
+        return _diff_document(prev_number, version_number, row.content if row else None)
+    finally:
+        db.close()
+
+
+def _document_entry(name: str, version, blob_sizes: Dict[str, int]) -> Optional[ZipEntry]:
+    sha256 = blob_sha256(version.file_path)
+    if sha256 is not None:
+        if sha256 not in blob_sizes:
+            return None
+        # 内容寻址：同一 blob 的 CRC 在所有合同、所有请求之间共享
+        return ZipEntry(name, blob_sizes[sha256], version.created_at, lambda: open(resolve_path(version.file_path), "rb"),
+                        crc_key=("blob", sha256))
+
+    path = version.file_path
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return ZipEntry(name, stat.st_size, version.created_at, lambda: open(path, "rb"),
+                    crc_key=("file", path, stat.st_size, stat.st_mtime_ns))
+
+
+def _contract_fingerprint(contract, versions, diff_ids: Dict[Tuple[int, int], int]) -> List[Any]:
+    adjacent = [diff_ids.get((prev.id, version.id)) for prev, version in zip(versions, versions[1:])]
+    return [contract.id, contract.name, [(v.id, v.sha256 or v.file_path) for v in versions], adjacent]
+
+
+def _html_entries(db: Session, folder: str, versions) -> List[ZipEntry]:
+    """
+    渲染后的 HTML 条目。字节数按 (版本 ID, 创建时间) 缓存，只读取未缓存版本的 HTML；
+    内容在输出时按需读取。
+    """
+    keys = {v.id: ("html", v.id, v.created_at) for v in versions}
+    sizes = {version_id: _cached_size(key) for version_id, key in keys.items()}
+    missing = [version_id for version_id, size in sizes.items() if size is None]
+    if missing:
+        for row in db.query(models.Version.id, models.Version.html_content).filter(
+            models.Version.id.in_(missing)
+        ).yield_per(20):
+            # 没有 HTML 的版本记为 -1，不产生条目
+            size = len(row.html_content.encode("utf-8")) if row.html_content is not None else -1
+            _remember_size(keys[row.id], size)
+            sizes[row.id] = size
+
+    return [
+        ZipEntry(f"{folder}html/v{v.version_number:03d}.html", sizes[v.id], v.created_at,
+                 lambda version_id=v.id: io.BytesIO(_load_html(version_id)), crc_key=keys[v.id])
+        for v in versions
+        if sizes.get(v.id) is not None and sizes[v.id] >= 0
+    ]
+
+
+def _diff_entries(db: Session, folder: str, versions, diff_ids: Dict[Tuple[int, int], int]) -> List[ZipEntry]:
+    """相邻版本之间的 diff JSON 条目，字节数的缓存方式与 HTML 相同。"""
+    pairs = [(prev, version, diff_ids[(prev.id, version.id)])
+             for prev, version in zip(versions, versions[1:]) if (prev.id, version.id) in diff_ids]
+    keys = {diff_id: ("diff", diff_id, version.id, version.created_at) for _, version, diff_id in pairs}
+    sizes = {diff_id: _cached_size(key) for diff_id, key in keys.items()}
+    missing = {diff_id: (prev, version) for prev, version, diff_id in pairs if sizes[diff_id] is None}
+    if missing:
+        for row in db.query(models.Diff.id, models.Diff.content).filter(models.Diff.id.in_(list(missing))).yield_per(20):
+            prev, version = missing[row.id]
+            size = len(_diff_document(prev.version_number, version.version_number, row.content))
+            _remember_size(keys[row.id], size)
+            sizes[row.id] = size
+
+    return [
+        ZipEntry(f"{folder}diffs/v{prev.version_number:03d}-v{version.version_number:03d}.json", sizes[diff_id],
+                 version.created_at,
+                 lambda d=diff_id, p=prev.version_number, n=version.version_number: io.BytesIO(_load_diff(d, p, n)),
+                 crc_key=keys[diff_id])
+        for prev, version, diff_id in pairs
+        if sizes.get(diff_id) is not None
+    ]
+
+
+def contract_entries(db: Session, contract, versions, prefix: str = "") -> Tuple[List[ZipEntry], List[Any]]:
+    """
+    一个合同的导出条目：manifest.json、每个版本的原始文档、渲染后的 HTML，以及相邻版本之间的 diff JSON。
+    versions 为 _version_query 的结果。缺失的相邻 diff 在这里生成并保存。
+    HTML 与 diff 只在首次导出时读取以确定大小，输出时再按需读取，不会同时驻留内存。
+    返回 (条目, 用于计算 ETag 的指纹)。
+    """
+    folder = f"{prefix}{contract.id}_{_safe_name(contract.name, 'contract')}/"
+    diff_ids = ensure_adjacent_diffs(db, contract.id, versions) if len(versions) > 1 else {}
+
+    shas = [blob_sha256(v.file_path) for v in versions if blob_sha256(v.file_path)]
+    blob_sizes = dict(db.query(models.Blob.sha256, models.Blob.size).filter(models.Blob.sha256.in_(shas)).all()) if shas else {}
+
+    entries = []
+    manifest_versions = []
+    for version in versions:
+        filename = _safe_name(version.original_filename or os.path.basename(version.file_path or ""), "document.docx")
+        document_name = f"{folder}versions/v{version.version_number:03d}_{filename}"
+        document = _document_entry(document_name, version, blob_sizes)
+        if document is not None:
+            entries.append(document)
+        manifest_versions.append({
+            "id": version.id,
+            "version_number": version.version_number,
+            "commit_message": version.commit_message,
+            "created_at": version.created_at.isoformat() if version.created_at else None,
+            "original_filename": version.original_filename,
+            "sha256": version.sha256,
+            "document": document_name if document is not None else None,
+        })
+
+    entries.extend(_html_entries(db, folder, versions))
+    entries.extend(_diff_entries(db, folder, versions, diff_ids))
+
+    manifest = json.dumps({
+        "contract": {"id": contract.id, "name": contract.name,
+                     "created_at": contract.created_at.isoformat() if contract.created_at else None},
+        "versions": manifest_versions,
+    }, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8")
+    modified = versions[-1].created_at if versions else (contract.created_at or datetime(1980, 1, 1))
+    entries.insert(0, ZipEntry.from_bytes(f"{folder}manifest.json", manifest, modified))
+
+    return entries, _contract_fingerprint(contract, versions, diff_ids)
+
+
+ExportBuilder = Callable[[], Tuple[StreamingZip, List[Any]]]
+
+
+def build_contract_export(db: Session, contract) -> Tuple[List[Any], ExportBuilder]:
+    """
+    返回 (指纹, build)。指纹只查询版本列表与已保存的 diff ID，用于在读取任何内容之前判断 304；
+    build() 才生成缺失的 diff、规划压缩包，返回 (压缩包, 生成后的指纹)。
+    """
+    versions = _version_query(db, contract.id).all()
+    fingerprint = _contract_fingerprint(contract, versions, _stored_diffs(db, versions) if len(versions) > 1 else {})
+
+    def build():
+        entries, final = contract_entries(db, contract, versions)
+        return StreamingZip(entries), ["contract", final]
+
+    return ["contract", fingerprint], build
+
+
+def build_project_export(db: Session, project) -> Tuple[List[Any], ExportBuilder]:
+    """build_contract_export 的项目版本：包含项目下的所有合同。"""
+    prefix = f"{project.id}_{_safe_name(project.name, 'project')}/"
+    contracts = db.query(models.Contract).filter(models.Contract.project_id == project.id).order_by(models.Contract.id).all()
+    plans = []
+    for contract in contracts:
+        versions = _version_query(db, contract.id).all()
+        diff_ids = _stored_diffs(db, versions) if len(versions) > 1 else {}
+        plans.append((contract, versions, _contract_fingerprint(contract, versions, diff_ids)))
+
+    def build():
+        entries, fingerprints = [], []
+        for contract, versions, _ in plans:
+            contract_files, fingerprint = contract_entries(db, contract, versions, prefix)
+            entries.extend(contract_files)
+            fingerprints.append(fingerprint)
+        return StreamingZip(entries), ["project", project.id, project.name, fingerprints]
+
+    return ["project", project.id, project.name, [fingerprint for _, _, fingerprint in plans]], build
+
+
+def archive_response(request: Request, fingerprint: List[Any], build: ExportBuilder, filename: str) -> Response:
+    """
+    流式输出压缩包。压缩包字节布局由内容唯一确定，支持 Range / If-Range 断点续传。
+    先用廉价指纹判断 304，命中时不读取任何内容、不生成 diff。
+    """
+    etag = make_etag("export", fingerprint)
+    if is_not_modified(request, etag):
+        return not_modified(etag, REVALIDATE)
+
+    # 本次请求生成了缺失的 diff 时指纹会变化，ETag 以生成后的内容为准
+    archive, fingerprint = build()
+    etag = make_etag("export", fingerprint)
+
+    total = archive.total_size
+    headers = {
+        "ETag": etag,
+        "Cache-Control": REVALIDATE,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename=\"export.zip\"; filename*=UTF-8''{quote(filename)}",
+    }
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # If-Range 与当前 ETag 不一致（压缩包已变化）时忽略 Range，返回完整内容
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), total)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+
+    if byte_range is None:
+        return StreamingResponse(
+            archive.iter_bytes(), media_type="application/zip",
+            headers={**headers, "Content-Length": str(total)}
+        )
+    start, end = byte_range
+    return StreamingResponse(
+        archive.iter_bytes(start, end), status_code=206, media_type="application/zip",
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{total}", "Content-Length": str(end - start + 1)}
+    )
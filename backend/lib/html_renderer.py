@@ -6,13 +6,14 @@ from docx.table import _Cell, Table
 from docx.text.paragraph import Paragraph
 import re
 import html
+from lib.blob_store import resolve_path
 
 def render_document_to_html(file_path: str) -> str:
     """
     Converts a DOCX file to HTML, preserving tables and basic formatting.
     Injects data-clause-id attributes for diff highlighting.
     """
-    doc = docx.Document(file_path)
+    doc = docx.Document(resolve_path(file_path))
     html_output = []
     
     # Regex for clause numbering (same as doc_parser.py)
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+from fastapi import Request, Response
+
+# 版本上传后内容不再变化：单版本资源可以被客户端永久缓存
+IMMUTABLE = "private, max-age=31536000, immutable"
+# 依赖多个版本（可能新增/删除版本）或 AI 总结的资源：每次使用前用 ETag 重新验证
+REVALIDATE = "private, no-cache"
+
+# 响应格式修订号：修改这些接口的返回结构时递增，使客户端缓存的旧 ETag 失效
+RESPONSE_FORMAT_VERSION = "1"
+
+_HASH_CACHE_MAX = 4096
+_hash_cache = OrderedDict()
+_hash_lock = threading.Lock()
+
+
+def file_sha256(path: Optional[str]) -> str:
+    """
+    文件内容的 sha256。按 (路径, 大小, 修改时间) 在进程内缓存，同一文件只读取一次。
+    """
+    if not path:
+        return "none"
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        digest = _hash_cache.get(key)
+        if digest is not None:
+            _hash_cache.move_to_end(key)
+            return digest
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _hash_lock:
+        _hash_cache[key] = digest
+        while len(_hash_cache) > _HASH_CACHE_MAX:
+            _hash_cache.popitem(last=False)
+    return digest
+
+
+def version_fingerprint(version) -> str:
+    """
+    版本的内容指纹：版本 ID 加文件内容哈希（SQLite 可能复用已删除行的 ID）。
+    优先使用上传时记录的哈希，旧版本没有记录时才读取文件计算。
+    """
+    return f"{version.id}:{getattr(version, 'sha256', None) or file_sha256(version.file_path)}"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    由参与计算的版本指纹等信息生成强 ETag。
+    """
+    payload = json.dumps([RESPONSE_FORMAT_VERSION, *parts], ensure_ascii=False, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_candidates(header: str) -> Iterable[str]:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate:
+            yield candidate
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    If-None-Match 使用弱比较（RFC 9110）：W/"x" 与 "x" 视为匹配，"*" 匹配任意 ETag。
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return any(candidate in ("*", etag) for candidate in _etag_candidates(header))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def parse_byte_range(header: Optional[str], total: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个区间的 Range 请求头，返回 (start, end)（end 包含在内）。
+    没有 Range、格式无法识别或多个区间时返回 None（按完整响应处理）；区间无法满足时抛出 ValueError。
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (header or "").strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else total - 1
+    else:
+        # bytes=-N：最后 N 个字节
+        suffix = int(match.group(2))
+        if suffix == 0:
+            raise ValueError("Range not satisfiable")
+        start, end = max(total - suffix, 0), total - 1
+    if start > end:
+        return None
+    if start >= total:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, total - 1)
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 单次调用的截止时间（秒），包含所有重试
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "45"))
+# 失败后的最大重试次数（仅对超时、连接错误、429 和 5xx 重试）
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+AI_RETRY_BACKOFF_SECONDS = float(os.getenv("AI_RETRY_BACKOFF_SECONDS", "0.5"))
+AI_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("AI_RETRY_BACKOFF_MAX_SECONDS", "8"))
+# 舱壁：同一进程内同时进行的模型请求上限，以及排队等待的最长时间
+AI_BULKHEAD_SIZE = int(os.getenv("AI_BULKHEAD_SIZE", "8"))
+AI_BULKHEAD_WAIT_SECONDS = float(os.getenv("AI_BULKHEAD_WAIT_SECONDS", "5"))
+# 熔断器：连续失败多少次后打开，打开多久后进入半开状态试探
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "5"))
+AI_BREAKER_RESET_SECONDS = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMUnavailableError(Exception):
+    """模型服务当前不可用（熔断打开或舱壁已满），调用方应立即走降级逻辑。"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+class BulkheadFullError(LLMUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    简单的三态熔断器：
+    - closed: 正常放行，连续失败达到阈值后打开
+    - open: 直接拒绝，reset_seconds 后进入 half_open
+    - half_open: 只放行一个试探请求，成功则关闭，失败则重新打开
+    线程安全，可在多个事件循环之间共享。
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open":
+                if self.trial_in_flight:
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def release_trial(self) -> None:
+        """试探请求未真正发出时归还半开状态下的名额。"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.open_count += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_count": self.open_count,
+                "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+            }
+
+
+def _is_upstream_failure(error: BaseException) -> bool:
+    """
+    超时、连接错误、429 和 5xx 说明上游不可用：这些错误才重试并计入熔断器。
+    其他 4xx（请求本身有问题）不代表上游故障。
+    """
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class LLMClient:
+    """
+    共享的异步模型客户端，封装：
+    - 每次调用的截止时间（含重试）
+    - 舱壁：限制进程内并发请求数，排队超时则快速失败
+    - 带抖动的指数退避重试
+    - 熔断器：上游持续失败时直接拒绝，调用方走降级逻辑
+    每个事件循环持有独立的 AsyncOpenAI 实例与信号量，熔断器与统计数据全局共享。
+    """
+
+    def __init__(self, base_url: str, api_key: str):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.breaker = CircuitBreaker(AI_BREAKER_FAILURE_THRESHOLD, AI_BREAKER_RESET_SECONDS)
+        self._loop_state = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rejected_open_circuit": 0,
+            "rejected_bulkhead": 0,
+            "in_flight": 0,
+        }
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += delta
+
+    def _state(self):
+        from openai import AsyncOpenAI
+
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = (
+                AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0, timeout=AI_TIMEOUT_SECONDS),
+                asyncio.Semaphore(AI_BULKHEAD_SIZE),
+            )
+            self._loop_state[loop] = state
+        return state
+
+    async def _acquire(self, semaphore: asyncio.Semaphore) -> None:
+        if not self.breaker.allow_request():
+            self._count("rejected_open_circuit")
+            raise CircuitOpenError("AI upstream circuit is open")
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=AI_BULKHEAD_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            self.breaker.release_trial()
+            self._count("rejected_bulkhead")
+            raise BulkheadFullError("AI request bulkhead is full")
+        except BaseException:
+            # 排队时被取消（客户端断开、gather 中其他任务失败）
+            self.breaker.release_trial()
+            raise
+
+    async def _with_retries(self, attempt_fn, deadline: Optional[float], hold: bool = False):
+        """
+        在截止时间内执行 attempt_fn(timeout)，对可重试错误做带抖动的指数退避重试。
+        hold=True 时成功后不归还舱壁名额，返回 (结果, release)，由调用方在用完结果（例如读完流）后调用 release()。
+        """
+        client, semaphore = self._state()
+        deadline_at = time.monotonic() + (deadline or AI_TIMEOUT_SECONDS)
+        attempt = 0
+        await self._acquire(semaphore)
+        self._count("calls")
+        self._count("in_flight")
+        recorded = False
+        handed_over = False
+
+        def release() -> None:
+            self._count("in_flight", -1)
+            semaphore.release()
+
+        try:
+            while True:
+                remaining = deadline_at - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    result = await asyncio.wait_for(attempt_fn(client, remaining), timeout=remaining)
+                    self.breaker.record_success()
+                    recorded = True
+                    self._count("successes")
+                    if hold:
+                        handed_over = True
+                        return result, release
+                    return result
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._count("timeouts")
+                    backoff = random.uniform(0, min(AI_RETRY_BACKOFF_MAX_SECONDS, AI_RETRY_BACKOFF_SECONDS * (2 ** attempt)))
+                    upstream_failure = _is_upstream_failure(e)
+                    if (
+                        attempt >= AI_MAX_RETRIES
+                        or not upstream_failure
+                        or time.monotonic() + backoff >= deadline_at
+                    ):
+                        if upstream_failure:
+                            self.breaker.record_failure()
+                            recorded = True
+                        self._count("failures")
+                        raise
+                    attempt += 1
+                    self._count("retries")
+                    await asyncio.sleep(backoff)
+        finally:
+            if not recorded:
+                # 被取消或非上游错误：没有得出上游是否健康的结论，归还半开状态下的试探名额
+                self.breaker.release_trial()
+            if not handed_over:
+                release()
+
+    async def chat_json(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        发送 JSON 模式的对话请求并解析返回内容。
+        模型输出不是合法 JSON 时抛出 ValueError（json.JSONDecodeError），不计入熔断器。
+        """
+        async def attempt(client, timeout):
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                timeout=timeout,
+            )
+            return response.choices[0].message.content
+
+        content = await self._with_retries(attempt, deadline)
+        return json.loads(content)
+
+    async def stream_text(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        流式请求，逐段产出文本增量。只在建立连接阶段重试；开始输出后出错直接抛出。
+        截止时间同样覆盖整个流的读取过程。
+        """
+        deadline_at = time.monotonic() + (deadline or AI_TIMEOUT_SECONDS)
+
+        async def attempt(client, timeout):
+            return await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                stream=True,
+                timeout=timeout,
+            )
+
+        # 流式响应在读完之前一直占用舱壁名额
+        stream, release = await self._with_retries(attempt, deadline, hold=True)
+        iterator = stream.__aiter__()
+        try:
+            while True:
+                remaining = deadline_at - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    if _is_upstream_failure(e):
+                        self.breaker.record_failure()
+                    self._count("failures")
+                    raise
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # 调用方提前停止读取（客户端断开）时关闭上游连接，不再让模型继续输出
+            try:
+                await stream.close()
+            finally:
+                release()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            "base_url": self.base_url,
+            "circuit_breaker": self.breaker.snapshot(),
+            "bulkhead": {"size": AI_BULKHEAD_SIZE, "in_flight": stats.pop("in_flight")},
+            "calls": stats,
+            "timeout_seconds": AI_TIMEOUT_SECONDS,
+            "max_retries": AI_MAX_RETRIES,
+        }
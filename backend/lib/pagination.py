@@ -0,0 +1,58 @@
+import json
+import base64
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Sequence
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# 键集分页（keyset）：记住上一页最后一行的排序键，下一页从该键之后继续。配合以 (过滤列..., 排序列..., id)
+# 为前缀的索引，数据库直接定位到游标位置，第 N 页与第 1 页代价相同（OFFSET 需要先数过前面所有行）。
+# 下一页的游标放在 X-Next-Cursor 响应头中，响应体仍是列表；没有该响应头表示已是最后一页。
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[type]) -> Optional[List[Any]]:
+    """
+    解析客户端传回的游标，types 为各排序键的类型。游标无效时返回 400。
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(values, types)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after(columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """排序键严格位于游标之后的条件。行值比较可以直接作为复合索引的范围条件。"""
+    key = tuple_(*columns)
+    position = tuple_(*values)
+    return key < position if descending else key > position
+
+
+def page(response: Response, rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> List[Any]:
+    """
+    rows 是按 limit + 1 条查询的结果：多出的一条说明还有下一页，用本页最后一行的排序键生成游标。
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """时间过滤参数统一为 UTC 的 naive datetime（数据库中 created_at 按 UTC 保存、不带时区）。"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
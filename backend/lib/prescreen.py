@@ -0,0 +1,114 @@
+import re
+import unicodedata
+from typing import List, Dict, Any, Tuple
+
+# 仅编号/标题变化的 change_type（由 smart_diff.match_clauses 细分得到）
+COSMETIC_CHANGE_TYPES = ("renumbered", "renamed", "renumbered_and_renamed")
+
+# 数值类提取规则，顺序很重要：先匹配更具体的模式，已匹配的文本不再参与后续匹配
+VALUE_PATTERNS = [
+    ("date", re.compile(r'\d{4}\s*年\s*\d{1,2}\s*月\s*\d{1,2}\s*日|\d{4}[-/.]\d{1,2}[-/.]\d{1,2}')),
+    ("money", re.compile(
+        r'(?:[¥￥$]|RMB|USD|CNY|人民币)\s*\d[\d,，]*(?:\.\d+)?\s*(?:万|亿)?(?:元)?'
+        r'|\d[\d,，]*(?:\.\d+)?\s*(?:万|亿)?元',
+        re.IGNORECASE
+    )),
+    ("percentage", re.compile(r'\d+(?:\.\d+)?\s*[%％]|百分之[零一二三四五六七八九十百点\d.]+')),
+    ("number", re.compile(r'\d+(?:\.\d+)?')),
+]
+
+
+# 数字之间的小数点/千分位（含全角）属于数值本身，不能当作标点去掉（"1.5" 与 "15" 不同）
+_NUMERIC_SEPARATOR = re.compile(r'(?<=\d)[.,，．](?=\d)')
+
+
+def _normalize_cosmetic(text: str) -> str:
+    """
+    去除空白与标点，用于判断是否只是格式/标点调整。数字之间的分隔符保留。
+    """
+    text = text or ""
+    keep = {m.start() for m in _NUMERIC_SEPARATOR.finditer(text)}
+    return "".join(
+        ch for i, ch in enumerate(text)
+        if i in keep or (not ch.isspace() and not unicodedata.category(ch).startswith("P"))
+    )
+
+
+def extract_values(text: str) -> Dict[str, List[str]]:
+    """
+    提取文本中的日期、金额、百分比和其他数字。
+    返回: {"date": [...], "money": [...], "percentage": [...], "number": [...]}
+    """
+    remaining = text or ""
+    values = {}
+    for kind, pattern in VALUE_PATTERNS:
+        found = [re.sub(r'\s+', '', m.group(0)) for m in pattern.finditer(remaining)]
+        if found:
+            values[kind] = found
+        remaining = pattern.sub(" ", remaining)
+    return values
+
+
+def numeric_deltas(original: str, modified: str) -> List[Dict[str, Any]]:
+    """
+    比较新旧文本中提取出的数值，返回发生变化的类别及前后取值。
+    返回: [{"kind": "money", "before": [...], "after": [...]}]
+    """
+    before = extract_values(original)
+    after = extract_values(modified)
+    deltas = []
+    for kind, _ in VALUE_PATTERNS:
+        old_values = before.get(kind, [])
+        new_values = after.get(kind, [])
+        if sorted(old_values) != sorted(new_values):
+            removed = [v for v in old_values if v not in new_values]
+            added = [v for v in new_values if v not in old_values]
+            deltas.append({"kind": kind, "before": removed or old_values, "after": added or new_values})
+    return deltas
+
+
+def prescreen_changes(changes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
+    """
+    在调用模型前用确定性规则预筛变更：
+    - 纯编号/标题调整、仅空白或标点变化的修改：本地判定为低风险，不发送给模型
+    - 涉及日期、金额、百分比、数字变化的修改：提取前后取值并标记，仍交给模型分析
+    返回 (需要模型分析的变更, 本地风险评估 {clause_id: {risk, reason, source}}, 预筛报告)。
+    """
+    llm_changes = []
+    local_assessments = {}
+    flagged = {}
+
+    for change in changes:
+        if change['type'] != 'modified':
+            llm_changes.append(change)
+            continue
+
+        change_type = change.get('change_type')
+        if change_type in COSMETIC_CHANGE_TYPES:
+            local_assessments[change['clause_id']] = {
+                "risk": "low",
+                "reason": "仅条款编号或标题调整，正文未变化。",
+                "source": "rule"
+            }
+            continue
+
+        # 数值变化优先：任何日期/金额/百分比/数字变化都交给模型，不走标点调整的捷径
+        deltas = numeric_deltas(change.get('original'), change.get('modified'))
+        if deltas:
+            flagged[change['clause_id']] = deltas
+        elif _normalize_cosmetic(change.get('original')) == _normalize_cosmetic(change.get('modified')):
+            local_assessments[change['clause_id']] = {
+                "risk": "low",
+                "reason": "仅空白、格式或标点调整，无实质内容变化。",
+                "source": "rule"
+            }
+            continue
+        llm_changes.append(change)
+
+    report = {
+        "total": len(changes),
+        "resolved_locally": len(local_assessments),
+        "sent_to_llm": len(llm_changes),
+        "numeric_deltas": flagged,
+    }
+    return llm_changes, local_assessments, report
@@ -0,0 +1,179 @@
+import json
+import difflib
+from typing import List, Dict, Any, Tuple
+
+# 每个变更片段保留的上下文字符数
+SPAN_CONTEXT_CHARS = 40
+# 每条变更最多保留的变更片段数，超出部分合并为省略提示
+MAX_SPANS_PER_CHANGE = 8
+# 新增/删除条款正文的最大字符数
+MAX_TEXT_CHARS = 800
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地粗略估算 token 数：中日韩字符按 1 字 1 token，其余字符按 4 字符 1 token。
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '　' <= ch <= '鿿' or '＀' <= ch <= '￯')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def to_prompt_json(payload: Any) -> str:
+    """
+    紧凑 JSON 序列化（无缩进、无多余空格），用于拼接到 prompt 中。
+    """
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if text is None or len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "…"
+
+
+def changed_spans(old: str, new: str, context_chars: int = SPAN_CONTEXT_CHARS) -> List[Dict[str, str]]:
+    """
+    字符级比较两段文本，只返回发生变化的片段（各自带有最多 context_chars 个字符的上下文）。
+    返回: [{"old": "...", "new": "..."}]
+    """
+    old = old or ""
+    new = new or ""
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    spans = []
+    for group in matcher.get_grouped_opcodes(context_chars):
+        spans.append({
+            "old": old[group[0][1]:group[-1][2]],
+            "new": new[group[0][3]:group[-1][4]],
+        })
+
+    if len(spans) > MAX_SPANS_PER_CHANGE:
+        omitted = len(spans) - MAX_SPANS_PER_CHANGE
+        spans = spans[:MAX_SPANS_PER_CHANGE] + [{"old": f"…（另有 {omitted} 处修改）", "new": ""}]
+    return spans
+
+
+def compact_change(diff: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将 match_clauses 产生的 diff 项压缩为只包含模型需要的信息：
+    - modified: 只发送变化片段及有限上下文
+    - 重编号/重命名: 只发送新旧编号与标题
+    - added/deleted: 发送截断后的条款正文
+    丢弃 similarity、indent 等与风险判断无关的字段。
+    """
+    item = {"clause_id": diff["clause_id"], "type": diff.get("change_type") or diff["type"]}
+
+    if diff["type"] == "added":
+        item["text"] = _truncate(diff.get("modified"), MAX_TEXT_CHARS)
+    elif diff["type"] == "deleted":
+        item["text"] = _truncate(diff.get("original"), MAX_TEXT_CHARS)
+    elif item["type"] in ("renumbered", "renamed", "renumbered_and_renamed"):
+        if diff.get("old_number") != diff.get("new_number"):
+            item["number"] = [diff.get("old_number"), diff.get("new_number")]
+        if diff.get("old_title") != diff.get("new_title"):
+            item["title"] = [diff.get("old_title"), diff.get("new_title")]
+    else:
+        item["spans"] = changed_spans(diff.get("original"), diff.get("modified"))
+
+    return item
+
+
+def _fit_item(item: Dict[str, Any], token_budget: int) -> Tuple[Dict[str, Any], bool]:
+    """
+    单条变更超出预算时，逐步截半其中的长文本字段直至满足预算。
+    返回 (截断后的条目, 是否发生截断)。
+    """
+    truncated = False
+    max_chars = MAX_TEXT_CHARS
+    while estimate_tokens(to_prompt_json(item)) > token_budget and max_chars > 20:
+        max_chars //= 2
+        truncated = True
+        item = dict(item)
+        if item.get("text"):
+            item["text"] = _truncate(item["text"], max_chars)
+        if item.get("spans"):
+            item["spans"] = [
+                {"old": _truncate(s["old"], max_chars), "new": _truncate(s["new"], max_chars)}
+                for s in item["spans"]
+            ]
+    return item, truncated
+
+
+def build_change_batches(
+    changes: List[Dict[str, Any]],
+    token_budget: int
+) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+    """
+    压缩变更并按每个请求的 token 预算切分批次。
+    返回 (批次列表, token 报告)，报告包含:
+        raw_tokens: 原先 json.dumps(indent=2) 方式的估算 token 数
+        prompt_tokens: 压缩后的估算 token 数
+        saved_tokens: 节省的 token 数
+        truncated_items: 因超出预算被截断的条目数
+        requests: 需要发出的请求数
+    """
+    raw_tokens = estimate_tokens(json.dumps(changes, indent=2, ensure_ascii=False))
+
+    batches = []
+    current = []
+    current_tokens = 0
+    prompt_tokens = 0
+    truncated_items = 0
+
+    for change in changes:
+        item, truncated = _fit_item(compact_change(change), token_budget)
+        truncated_items += int(truncated)
+        tokens = estimate_tokens(to_prompt_json(item))
+        prompt_tokens += tokens
+
+        if current and current_tokens + tokens > token_budget:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    report = {
+        "raw_tokens": raw_tokens,
+        "prompt_tokens": prompt_tokens,
+        "saved_tokens": max(raw_tokens - prompt_tokens, 0),
+        "truncated_items": truncated_items,
+        "requests": len(batches),
+    }
+    return batches, report
+
+
+def compact_evolution(version_changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    压缩条款演变数据：首次出现的版本发送截断后的全文，之后的版本只发送相对上一版本的变化片段。
+    version_changes 元素包含 versionNumber / content / changeFromPrev。
+    """
+    compacted = []
+    prev_content = None
+    for vc in version_changes:
+        content = vc.get('content')
+        if not content:
+            prev_content = None
+            continue
+
+        entry = {"版本号": f"V{vc['versionNumber']}"}
+        change = vc.get('changeFromPrev') or {}
+        if change.get('type'):
+            entry["变化类型"] = change['type']
+        if change.get('summary'):
+            entry["变化摘要"] = change['summary']
+
+        if prev_content is None:
+            entry["内容"] = _truncate(content, MAX_TEXT_CHARS)
+        elif content == prev_content:
+            entry["变化类型"] = "unchanged"
+        else:
+            entry["变化"] = changed_spans(prev_content, content)
+
+        compacted.append(entry)
+        prev_content = content
+    return compacted
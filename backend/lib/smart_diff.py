@@ -96,6 +96,7 @@ def match_clauses(old_clauses: List[Dict], new_clauses: List[Dict]) -> List[Dict
 
             diffs.append({
                 "clause_id": new_c['id'], # Use new ID
+                "old_clause_id": old_c['id'],
                 "type": "modified" if change_type != "unchanged" else "unchanged", # Frontend expects 'modified', 'added', 'deleted', 'unchanged'
                 "change_type": change_type, # Sub-type for UI
                 "original": old_c['text'],
@@ -0,0 +1,10 @@
+import json
+from typing import Any, Dict
+
+# 流式事件响应头：禁止缓存，并关闭 nginx 等反向代理的缓冲，事件随产随发
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """把一个事件编码为 text/event-stream 格式：event 行、JSON 编码的 data 行与结束空行。"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
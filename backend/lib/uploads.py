@@ -0,0 +1,57 @@
+import os
+import asyncio
+import hashlib
+from typing import Tuple
+from fastapi import HTTPException, UploadFile
+
+# 单个上传文件的大小上限（字节）
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# 每次读取/写入的块大小
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# DOCX 是 zip 包，文件必须以本地文件头签名开头
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+
+def _remove_partial(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def save_upload(upload: UploadFile, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[int, str]:
+    """
+    分块把上传文件写入 dest_path，写入的同时计算 sha256，返回 (字节数, sha256)。
+    - 第一块不是 zip 签名时立即拒绝（400），不再读取后续内容
+    - 超过 max_bytes 时中止并删除已写入的部分（413）
+    文件读写都在线程池中执行，不阻塞事件循环。
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File {upload.filename} exceeds the {max_bytes} byte upload limit")
+
+    sha = hashlib.sha256()
+    size = 0
+    out = await asyncio.to_thread(open, dest_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if size == 0 and not chunk.startswith(ZIP_SIGNATURE):
+                raise HTTPException(status_code=400, detail=f"File {upload.filename} is not a valid DOCX document")
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File {upload.filename} exceeds the {max_bytes} byte upload limit")
+            sha.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        out.close()
+        _remove_partial(dest_path)
+        raise
+    out.close()
+
+    if size == 0:
+        _remove_partial(dest_path)
+        raise HTTPException(status_code=400, detail=f"File {upload.filename} is empty")
+    return size, sha.hexdigest()
@@ -0,0 +1,86 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Tuple
+
+# 批量上传时解析/渲染 DOCX 的进程数；0 表示在当前进程内串行处理
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if BATCH_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn：不继承父进程的线程与数据库连接
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def shutdown_pool() -> None:
+    """应用关闭时释放工作进程。"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def map_ordered(fn: Callable[[Any], Any], items: List[Any]) -> List[Tuple[Any, Optional[str]]]:
+    """
+    在进程池中并发执行 fn(item)，按输入顺序返回 [(结果, 错误信息)]。
+    单个文件失败不影响其他文件；工作进程崩溃导致进程池损坏时，剩余文件在当前进程内串行处理。
+    """
+    results = [(None, None)] * len(items)
+    pool = _get_pool() if len(items) > 1 else None
+
+    pending = list(range(len(items)))
+    if pool is not None:
+        futures = [(i, pool.submit(fn, items[i])) for i in pending]
+        pending = []
+        for i, future in futures:
+            try:
+                results[i] = (future.result(), None)
+            except BrokenProcessPool:
+                pending.append(i)
+            except Exception as e:
+                results[i] = (None, f"{type(e).__name__}: {e}")
+        if pending:
+            print(f"Batch worker pool broken; processing {len(pending)} files in-process")
+            _reset_pool()
+
+    for i in pending:
+        try:
+            results[i] = (fn(items[i]), None)
+        except Exception as e:
+            results[i] = (None, f"{type(e).__name__}: {e}")
+    return results
+
+
+def detect_date(file_path: str) -> Optional[str]:
+    """工作进程任务：识别文档日期，返回 ISO 字符串。"""
+    from lib.date_extractor import extract_date_from_docx
+
+    detected = extract_date_from_docx(file_path)
+    return detected.isoformat() if detected else None
+
+
+def render_html(file_path: str) -> str:
+    """工作进程任务：渲染文档 HTML。"""
+    from lib.html_renderer import render_document_to_html
+
+    return render_document_to_html(file_path)
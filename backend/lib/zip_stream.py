@@ -0,0 +1,213 @@
+import io
+import struct
+import zlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+# 流式 ZIP：所有条目不压缩（STORED），条目大小在输出前已知，因此整个压缩包的字节布局与总长度
+# 可以预先算出，任意字节区间都能直接生成（支持 HTTP Range 断点续传），且不需要临时文件。
+# CRC32 写在每个条目之后的数据描述符和中央目录中，流式输出条目内容时顺带计算。
+
+CHUNK_SIZE = 64 * 1024
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP64_EXTRA = struct.Struct("<HHQ")
+_ZIP64_END = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+_END = struct.Struct("<IHHHHIIH")
+
+# bit 3: CRC 与大小写在数据描述符中；bit 11: 文件名为 UTF-8
+_FLAGS = 0x0808
+_VERSION = 20
+_VERSION_ZIP64 = 45
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+_CRC_CACHE_MAX = 4096
+_crc_cache = OrderedDict()
+_crc_lock = threading.Lock()
+
+
+def _cached_crc(key: Any) -> Optional[int]:
+    with _crc_lock:
+        crc = _crc_cache.get(key)
+        if crc is not None:
+            _crc_cache.move_to_end(key)
+        return crc
+
+
+def _remember_crc(key: Any, crc: int) -> None:
+    with _crc_lock:
+        _crc_cache[key] = crc
+        while len(_crc_cache) > _CRC_CACHE_MAX:
+            _crc_cache.popitem(last=False)
+
+
+def _dos_datetime(value: datetime) -> Tuple[int, int]:
+    value = max(value.replace(tzinfo=None), datetime(1980, 1, 1))
+    dos_time = (value.hour << 11) | (value.minute << 5) | (value.second // 2)
+    dos_date = ((value.year - 1980) << 9) | (value.month << 5) | value.day
+    return dos_time, dos_date
+
+
+class ZipEntry:
+    """
+    压缩包中的一个文件。
+    - size: 内容字节数（必须与 open() 读出的内容一致）
+    - open: 返回可读（可 seek）的二进制文件对象
+    - crc32: 已知时直接使用；否则按 crc_key 在进程内缓存，首次需要时读取内容计算
+    """
+
+    def __init__(self, name: str, size: int, modified: Optional[datetime], open: Callable[[], BinaryIO],
+                 crc32: Optional[int] = None, crc_key: Any = None):
+        self.name = name.encode("utf-8")
+        self.size = size
+        self.modified = modified or datetime(1980, 1, 1)
+        self.open = open
+        self.crc32 = crc32
+        self.crc_key = crc_key
+
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes, modified: Optional[datetime],
+                   load: Optional[Callable[[], bytes]] = None) -> "ZipEntry":
+        """
+        内容来自内存/数据库的条目。传入 load 时只保留大小与 CRC，输出时再重新读取内容。
+        """
+        if load is None:
+            return cls(name, len(data), modified, lambda: io.BytesIO(data), crc32=zlib.crc32(data))
+        return cls(name, len(data), modified, lambda: io.BytesIO(load()), crc32=zlib.crc32(data))
+
+
+class StreamingZip:
+    def __init__(self, entries: List[ZipEntry]):
+        self.entries = entries
+        self.offsets = []
+        offset = 0
+        for entry in entries:
+            if entry.size > _MAX_32:
+                raise ValueError(f"Entry too large for streaming export: {entry.name.decode('utf-8')}")
+            self.offsets.append(offset)
+            offset += _LOCAL_HEADER.size + len(entry.name) + entry.size + _DATA_DESCRIPTOR.size
+        self.cd_offset = offset
+        self.cd_size = sum(
+            _CENTRAL_HEADER.size + len(entry.name) + (_ZIP64_EXTRA.size if self.offsets[i] >= _MAX_32 else 0)
+            for i, entry in enumerate(entries)
+        )
+        self.zip64 = len(entries) >= _MAX_16 or self.cd_offset >= _MAX_32 or self.cd_size >= _MAX_32
+        end_size = _END.size + (_ZIP64_END.size + _ZIP64_LOCATOR.size if self.zip64 else 0)
+        self.total_size = self.cd_offset + self.cd_size + end_size
+
+    # -- 各段字节 --
+
+    def _local_header(self, i: int) -> bytes:
+        entry = self.entries[i]
+        dos_time, dos_date = _dos_datetime(entry.modified)
+        return _LOCAL_HEADER.pack(
+            0x04034B50, _VERSION, _FLAGS, 0, dos_time, dos_date, 0, 0, 0, len(entry.name), 0
+        ) + entry.name
+
+    def _crc(self, i: int) -> int:
+        entry = self.entries[i]
+        if entry.crc32 is None and entry.crc_key is not None:
+            entry.crc32 = _cached_crc(entry.crc_key)
+        if entry.crc32 is None:
+            crc = 0
+            with entry.open() as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    crc = zlib.crc32(chunk, crc)
+            self._set_crc(i, crc)
+        return entry.crc32
+
+    def _set_crc(self, i: int, crc: int) -> None:
+        entry = self.entries[i]
+        entry.crc32 = crc
+        if entry.crc_key is not None:
+            _remember_crc(entry.crc_key, crc)
+
+    def _descriptor(self, i: int) -> bytes:
+        entry = self.entries[i]
+        return _DATA_DESCRIPTOR.pack(0x08074B50, self._crc(i), entry.size, entry.size)
+
+    def _central_header(self, i: int) -> bytes:
+        entry = self.entries[i]
+        offset = self.offsets[i]
+        dos_time, dos_date = _dos_datetime(entry.modified)
+        extra = _ZIP64_EXTRA.pack(0x0001, 8, offset) if offset >= _MAX_32 else b""
+        version = _VERSION_ZIP64 if extra else _VERSION
+        return _CENTRAL_HEADER.pack(
+            0x02014B50, version, version, _FLAGS, 0, dos_time, dos_date, self._crc(i), entry.size, entry.size,
+            len(entry.name), len(extra), 0, 0, 0, 0o100644 << 16, min(offset, _MAX_32)
+        ) + entry.name + extra
+
+    def _end_records(self) -> bytes:
+        count = len(self.entries)
+        records = b""
+        if self.zip64:
+            zip64_end_offset = self.cd_offset + self.cd_size
+            records += _ZIP64_END.pack(
+                0x06064B50, _ZIP64_END.size - 12, _VERSION_ZIP64, _VERSION_ZIP64, 0, 0,
+                count, count, self.cd_size, self.cd_offset
+            )
+            records += _ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_end_offset, 1)
+        records += _END.pack(
+            0x06054B50, 0, 0, min(count, _MAX_16), min(count, _MAX_16),
+            min(self.cd_size, _MAX_32), min(self.cd_offset, _MAX_32), 0
+        )
+        return records
+
+    def _data(self, i: int, lo: int, hi: int) -> Iterator[bytes]:
+        """条目内容的 [lo, hi) 区间；完整输出时顺带计算 CRC。"""
+        entry = self.entries[i]
+        whole = lo == 0 and hi == entry.size and entry.crc32 is None
+        crc = 0
+        with entry.open() as f:
+            if lo:
+                f.seek(lo)
+            remaining = hi - lo
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"Entry shorter than expected: {entry.name.decode('utf-8')}")
+                remaining -= len(chunk)
+                if whole:
+                    crc = zlib.crc32(chunk, crc)
+                yield chunk
+        if whole:
+            self._set_crc(i, crc)
+
+    def _segments(self) -> Iterator[Tuple[int, Callable[[int, int], Iterator[bytes]]]]:
+        def fixed(make: Callable[[], bytes]):
+            return lambda lo, hi: iter([make()[lo:hi]])
+
+        for i, entry in enumerate(self.entries):
+            yield _LOCAL_HEADER.size + len(entry.name), fixed(lambda i=i: self._local_header(i))
+            yield entry.size, lambda lo, hi, i=i: self._data(i, lo, hi)
+            yield _DATA_DESCRIPTOR.size, fixed(lambda i=i: self._descriptor(i))
+        for i, entry in enumerate(self.entries):
+            size = _CENTRAL_HEADER.size + len(entry.name) + (_ZIP64_EXTRA.size if self.offsets[i] >= _MAX_32 else 0)
+            yield size, fixed(lambda i=i: self._central_header(i))
+        yield self.total_size - self.cd_offset - self.cd_size, fixed(self._end_records)
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        输出 [start, end] 字节区间（end 包含在内，默认到末尾）。
+        跳过的条目不会被读取，除非之后的数据描述符或中央目录需要它的 CRC（进程内缓存，通常只算一次）。
+        """
+        if end is None:
+            end = self.total_size - 1
+        position = 0
+        for size, produce in self._segments():
+            segment_end = position + size
+            if segment_end > start and size:
+                lo = max(start, position) - position
+                hi = min(end + 1, segment_end) - position
+                for chunk in produce(lo, hi):
+                    if chunk:
+                        yield chunk
+            position = segment_end
+            if position > end:
+                break
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base
 from routers import projects, contracts, versions, diffs, logs, comments, clauses
+from lib.compression import CompressionMiddleware
 
 Base.metadata.create_all(bind=engine)
 
@@ -13,8 +14,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 列表接口的下一页游标
 )
 
+# gzip / brotli 响应压缩（SSE 等流式接口除外）
+app.add_middleware(CompressionMiddleware)
+
 app.include_router(projects.router)
 app.include_router(contracts.router)
 app.include_router(versions.router)
@@ -23,6 +28,18 @@ app.include_router(logs.router)
 app.include_router(comments.router)
 app.include_router(clauses.router)
 
+@app.on_event("shutdown")
+def shutdown_worker_pool():
+    """释放批量上传使用的工作进程"""
+    from lib.worker_pool import shutdown_pool
+    shutdown_pool()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """关闭异步数据库连接池"""
+    from database import dispose_async_engine
+    await dispose_async_engine()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to LexTrace API"}
@@ -31,3 +48,9 @@ def read_root():
 def health_check():
     """健康检查端点，用于 Docker 健康检查"""
     return {"status": "healthy", "service": "lawtrace-backend"}
+
+@app.get("/metrics/ai")
+def ai_metrics():
+    """AI 上游调用指标：熔断器状态、舱壁占用、调用/重试/超时统计"""
+    from lib.ai_engine import get_ai_metrics
+    return get_ai_metrics()
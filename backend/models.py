@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -11,18 +11,22 @@ class Project(Base):
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    contracts = relationship("Contract", back_populates="project", cascade="all, delete-orphan")
+    # 子记录由数据库外键 ON DELETE CASCADE 删除（passive_deletes：ORM 不加载子记录）
+    contracts = relationship("Contract", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
 
 class Contract(Base):
     __tablename__ = "contracts"
+    __table_args__ = (
+        Index("ix_contracts_project_id", "project_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     name = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     project = relationship("Project", back_populates="contracts")
-    versions = relationship("Version", back_populates="contract", cascade="all, delete-orphan")
+    versions = relationship("Version", back_populates="contract", cascade="all, delete-orphan", passive_deletes=True)
 
     @property
     def version_count(self):
@@ -30,24 +34,34 @@ class Contract(Base):
 
 class Version(Base):
     __tablename__ = "versions"
+    __table_args__ = (
+        Index("ix_versions_contract_number", "contract_id", "version_number", unique=True),
+        Index("ix_versions_sha256", "sha256"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    contract_id = Column(Integer, ForeignKey("contracts.id"))
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"))
     version_number = Column(Integer)
-    file_path = Column(String)
+    file_path = Column(String) # "blob:<sha256>" reference into the blob store (legacy rows: path under uploads/)
+    original_filename = Column(String, nullable=True) # Uploaded file name (the blob store key is the content hash)
+    sha256 = Column(String(64), nullable=True) # 上传文件内容哈希（上传时边写边算）
     commit_message = Column(String)
     html_content = Column(Text) # High-fidelity HTML from mammoth
     created_at = Column(DateTime, default=datetime.utcnow)
 
     contract = relationship("Contract", back_populates="versions")
-    diffs = relationship("Diff", back_populates="version", foreign_keys="Diff.version_id")
+    diffs = relationship("Diff", back_populates="version", foreign_keys="Diff.version_id", cascade="all, delete-orphan", passive_deletes=True)
 
 class Diff(Base):
     __tablename__ = "diffs"
+    __table_args__ = (
+        Index("ix_diffs_version_pair", "version_id", "previous_version_id"),
+        Index("ix_diffs_previous_version", "previous_version_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    version_id = Column(Integer, ForeignKey("versions.id"))
-    previous_version_id = Column(Integer, ForeignKey("versions.id"), nullable=True)
+    version_id = Column(Integer, ForeignKey("versions.id", ondelete="CASCADE"))
+    previous_version_id = Column(Integer, ForeignKey("versions.id", ondelete="SET NULL"), nullable=True)
     content = Column(Text) # JSON string for clause-level diffs
     summary = Column(Text) # AI summary
 
@@ -55,9 +69,13 @@ class Diff(Base):
 
 class OperationLog(Base):
     __tablename__ = "operation_logs"
+    __table_args__ = (
+        Index("ix_operation_logs_contract_created_id", "contract_id", "created_at", "id"),
+        Index("ix_operation_logs_contract_action_created_id", "contract_id", "action", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    contract_id = Column(Integer, ForeignKey("contracts.id"))
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"))
     action = Column(String) # e.g., "create_contract", "upload_version", "delete_version"
     details = Column(String) # JSON or text details
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -66,10 +84,14 @@ class OperationLog(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_contract_version_created_id", "contract_id", "version_id", "created_at", "id"),
+        Index("ix_comments_version", "version_id"), # ON DELETE CASCADE from versions
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    contract_id = Column(Integer, ForeignKey("contracts.id"))
-    version_id = Column(Integer, ForeignKey("versions.id"))
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"))
+    version_id = Column(Integer, ForeignKey("versions.id", ondelete="CASCADE"))
     element_id = Column(String) # ID of the diff chunk or clause
     quote = Column(String, nullable=True) # Selected text context
     content = Column(String) # The remark text
@@ -78,7 +100,114 @@ class Comment(Base):
     contract = relationship("Contract", back_populates="comments")
     version = relationship("Version", back_populates="comments")
 
+class ClauseSummary(Base):
+    __tablename__ = "clause_summaries"
+    __table_args__ = (
+        UniqueConstraint("contract_id", "clause_id", "from_version", "to_version", name="uq_clause_summary_range"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), index=True)
+    clause_id = Column(String, index=True)
+    from_version = Column(Integer) # version_number range covered by the summary
+    to_version = Column(Integer)
+    fingerprint = Column(String(64), index=True) # Hash of the clause's content evolution
+    summary = Column(Text) # JSON: {oneLiner, evolutionSummary, riskNotes}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    contract = relationship("Contract", back_populates="clause_summaries")
+
+class ClauseIndexEntry(Base):
+    __tablename__ = "clause_index"
+    __table_args__ = (
+        UniqueConstraint("contract_id", "clause_id", name="uq_clause_index_clause"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), index=True)
+    clause_id = Column(String)
+    has_changes = Column(Boolean, default=False)
+    change_type = Column(String, default="unchanged") # unchanged, added, modified, deleted
+    risk_level = Column(String, default="none")
+    version_count = Column(Integer, default=0) # Number of versions containing the clause
+    first_version = Column(Integer)
+    last_modified_version = Column(Integer, nullable=True)
+    present = Column(Boolean, default=True) # Whether the clause exists in the last indexed version
+    text_hash = Column(String(64), nullable=True) # sha256 of the clause text in the last indexed version
+
+    contract = relationship("Contract", back_populates="clause_index")
+
+class ClauseIndexState(Base):
+    __tablename__ = "clause_index_state"
+
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    version_id = Column(Integer, nullable=True) # Last version folded into the index
+    version_number = Column(Integer, nullable=True)
+    version_count = Column(Integer, default=0) # Number of versions the index was built from
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    contract = relationship("Contract", back_populates="clause_index_state")
+
+class ClauseLineage(Base):
+    __tablename__ = "clause_lineage"
+    __table_args__ = (
+        Index("ix_clause_lineage_clause", "contract_id", "clause_id", "version_number"),
+        Index("ix_clause_lineage_prev", "prev_version_id", "prev_clause_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"))
+    version_id = Column(Integer, ForeignKey("versions.id", ondelete="CASCADE"), index=True)
+    version_number = Column(Integer)
+    clause_id = Column(String, nullable=True) # Null for rows recording a deletion
+    prev_version_id = Column(Integer, nullable=True)
+    prev_clause_id = Column(String, nullable=True) # Matched clause in the previous version
+    change_type = Column(String) # From match_clauses: added, deleted, unchanged, modified, renumbered, ...
+    similarity = Column(Float, default=0.0)
+    number = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    body = Column(Text, nullable=True)
+    content = Column(Text, nullable=True) # Full clause text in this version
+    indent = Column(Integer, default=0)
+
+    version = relationship("Version", back_populates="clause_lineage")
+
+class ClauseLineageState(Base):
+    __tablename__ = "clause_lineage_state"
+
+    version_id = Column(Integer, ForeignKey("versions.id", ondelete="CASCADE"), primary_key=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), index=True)
+    prev_version_id = Column(Integer, nullable=True) # Version the lineage was matched against
+    clause_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    version = relationship("Version", back_populates="clause_lineage_state")
+
+class AICacheEntry(Base):
+    __tablename__ = "ai_cache"
+
+    key = Column(String(64), primary_key=True) # sha256(kind, model, prompt version, payload)
+    kind = Column(String, index=True) # e.g., "diff_analysis", "clause_evolution"
+    model = Column(String)
+    result = Column(Text) # JSON string of the parsed AI result
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    hit_count = Column(Integer, default=0)
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True) # Content hash; the blob store key
+    size = Column(Integer)
+    ref_count = Column(Integer, default=0) # Number of versions referencing this blob
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # Update Contract relationship
-Contract.logs = relationship("OperationLog", back_populates="contract", cascade="all, delete-orphan")
-Contract.comments = relationship("Comment", back_populates="contract", cascade="all, delete-orphan")
-Version.comments = relationship("Comment", back_populates="version", cascade="all, delete-orphan")
+Contract.logs = relationship("OperationLog", back_populates="contract", cascade="all, delete-orphan", passive_deletes=True)
+Contract.comments = relationship("Comment", back_populates="contract", cascade="all, delete-orphan", passive_deletes=True)
+Version.comments = relationship("Comment", back_populates="version", cascade="all, delete-orphan", passive_deletes=True)
+Contract.clause_summaries = relationship("ClauseSummary", back_populates="contract", cascade="all, delete-orphan", passive_deletes=True)
+Contract.clause_index = relationship("ClauseIndexEntry", back_populates="contract", cascade="all, delete-orphan", passive_deletes=True)
+Contract.clause_index_state = relationship("ClauseIndexState", back_populates="contract", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+Version.clause_lineage = relationship("ClauseLineage", back_populates="version", cascade="all, delete-orphan", passive_deletes=True)
+Version.clause_lineage_state = relationship("ClauseLineageState", back_populates="version", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, defer
 from typing import List, Dict, Any, Optional
-import models, database
+import models, schemas, database
 from lib.doc_parser import extract_clauses
-from lib.smart_diff import calculate_similarity
-from lib.ai_engine import analyze_clause_evolution
+from lib.ai_engine import analyze_clause_evolution, analyze_clause_evolution_batch
+from lib.clause_history import changed_clause_ids, version_changes_for_ai
+from lib.clause_lineage import blame_clause, ensure_contract_lineage, lineage_histories, lineage_history
+from lib.clause_matrix import stream_clause_matrix
+from lib.clause_index import get_clause_index
+from lib.clause_summaries import evolution_fingerprint, find_stored_summary, store_summary
+from lib.http_cache import REVALIDATE, is_not_modified, make_etag, not_modified, set_cache_headers, version_fingerprint
 import json
 
 router = APIRouter(
@@ -76,101 +83,29 @@ def build_clause_tree(clauses: List[Dict], all_version_changes: Dict[str, Dict])
 
 def analyze_clause_changes(contract_id: int, db: Session) -> Dict[str, Dict]:
     """
-    Analyze all versions to determine clause change information.
-    Returns: {clause_id: {has_changes, change_type, risk_level, version_count}}
+    Clause change information across all versions, served from the persisted clause index.
+    Returns: {clause_id: {has_changes, change_type, risk_level, version_count, first_version, last_modified_version}}
     """
-    versions = db.query(models.Version).filter(
-        models.Version.contract_id == contract_id
-    ).order_by(models.Version.version_number).all()
-    
-    if not versions:
-        return {}
-    
-    clause_info = {}
-    prev_clauses_map = {}
-    
-    for i, version in enumerate(versions):
-        if not version.file_path:
-            continue
-            
-        try:
-            clauses = extract_clauses(version.file_path)
-        except Exception as e:
-            print(f"Error extracting clauses from version {version.id}: {e}")
-            continue
-        
-        current_clauses_map = {c['id']: c for c in clauses}
-        
-        for clause_id, clause in current_clauses_map.items():
-            if clause_id not in clause_info:
-                clause_info[clause_id] = {
-                    'has_changes': False,
-                    'change_type': 'unchanged',
-                    'risk_level': 'none',
-                    'version_count': 0,
-                    'first_version': version.version_number,
-                    'last_modified_version': None,
-                }
-            
-            info = clause_info[clause_id]
-            info['version_count'] += 1
-            
-            # Check for changes from previous version
-            if i > 0 and prev_clauses_map:
-                prev_clause = prev_clauses_map.get(clause_id)
-                
-                if prev_clause is None:
-                    # Clause was added in this version
-                    info['has_changes'] = True
-                    info['change_type'] = 'added'
-                    info['last_modified_version'] = version.version_number
-                    # Mark first version as current (it didn't exist before)
-                    info['first_version'] = version.version_number
-                elif prev_clause['text'] != clause['text']:
-                    # Clause was modified
-                    info['has_changes'] = True
-                    if info['change_type'] == 'unchanged':
-                        info['change_type'] = 'modified'
-                    info['last_modified_version'] = version.version_number
-                    
-                    # Risk level: temporarily disabled, will be handled by AI later
-                    # info['risk_level'] remains 'none'
-        
-        # Check for deleted clauses
-        if i > 0 and prev_clauses_map:
-            for prev_id in prev_clauses_map:
-                if prev_id not in current_clauses_map:
-                    if prev_id not in clause_info:
-                        clause_info[prev_id] = {
-                            'has_changes': True,
-                            'change_type': 'deleted',
-                            'risk_level': 'none',  # Risk level disabled, will use AI later
-                            'version_count': i,
-                            'first_version': 1,
-                            'last_modified_version': version.version_number,
-                        }
-                    else:
-                        clause_info[prev_id]['has_changes'] = True
-                        clause_info[prev_id]['change_type'] = 'deleted'
-                        clause_info[prev_id]['last_modified_version'] = version.version_number
-        
-        prev_clauses_map = current_clauses_map
-    
-    return clause_info
+    return get_clause_index(db, contract_id)
 
 
 @router.get("/tree")
-def get_clause_tree(contract_id: int, db: Session = Depends(database.get_db)):
+def get_clause_tree(contract_id: int, request: Request, response: Response, db: Session = Depends(database.get_db)):
     """
     Get the clause tree for a contract based on the latest version.
     """
-    # Get latest version
-    latest_version = db.query(models.Version).filter(
-        models.Version.contract_id == contract_id
-    ).order_by(models.Version.version_number.desc()).first()
+    versions = load_versions(contract_id, None, None, db)
     
-    if not latest_version:
+    if not versions:
         return []
+
+    # The tree only changes when versions are added or removed
+    etag = make_etag("tree", [version_fingerprint(v) for v in versions])
+    if is_not_modified(request, etag):
+        return not_modified(etag, REVALIDATE)
+    set_cache_headers(response, etag, REVALIDATE)
+
+    latest_version = versions[-1]
     
     # Extract clauses from latest version
     try:
@@ -187,163 +122,99 @@ def get_clause_tree(contract_id: int, db: Session = Depends(database.get_db)):
     return tree
 
 
+@router.get("/matrix")
+def get_clause_matrix(
+    contract_id: int,
+    request: Request,
+    from_version: Optional[int] = None,
+    to_version: Optional[int] = None,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Clause x version matrix for the whole history (or a version range), computed in one
+    pass over the stored clause lineage: one status string per clause (one character per version
+    column) plus short hashes of the cells whose text changed.
+    Rows come in a stable order: clauses present in the last version of the range in that version's
+    document order, then clauses that disappeared earlier, by the version they were last seen in
+    and their document position there.
+    """
+    versions = load_versions(contract_id, from_version, to_version, db)
+    if not versions:
+        raise HTTPException(status_code=404, detail="No versions found")
+
+    etag = make_etag("matrix", [version_fingerprint(v) for v in versions])
+    if is_not_modified(request, etag):
+        return not_modified(etag, REVALIDATE)
+
+    ensure_contract_lineage(db, contract_id)
+    columns = [(v.id, v.version_number) for v in versions]
+
+    return StreamingResponse(
+        stream_clause_matrix(columns),
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": REVALIDATE},
+    )
+
+
 @router.get("/{clause_id}/history")
-def get_clause_history(
+async def get_clause_history(
     contract_id: int, 
     clause_id: str, 
+    request: Request,
+    response: Response,
     from_version: Optional[int] = None,
     to_version: Optional[int] = None,
+    refresh: bool = False,
     db: Session = Depends(database.get_db)
 ):
     """
     Get the history of a specific clause across all versions.
+    Pass refresh=true to regenerate the AI summary instead of serving it from cache.
     """
-    # Get all versions
-    query = db.query(models.Version).filter(
-        models.Version.contract_id == contract_id
+    # Revalidate against the versions in range and the stored AI summaries before any work
+    etag = await run_in_threadpool(history_etag, contract_id, clause_id, from_version, to_version, db)
+    if etag and not refresh and is_not_modified(request, etag):
+        return not_modified(etag, REVALIDATE)
+
+    # Lineage lookups are blocking DB work; keep them off the event loop
+    clause_path, version_states = await run_in_threadpool(
+        collect_clause_history, contract_id, clause_id, from_version, to_version, db
     )
     
-    if from_version:
-        query = query.filter(models.Version.version_number >= from_version)
-    if to_version:
-        query = query.filter(models.Version.version_number <= to_version)
-    
-    versions = query.order_by(models.Version.version_number).all()
-    
-    if not versions:
-        raise HTTPException(status_code=404, detail="No versions found")
-    
-    version_states = []
-    prev_content = None
-    clause_path = []
-    
-    for i, version in enumerate(versions):
-        try:
-            clauses = extract_clauses(version.file_path)
-        except Exception as e:
-            print(f"Error extracting clauses: {e}")
-            continue
-        
-        # Find matching clause by ID or similar content
-        matching_clause = None
-        for c in clauses:
-            if c['id'] == clause_id:
-                matching_clause = c
-                break
-        
-        # If not found by ID, try fuzzy match
-        if not matching_clause and prev_content:
-            best_match = None
-            best_score = 0
-            for c in clauses:
-                score = calculate_similarity(prev_content, c['text'])
-                if score > best_score and score > 0.5:
-                    best_score = score
-                    best_match = c
-            if best_match:
-                matching_clause = best_match
-        
-        # Determine status and change info
-        if matching_clause:
-            content = matching_clause['text']
-            preview = content[:100] + ('...' if len(content) > 100 else '')
-            
-            # Build clause path
-            if not clause_path:
-                parts = []
-                if matching_clause.get('number'):
-                    parts.append(matching_clause['number'])
-                if matching_clause.get('title'):
-                    parts.append(matching_clause['title'])
-                clause_path = [' '.join(parts)] if parts else [f"条款 {clause_id}"]
-            
-            # Determine change from previous
-            change_from_prev = None
-            if i > 0:
-                if prev_content is None:
-                    change_from_prev = {
-                        "type": "added",
-                        "summary": "本版本新增此条款"
-                    }
-                elif content != prev_content:
-                    # Generate change summary
-                    similarity = calculate_similarity(prev_content, content)
-                    if similarity > 0.95:
-                        summary = "细微调整"
-                    elif similarity > 0.8:
-                        summary = "部分内容修改"
-                    else:
-                        summary = "重大内容变更"
-                    
-                    # Try to detect specific changes
-                    if len(content) > len(prev_content) * 1.5:
-                        summary = "新增大量内容"
-                    elif len(content) < len(prev_content) * 0.7:
-                        summary = "删减部分内容"
-                    
-                    change_from_prev = {
-                        "type": "modified",
-                        "summary": summary
-                    }
-                else:
-                    change_from_prev = {
-                        "type": "unchanged",
-                        "summary": "无变化"
-                    }
-            
-            version_states.append({
-                "versionId": version.id,
-                "versionNumber": version.version_number,
-                "createdAt": version.created_at.isoformat(),
-                "status": "exists",
-                "content": content,
-                "preview": preview,
-                "changeFromPrev": change_from_prev
-            })
-            
-            prev_content = content
-        else:
-            # Clause doesn't exist in this version
-            change_from_prev = None
-            if i > 0 and prev_content:
-                change_from_prev = {
-                    "type": "deleted",
-                    "summary": "本版本删除此条款"
-                }
-            
-            version_states.append({
-                "versionId": version.id,
-                "versionNumber": version.version_number,
-                "createdAt": version.created_at.isoformat(),
-                "status": "not_exists",
-                "content": None,
-                "preview": "（本版本不包含此条款）",
-                "changeFromPrev": change_from_prev
-            })
-            
-            prev_content = None
-    
     # Generate AI summary based on version changes
     ai_summary = None
+    stored = False
     
     if version_states:
         # 准备 AI 分析所需的数据
-        version_changes_for_ai = [
-            {
-                "versionNumber": vs["versionNumber"],
-                "content": vs["content"],
-                "changeFromPrev": vs.get("changeFromPrev")
-            }
-            for vs in version_states
-        ]
-        
-        # 调用 AI 分析条款演变
-        ai_summary = analyze_clause_evolution(
-            clause_id=clause_id,
-            clause_path=clause_path,
-            version_changes=version_changes_for_ai
-        )
+        version_changes = version_changes_for_ai(version_states)
+        fingerprint = evolution_fingerprint(version_changes)
+
+        # 优先使用上传新版本后批量生成的总结，未命中时再按需调用 AI
+        if not refresh:
+            ai_summary = await run_in_threadpool(find_stored_summary, db, contract_id, clause_id, fingerprint)
+
+        if ai_summary is None:
+            ai_summary = await analyze_clause_evolution(
+                clause_id=clause_id,
+                clause_path=clause_path,
+                version_changes=version_changes,
+                refresh=refresh
+            )
+            if ai_summary.get("source") != "rule":
+                await run_in_threadpool(
+                    store_summary, db, contract_id, clause_id,
+                    version_states[0]["versionNumber"], version_states[-1]["versionNumber"],
+                    fingerprint, ai_summary
+                )
+                stored = True
     
+    if etag:
+        # A summary stored by this request changes the ETag for the next one
+        if stored:
+            etag = await run_in_threadpool(history_etag, contract_id, clause_id, from_version, to_version, db)
+        set_cache_headers(response, etag, REVALIDATE)
+
     return {
         "clauseId": clause_id,
         "clausePath": clause_path,
@@ -351,3 +222,169 @@ def get_clause_history(
         "aiSummary": ai_summary
     }
 
+
+@router.post("/history")
+async def get_clause_histories(
+    contract_id: int,
+    request: schemas.ClauseHistoryBulkRequest,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Bulk clause history: histories for many clauses (or every changed clause when
+    clause_ids is omitted) in one pass over the lineage of the requested version range.
+    AI summaries are off by default; when requested, stored summaries are reused and
+    the misses are generated together in batched model calls.
+    """
+    histories = await run_in_threadpool(
+        collect_clause_histories, contract_id, request.clause_ids, request.from_version, request.to_version, db
+    )
+
+    summaries = {}
+    if request.include_ai_summary:
+        pending = []
+        for clause_id, (clause_path, version_states) in histories.items():
+            if not version_states:
+                continue
+            version_changes = version_changes_for_ai(version_states)
+            fingerprint = evolution_fingerprint(version_changes)
+            stored = await run_in_threadpool(find_stored_summary, db, contract_id, clause_id, fingerprint)
+            if stored is not None:
+                summaries[clause_id] = stored
+                continue
+            pending.append({
+                "clause_id": clause_id,
+                "clause_path": clause_path,
+                "version_changes": version_changes,
+                "fingerprint": fingerprint,
+                "from_version": version_states[0]["versionNumber"],
+                "to_version": version_states[-1]["versionNumber"],
+            })
+
+        if pending:
+            generated = await analyze_clause_evolution_batch(pending)
+            for item in pending:
+                summary = generated.get(item["clause_id"])
+                if not summary:
+                    continue
+                summaries[item["clause_id"]] = summary
+                await run_in_threadpool(
+                    store_summary, db, contract_id, item["clause_id"], item["from_version"], item["to_version"],
+                    item["fingerprint"], summary
+                )
+
+    return {
+        "histories": {
+            clause_id: {
+                "clauseId": clause_id,
+                "clausePath": clause_path,
+                "versionStates": version_states,
+                "aiSummary": summaries.get(clause_id)
+            }
+            for clause_id, (clause_path, version_states) in histories.items()
+        }
+    }
+
+
+@router.get("/{clause_id}/blame")
+def get_clause_blame(
+    contract_id: int,
+    clause_id: str,
+    version: Optional[int] = None,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Blame-style lookup: the version that introduced the clause's current text,
+    where the clause first appeared, and every version that changed it.
+    Pass version to blame the clause as of that version number.
+    """
+    ensure_contract_lineage(db, contract_id)
+    blame = blame_clause(db, contract_id, clause_id, version)
+    if blame is None:
+        raise HTTPException(status_code=404, detail="Clause not found")
+    return blame
+
+
+def load_versions(contract_id: int, from_version: Optional[int], to_version: Optional[int], db: Session) -> List[models.Version]:
+    """
+    Load the contract's versions in the requested range, ordered by version number.
+    """
+    query = db.query(models.Version).filter(
+        models.Version.contract_id == contract_id
+    )
+    
+    if from_version:
+        query = query.filter(models.Version.version_number >= from_version)
+    if to_version:
+        query = query.filter(models.Version.version_number <= to_version)
+    
+    return query.options(defer(models.Version.html_content)).order_by(models.Version.version_number).all()
+
+
+def collect_clause_history(
+    contract_id: int,
+    clause_id: str,
+    from_version: Optional[int],
+    to_version: Optional[int],
+    db: Session
+):
+    """
+    Follow a clause through the contract's versions using the clause lineage graph.
+    Returns (clause_path, version_states).
+    """
+    versions = load_versions(contract_id, from_version, to_version, db)
+    
+    if not versions:
+        raise HTTPException(status_code=404, detail="No versions found")
+    
+    # Graph walk over the persisted lineage; only versions missing lineage are parsed
+    ensure_contract_lineage(db, contract_id)
+    return lineage_history(db, contract_id, clause_id, versions)
+
+
+def collect_clause_histories(
+    contract_id: int,
+    clause_ids: Optional[List[str]],
+    from_version: Optional[int],
+    to_version: Optional[int],
+    db: Session
+):
+    """
+    Follow many clauses through the contract's versions with a single lineage query.
+    clause_ids=None selects every clause that was added, modified or deleted in the range.
+    Returns {clause_id: (clause_path, version_states)}.
+    """
+    versions = load_versions(contract_id, from_version, to_version, db)
+
+    if not versions:
+        raise HTTPException(status_code=404, detail="No versions found")
+
+    ensure_contract_lineage(db, contract_id)
+    histories = lineage_histories(db, contract_id, clause_ids, versions)
+    if clause_ids is None:
+        histories = {clause_id: histories[clause_id] for clause_id in changed_clause_ids(histories)}
+    return histories
+
+
+def history_etag(
+    contract_id: int,
+    clause_id: str,
+    from_version: Optional[int],
+    to_version: Optional[int],
+    db: Session
+) -> Optional[str]:
+    """
+    ETag for a clause history: the versions in range plus the stored summaries for the clause.
+    Returns None when there are no versions (the handler answers 404).
+    """
+    versions = load_versions(contract_id, from_version, to_version, db)
+    if not versions:
+        return None
+    summaries = db.query(models.ClauseSummary.id, models.ClauseSummary.fingerprint, models.ClauseSummary.summary).filter(
+        models.ClauseSummary.contract_id == contract_id,
+        models.ClauseSummary.clause_id == clause_id
+    ).order_by(models.ClauseSummary.id).all()
+    return make_etag(
+        "history", clause_id,
+        [version_fingerprint(v) for v in versions],
+        [[row.id, row.fingerprint, row.summary] for row in summaries]
+    )
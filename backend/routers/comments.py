@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import models, schemas, database
 from datetime import datetime, timezone
+from lib.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, after, decode_cursor, page
 
 router = APIRouter(
     prefix="/contracts/{contract_id}/versions/{version_id}/comments",
@@ -10,19 +12,19 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.Comment)
-def create_comment(
+async def create_comment(
     contract_id: int,
     version_id: int,
     comment: schemas.CommentCreate,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     # Verify contract and version exist
-    version = db.query(models.Version).filter(
+    version = await db.scalar(select(models.Version.id).where(
         models.Version.id == version_id,
         models.Version.contract_id == contract_id
-    ).first()
+    ))
     
-    if not version:
+    if version is None:
         raise HTTPException(status_code=404, detail="Version not found")
 
     db_comment = models.Comment(
@@ -34,41 +36,50 @@ def create_comment(
         created_at=datetime.now(timezone.utc)
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
     
     return db_comment
 
 @router.get("/", response_model=List[schemas.Comment])
-def read_comments(
+async def read_comments(
     contract_id: int,
     version_id: int,
-    db: Session = Depends(database.get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    comments = db.query(models.Comment).filter(
+    # Newest first; the next page's cursor is returned in X-Next-Cursor
+    key = (models.Comment.created_at, models.Comment.id)
+    query = select(models.Comment).where(
         models.Comment.contract_id == contract_id,
         models.Comment.version_id == version_id
-    ).order_by(models.Comment.created_at.desc()).all()
-    
-    return comments
+    )
+    position = decode_cursor(cursor, (datetime, int))
+    if position:
+        query = query.where(after(key, position, descending=True))
+
+    comments = await db.scalars(query.order_by(*(column.desc() for column in key)).limit(limit + 1))
+    return page(response, comments.all(), limit, lambda comment: (comment.created_at, comment.id))
 
 @router.delete("/{comment_id}", status_code=204)
-def delete_comment(
+async def delete_comment(
     contract_id: int,
     version_id: int,
     comment_id: int,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    comment = db.query(models.Comment).filter(
+    comment = await db.scalar(select(models.Comment).where(
         models.Comment.id == comment_id,
         models.Comment.contract_id == contract_id,
         models.Comment.version_id == version_id
-    ).first()
+    ))
     
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
         
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await db.commit()
     
     return None
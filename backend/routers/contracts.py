@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, Form, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional
 import models, schemas, database
+from lib.blob_refs import purge_files_task, release_versions
+from lib.export_archive import archive_response, build_contract_export
+from lib.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, after, decode_cursor, page
 from database import get_db
 
 router = APIRouter(
@@ -9,17 +15,30 @@ router = APIRouter(
     tags=["contracts"],
 )
 
+def _version_count():
+    # 相关子查询走 ix_versions_contract_number，不加载版本
+    return select(func.count(models.Version.id)).where(
+        models.Version.contract_id == models.Contract.id
+    ).correlate(models.Contract).scalar_subquery()
+
+def _contract_out(contract: models.Contract, version_count: int) -> schemas.Contract:
+    # 异步会话不能懒加载 Contract.versions，版本数由查询直接给出
+    return schemas.Contract(
+        id=contract.id, name=contract.name, project_id=contract.project_id,
+        created_at=contract.created_at, version_count=version_count or 0
+    )
+
 @router.post("/", response_model=schemas.Contract)
-def create_contract(contract: schemas.ContractCreate, db: Session = Depends(database.get_db)):
+async def create_contract(contract: schemas.ContractCreate, db: AsyncSession = Depends(database.get_async_db)):
     # Verify project exists
-    project = db.query(models.Project).filter(models.Project.id == contract.project_id).first()
+    project = await db.get(models.Project, contract.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
         
     db_contract = models.Contract(name=contract.name, project_id=contract.project_id)
     db.add(db_contract)
-    db.commit()
-    db.refresh(db_contract)
+    await db.commit()
+    await db.refresh(db_contract)
     
     # Log operation
     log = models.OperationLog(
@@ -28,34 +47,63 @@ def create_contract(contract: schemas.ContractCreate, db: Session = Depends(data
         details=f"Created contract '{contract.name}' in project {contract.project_id}"
     )
     db.add(log)
-    db.commit()
+    await db.commit()
     
-    return db_contract
+    return _contract_out(db_contract, 0)
 
 @router.get("/", response_model=List[schemas.Contract])
-def read_contracts(project_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    contracts = db.query(models.Contract).filter(models.Contract.project_id == project_id).options(joinedload(models.Contract.versions)).offset(skip).limit(limit).all()
-    for c in contracts:
-        print(f"DEBUG API: Contract {c.id} versions: {len(c.versions)} count_prop: {c.version_count}")
-    return contracts
+async def read_contracts(
+    project_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    # Oldest first; the next page's cursor is returned in X-Next-Cursor
+    query = select(models.Contract, _version_count()).where(models.Contract.project_id == project_id)
+    position = decode_cursor(cursor, (int,))
+    if position:
+        query = query.where(after((models.Contract.id,), position))
+    rows = (await db.execute(query.order_by(models.Contract.id).limit(limit + 1))).all()
+    contracts = [_contract_out(contract, version_count) for contract, version_count in rows]
+    return page(response, contracts, limit, lambda contract: (contract.id,))
 
 @router.get("/{contract_id}", response_model=schemas.Contract)
-def read_contract(contract_id: int, db: Session = Depends(database.get_db)):
+async def read_contract(contract_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    row = (await db.execute(
+        select(models.Contract, _version_count()).where(models.Contract.id == contract_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    return _contract_out(*row)
+
+@router.get("/{contract_id}/export")
+def export_contract(contract_id: int, request: Request, db: Session = Depends(database.get_db)):
+    """
+    Streams a zip with every version document, its rendered HTML and the clause diff between
+    each pair of adjacent versions. Supports Range / If-Range for resuming interrupted downloads.
+    """
     contract = db.query(models.Contract).filter(models.Contract.id == contract_id).first()
     if contract is None:
         raise HTTPException(status_code=404, detail="Contract not found")
-    return contract
+    fingerprint, build = build_contract_export(db, contract)
+    return archive_response(request, fingerprint, build, f"{contract.name or contract.id}.zip")
 
 @router.delete("/{contract_id}", status_code=204)
-def delete_contract(contract_id: int, db: Session = Depends(database.get_db)):
-    contract = db.query(models.Contract).filter(models.Contract.id == contract_id).first()
-    if not contract:
+def delete_contract(contract_id: int, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
+    if db.query(models.Contract.id).filter(models.Contract.id == contract_id).first() is None:
         raise HTTPException(status_code=404, detail="Contract not found")
     
-    # Cascade delete is handled by database foreign keys usually, 
-    # but for SQLite we might need to ensure it or handle manually if not set.
-    # SQLAlchemy relationship with cascade="all, delete" should handle it.
-    db.delete(contract)
-    db.commit()
+    # 版本、评论、日志、条款索引等由数据库外键 ON DELETE CASCADE 删除，不加载到内存；
+    # 文件引用计数在同一事务中按 blob 聚合扣减，文件本身在响应返回后清理
+    orphaned = release_versions(db, models.Version.contract_id == contract_id)
+    try:
+        db.query(models.Contract).filter(models.Contract.id == contract_id).delete(synchronize_session=False)
+        db.commit()
+    except IntegrityError:
+        # 旧的 SQLite 数据库外键没有 ON DELETE CASCADE，需先运行 migrate_db.py 重建
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Database schema lacks cascading foreign keys; run migrate_db.py")
+    background_tasks.add_task(purge_files_task, orphaned)
     return None
 
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, defer
 import models, schemas, database
+from lib.http_cache import IMMUTABLE, REVALIDATE, is_not_modified, make_etag, not_modified, set_cache_headers, version_fingerprint
+from lib.sse import SSE_HEADERS, sse_event
 import json
 
 router = APIRouter(
@@ -9,15 +13,31 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=schemas.DiffResponse)
-def get_diff(contract_id: int, version_id: int, compare_with: int = None, db: Session = Depends(database.get_db)):
+def get_diff(
+    contract_id: int,
+    version_id: int,
+    request: Request,
+    response: Response,
+    compare_with: int = None,
+    mode: str = "direct",
+    db: Session = Depends(database.get_db)
+):
+    """
+    Clause-level diff between a version and its predecessor (or compare_with).
+    mode=composed derives the diff from stored adjacent-version matches instead of
+    re-parsing both files; it falls back to a direct comparison when that is ambiguous.
+    """
+    if mode not in ("direct", "composed"):
+        raise HTTPException(status_code=400, detail="mode must be 'direct' or 'composed'")
+
     # Get current version (Target)
-    version = db.query(models.Version).filter(models.Version.id == version_id).first()
+    version = db.query(models.Version).filter(models.Version.id == version_id).options(defer(models.Version.html_content)).first()
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
     
     # Get comparison version (Base)
     if compare_with:
-        previous_version = db.query(models.Version).filter(models.Version.id == compare_with).first()
+        previous_version = db.query(models.Version).filter(models.Version.id == compare_with).options(defer(models.Version.html_content)).first()
         if not previous_version:
              raise HTTPException(status_code=404, detail="Comparison version not found")
     else:
@@ -25,7 +45,7 @@ def get_diff(contract_id: int, version_id: int, compare_with: int = None, db: Se
         previous_version = db.query(models.Version).filter(
             models.Version.contract_id == contract_id,
             models.Version.version_number < version.version_number
-        ).order_by(models.Version.version_number.desc()).first()
+        ).options(defer(models.Version.html_content)).order_by(models.Version.version_number.desc()).first()
 
     if not previous_version:
         return {
@@ -34,11 +54,35 @@ def get_diff(contract_id: int, version_id: int, compare_with: int = None, db: Se
             "summary": "First version. No changes to compare."
         }
 
+    # Both versions are immutable: answer revalidations before parsing anything.
+    # An explicit pair never changes; the implicit "previous version" can, if one is deleted.
+    etag_parts = ["diff", version_fingerprint(previous_version), version_fingerprint(version)]
+    cache_control = IMMUTABLE if compare_with else REVALIDATE
+    if mode == "composed":
+        # Composition also depends on every version in between
+        between = db.query(models.Version).filter(
+            models.Version.contract_id == contract_id,
+            models.Version.version_number > previous_version.version_number,
+            models.Version.version_number < version.version_number
+        ).options(defer(models.Version.html_content)).order_by(models.Version.version_number).all()
+        etag_parts += ["composed", [version_fingerprint(v) for v in between]]
+        cache_control = REVALIDATE
+    etag = make_etag(*etag_parts)
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control)
+    set_cache_headers(response, etag, cache_control)
+
     # Generate Diff
     try:
         from lib.diff_engine import compare_versions
+        from lib.diff_composer import compose_diff
         
-        raw_diffs = compare_versions(previous_version.file_path, version.file_path)
+        raw_diffs = None
+        if mode == "composed":
+            raw_diffs = compose_diff(db, contract_id, previous_version, version)
+        response.headers["X-Diff-Mode"] = "composed" if raw_diffs is not None else "direct"
+        if raw_diffs is None:
+            raw_diffs = compare_versions(previous_version.file_path, version.file_path)
         
         # Log comparison
         log_details = json.dumps({
@@ -74,8 +118,10 @@ def get_diff(contract_id: int, version_id: int, compare_with: int = None, db: Se
         print(f"Diff generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Diff generation failed: {str(e)}")
 
-@router.get("/analysis", response_model=schemas.AnalysisResponse)
-def get_analysis(contract_id: int, version_id: int, compare_with: int = None, db: Session = Depends(database.get_db)):
+def _resolve_versions(contract_id: int, version_id: int, compare_with: int, db: Session):
+    """
+    Returns (target_version, base_version); base_version is None for the first version.
+    """
     # Get current version (Target)
     version = db.query(models.Version).filter(models.Version.id == version_id).first()
     if not version:
@@ -93,6 +139,14 @@ def get_analysis(contract_id: int, version_id: int, compare_with: int = None, db
             models.Version.version_number < version.version_number
         ).order_by(models.Version.version_number.desc()).first()
 
+    return version, previous_version
+
+@router.get("/analysis", response_model=schemas.AnalysisResponse)
+async def get_analysis(contract_id: int, version_id: int, compare_with: int = None, refresh: bool = False, chunked: bool = False, db: Session = Depends(database.get_db)):
+    # DB lookups and diffing are blocking; run them in the threadpool so the
+    # event loop stays free while waiting on the AI upstream.
+    version, previous_version = await run_in_threadpool(_resolve_versions, contract_id, version_id, compare_with, db)
+
     if not previous_version:
         return {
             "summary": "First version. No analysis needed.",
@@ -104,11 +158,49 @@ def get_analysis(contract_id: int, version_id: int, compare_with: int = None, db
         from lib.diff_engine import compare_versions
         from lib.ai_engine import analyze_diffs
         
-        raw_diffs = compare_versions(previous_version.file_path, version.file_path)
-        ai_result = analyze_diffs(raw_diffs)
+        raw_diffs = await run_in_threadpool(compare_versions, previous_version.file_path, version.file_path)
+        ai_result = await analyze_diffs(raw_diffs, refresh=refresh, chunked=chunked)
         
         return ai_result
         
     except Exception as e:
         print(f"Analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.get("/analysis/stream")
+def stream_analysis(contract_id: int, version_id: int, compare_with: int = None, refresh: bool = False, db: Session = Depends(database.get_db)):
+    """
+    Server-sent events variant of /analysis. Emits `meta`, incremental `summary` text,
+    per-clause `risk` assessments as they arrive, and finally `result` with the merged
+    analysis (same shape as /analysis). Failures are reported as an `error` event.
+    """
+    version, previous_version = _resolve_versions(contract_id, version_id, compare_with, db)
+
+    base_path = previous_version.file_path if previous_version else None
+    target_path = version.file_path
+
+    async def event_stream():
+        from lib.diff_engine import compare_versions
+        from lib.ai_engine import stream_diff_analysis
+
+        if not base_path:
+            yield sse_event("result", {
+                "summary": "First version. No analysis needed.",
+                "risk_assessments": {}
+            })
+            return
+
+        try:
+            # Diffing is CPU-bound; keep it off the event loop
+            raw_diffs = await run_in_threadpool(compare_versions, base_path, target_path)
+            async for event in stream_diff_analysis(raw_diffs, refresh=refresh):
+                yield sse_event(event["event"], event["data"])
+        except Exception as e:
+            print(f"Analysis stream failed: {e}")
+            yield sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
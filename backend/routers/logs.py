@@ -1,12 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
 import models, schemas
-from database import get_db
+from database import get_async_db
+from lib.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, after, decode_cursor, naive_utc, page
 
 router = APIRouter()
 
 @router.get("/contracts/{contract_id}/logs", response_model=List[schemas.OperationLog])
-def get_contract_logs(contract_id: int, db: Session = Depends(get_db)):
-    logs = db.query(models.OperationLog).filter(models.OperationLog.contract_id == contract_id).order_by(models.OperationLog.created_at.desc()).all()
-    return logs
+async def get_contract_logs(
+    contract_id: int,
+    response: Response,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Most recent first, optionally filtered by action and by created_at in [since, until).
+    Pass the X-Next-Cursor response header back as ?cursor= to fetch the next page.
+    """
+    key = (models.OperationLog.created_at, models.OperationLog.id)
+    query = select(models.OperationLog).where(models.OperationLog.contract_id == contract_id)
+    if action:
+        query = query.where(models.OperationLog.action == action)
+    if since:
+        query = query.where(models.OperationLog.created_at >= naive_utc(since))
+    if until:
+        query = query.where(models.OperationLog.created_at < naive_utc(until))
+    position = decode_cursor(cursor, (datetime, int))
+    if position:
+        query = query.where(after(key, position, descending=True))
+
+    logs = await db.scalars(query.order_by(*(column.desc() for column in key)).limit(limit + 1))
+    return page(response, logs.all(), limit, lambda log: (log.created_at, log.id))
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import models, schemas, database
+from lib.blob_refs import purge_files_task, release_versions
+from lib.export_archive import archive_response, build_project_export
+from lib.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, after, decode_cursor, page
 
 router = APIRouter(
     prefix="/projects",
@@ -9,31 +15,61 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.Project)
-def create_project(project: schemas.ProjectCreate, db: Session = Depends(database.get_db)):
+async def create_project(project: schemas.ProjectCreate, db: AsyncSession = Depends(database.get_async_db)):
     db_project = models.Project(name=project.name, description=project.description)
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     return db_project
 
 @router.get("/", response_model=List[schemas.Project])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    projects = db.query(models.Project).offset(skip).limit(limit).all()
-    return projects
+async def read_projects(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    # Oldest first; the next page's cursor is returned in X-Next-Cursor
+    query = select(models.Project)
+    position = decode_cursor(cursor, (int,))
+    if position:
+        query = query.where(after((models.Project.id,), position))
+    projects = await db.scalars(query.order_by(models.Project.id).limit(limit + 1))
+    return page(response, projects.all(), limit, lambda project: (project.id,))
 
 @router.get("/{project_id}", response_model=schemas.Project)
-def read_project(project_id: int, db: Session = Depends(database.get_db)):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+async def read_project(project_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    project = await db.get(models.Project, project_id)
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
-@router.delete("/{project_id}")
-def delete_project(project_id: int, db: Session = Depends(database.get_db)):
+@router.get("/{project_id}/export")
+def export_project(project_id: int, request: Request, db: Session = Depends(database.get_db)):
+    """
+    Streams a zip with the full history (documents, rendered HTML, adjacent-version diffs) of
+    every contract in the project. Supports Range / If-Range for resuming interrupted downloads.
+    """
     project = db.query(models.Project).filter(models.Project.id == project_id).first()
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    fingerprint, build = build_project_export(db, project)
+    return archive_response(request, fingerprint, build, f"{project.name or project.id}.zip")
+
+@router.delete("/{project_id}")
+def delete_project(project_id: int, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
+    if db.query(models.Project.id).filter(models.Project.id == project_id).first() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
     
-    db.delete(project)
-    db.commit()
+    # 合同及其下所有记录由数据库外键级联删除；文件在响应返回后清理
+    contract_ids = db.query(models.Contract.id).filter(models.Contract.project_id == project_id)
+    orphaned = release_versions(db, models.Version.contract_id.in_(contract_ids.scalar_subquery()))
+    try:
+        db.query(models.Project).filter(models.Project.id == project_id).delete(synchronize_session=False)
+        db.commit()
+    except IntegrityError:
+        # 旧的 SQLite 数据库外键没有 ON DELETE CASCADE，需先运行 migrate_db.py 重建
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Database schema lacks cascading foreign keys; run migrate_db.py")
+    background_tasks.add_task(purge_files_task, orphaned)
     return {"ok": True}
@@ -1,8 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+from typing import List, Optional
 import models, schemas, database
+from lib.clause_summaries import generate_contract_clause_summaries
+from lib.clause_index import update_clause_index, rebuild_clause_index_task
+from lib.clause_lineage import ensure_contract_lineage, rebuild_lineage_task
+from lib.worker_pool import detect_date, map_ordered, render_html
+from lib.http_cache import IMMUTABLE, file_sha256, is_not_modified, make_etag, not_modified, set_cache_headers, version_fingerprint
+from lib.uploads import save_upload
+from lib.archive_import import IMPORT_MAX_ARCHIVE_BYTES, import_documents, resolve_import_source
+from lib.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, after, decode_cursor, page
+from lib.blob_refs import place_blob, purge_files_task, release_files, rendered_html_for, store_blob
+from lib.sse import SSE_HEADERS, sse_event
+import asyncio
 import shutil
+import uuid
 import os
 
 router = APIRouter(
@@ -14,34 +31,64 @@ UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/", response_model=schemas.Version)
-def create_version(
+async def create_version(
     contract_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     commit_message: str = Form(...),
     db: Session = Depends(database.get_db)
 ):
     # Verify contract exists
-    contract = db.query(models.Contract).filter(models.Contract.id == contract_id).first()
+    contract = await run_in_threadpool(
+        lambda: db.query(models.Contract).filter(models.Contract.id == contract_id).first()
+    )
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
 
+    # Stream the upload to a temporary file, hashing while writing
+    temp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4()}.part")
+    _, sha256 = await save_upload(file, temp_path)
+
+    try:
+        db_version = await run_in_threadpool(_store_version, db, contract_id, file.filename, commit_message, temp_path, sha256)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    # 后台批量生成条款演变总结
+    if db_version.version_number > 1:
+        background_tasks.add_task(generate_contract_clause_summaries, contract_id)
+    
+    return db_version
+
+def _store_version(db: Session, contract_id: int, filename: str, commit_message: str, temp_path: str, sha256: str):
     # Determine version number
-    last_version = db.query(models.Version).filter(models.Version.contract_id == contract_id).order_by(models.Version.version_number.desc()).first()
+    last_version = db.query(models.Version).filter(
+        models.Version.contract_id == contract_id
+    ).options(defer(models.Version.html_content)).order_by(models.Version.version_number.desc()).first()
+
+    # 与上一版本内容完全相同：直接拒绝，无需解析或比较
+    if last_version and (last_version.sha256 or file_sha256(last_version.file_path)) == sha256:
+        raise HTTPException(
+            status_code=409,
+            detail=f"File is identical to the latest version v{last_version.version_number}"
+        )
+
     new_version_number = 1 if not last_version else last_version.version_number + 1
 
-    # Save file
-    file_path = os.path.join(UPLOAD_DIR, f"{contract_id}_v{new_version_number}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Reference the content-addressed blob; the file is placed once the version row has committed
+    file_path = store_blob(db, temp_path, sha256)
 
-    # Generate HTML using custom renderer
+    # Generate HTML using custom renderer (reuse it when the same document was already rendered)
     from lib.html_renderer import render_document_to_html
     
-    try:
-        html_content = render_document_to_html(file_path)
-    except Exception as e:
-        print(f"HTML rendering failed: {e}")
-        html_content = "<p>Error rendering document.</p>"
+    html_content = rendered_html_for(db, sha256)
+    if html_content is None:
+        try:
+            html_content = render_document_to_html(temp_path)
+        except Exception as e:
+            print(f"HTML rendering failed: {e}")
+            html_content = "<p>Error rendering document.</p>"
 
     # Create version record
     from datetime import datetime, timezone
@@ -50,12 +97,20 @@ def create_version(
         contract_id=contract_id,
         version_number=new_version_number,
         file_path=file_path,
+        original_filename=filename,
+        sha256=sha256,
         commit_message=commit_message,
         html_content=html_content,
         created_at=datetime.now(timezone.utc)
     )
     db.add(db_version)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # (contract_id, version_number) is unique: another upload took this number first
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Another version was uploaded concurrently; please retry")
+    place_blob(temp_path, sha256)
     db.refresh(db_version)
 
     # Log upload
@@ -66,24 +121,62 @@ def create_version(
     )
     db.add(log)
     db.commit()
-    
+
+    # 增量更新条款状态索引与条款谱系（只解析新版本）
+    try:
+        update_clause_index(db, contract_id, db_version)
+        ensure_contract_lineage(db, contract_id)
+    except Exception as e:
+        print(f"Clause index/lineage update failed: {e}")
+
     return db_version
 
 @router.get("/", response_model=List[schemas.Version])
-def read_versions(contract_id: int, db: Session = Depends(database.get_db)):
-    versions = db.query(models.Version).filter(models.Version.contract_id == contract_id).order_by(models.Version.version_number.desc()).all()
-    return versions
+async def read_versions(
+    contract_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    # Newest first, keyed on version_number (unique per contract); next page cursor in X-Next-Cursor
+    query = select(models.Version).where(models.Version.contract_id == contract_id)
+    position = decode_cursor(cursor, (int,))
+    if position:
+        query = query.where(after((models.Version.version_number,), position, descending=True))
+    versions = await db.scalars(query.order_by(models.Version.version_number.desc()).limit(limit + 1))
+    return page(response, versions.all(), limit, lambda version: (version.version_number,))
 
 @router.get("/{version_id}", response_model=schemas.Version)
-def read_version(contract_id: int, version_id: int, db: Session = Depends(database.get_db)):
+def read_version(
+    contract_id: int,
+    version_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_db)
+):
+    # html_content is loaded lazily, only when the client does not already have this version
     version = db.query(models.Version).filter(
         models.Version.id == version_id,
         models.Version.contract_id == contract_id
-    ).first()
+    ).options(defer(models.Version.html_content)).first()
+    if not version:
+        return version
+
+    # Versions are immutable once uploaded
+    etag = make_etag("version", version_fingerprint(version))
+    if is_not_modified(request, etag):
+        return not_modified(etag, IMMUTABLE)
+    set_cache_headers(response, etag, IMMUTABLE)
     return version
 
 @router.delete("/{version_id}", status_code=204)
-def delete_version(contract_id: int, version_id: int, db: Session = Depends(database.get_db)):
+def delete_version(
+    contract_id: int,
+    version_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(database.get_db)
+):
     version = db.query(models.Version).filter(
         models.Version.id == version_id,
         models.Version.contract_id == contract_id
@@ -92,15 +185,18 @@ def delete_version(contract_id: int, version_id: int, db: Session = Depends(data
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
         
-    # Delete file
-    if version.file_path and os.path.exists(version.file_path):
-        try:
-            os.remove(version.file_path)
-        except OSError as e:
-            print(f"Error deleting file {version.file_path}: {e}")
-            
+    # Release the stored file; it is removed once no version references it
+    orphaned = release_files(db, [version.file_path])
+    # Stored diffs against this version no longer describe an adjacent pair
+    db.query(models.Diff).filter(models.Diff.previous_version_id == version_id).delete(synchronize_session=False)
     db.delete(version)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # 旧的 SQLite 数据库外键没有 ON DELETE CASCADE，需先运行 migrate_db.py 重建
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Database schema lacks cascading foreign keys; run migrate_db.py")
+    background_tasks.add_task(purge_files_task, orphaned)
     
     # Log deletion
     log = models.OperationLog(
@@ -110,17 +206,23 @@ def delete_version(contract_id: int, version_id: int, db: Session = Depends(data
     )
     db.add(log)
     db.commit()
+
+    # 删除版本后重建该合同的条款状态索引，并重新匹配后一个版本的条款谱系
+    background_tasks.add_task(rebuild_clause_index_task, contract_id)
+    background_tasks.add_task(rebuild_lineage_task, contract_id)
     
     return None
 
 @router.post("/batch-stage")
-def stage_batch_versions(
+async def stage_batch_versions(
     contract_id: int,
     files: List[UploadFile] = File(...),
     db: Session = Depends(database.get_db)
 ):
     # Verify contract exists
-    contract = db.query(models.Contract).filter(models.Contract.id == contract_id).first()
+    contract = await run_in_threadpool(
+        lambda: db.query(models.Contract).filter(models.Contract.id == contract_id).first()
+    )
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
 
@@ -128,9 +230,6 @@ def stage_batch_versions(
     os.makedirs(staging_dir, exist_ok=True)
 
     staged_files = []
-    
-    from lib.date_extractor import extract_date_from_docx
-    import uuid
 
     for file in files:
         file_id = str(uuid.uuid4())
@@ -138,17 +237,30 @@ def stage_batch_versions(
         temp_filename = f"{file_id}{file_ext}"
         file_path = os.path.join(staging_dir, temp_filename)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        detected_date = extract_date_from_docx(file_path)
+        # 超出大小上限或不是 DOCX 的文件只标记错误，不影响同批其他文件
+        try:
+            _, sha256 = await save_upload(file, file_path)
+            error = None
+        except HTTPException as e:
+            file_path, sha256, error = None, None, e.detail
         
         staged_files.append({
             "file_id": file_id,
             "original_filename": file.filename,
-            "detected_date": detected_date.isoformat() if detected_date else None,
-            "temp_path": file_path
+            "detected_date": None,
+            "temp_path": file_path,
+            "sha256": sha256,
+            "error": error
         })
+
+    # Detect dates concurrently in the worker pool; results come back in upload order
+    saved = [f for f in staged_files if f["temp_path"]]
+    results = await run_in_threadpool(map_ordered, detect_date, [f["temp_path"] for f in saved])
+    for staged, (detected_date, error) in zip(saved, results):
+        staged["detected_date"] = detected_date
+        staged["error"] = error
+        if error:
+            print(f"Date detection failed for {staged['original_filename']}: {error}")
         
     # Sort by date (oldest first) if possible
     staged_files.sort(key=lambda x: x['detected_date'] or "")
@@ -159,6 +271,7 @@ def stage_batch_versions(
 def commit_batch_versions(
     contract_id: int,
     files: List[schemas.BatchCommitFile],
+    background_tasks: BackgroundTasks,
     db: Session = Depends(database.get_db)
 ):
     # Verify contract exists
@@ -172,25 +285,31 @@ def commit_batch_versions(
 
     created_versions = []
     
-    from lib.html_renderer import render_document_to_html
     from datetime import datetime, timezone
 
+    # Collect staged files first, assigning version numbers in request order
+    staged = []
     for file_data in files:
         staging_path = os.path.join(UPLOAD_DIR, "staging", str(contract_id), f"{file_data.file_id}{os.path.splitext(file_data.original_filename)[1]}")
         
         if not os.path.exists(staging_path):
             continue # Skip if file missing
 
-        # Move to permanent location
-        final_filename = f"{contract_id}_v{next_version_number}_{file_data.original_filename}"
-        final_path = os.path.join(UPLOAD_DIR, final_filename)
-        shutil.move(staging_path, final_path)
+        staged.append((file_data, next_version_number, staging_path, file_sha256(staging_path)))
+        next_version_number += 1
 
-        # Render HTML
-        try:
-            html_content = render_document_to_html(final_path)
-        except Exception as e:
-            print(f"HTML rendering failed: {e}")
+    # Render HTML concurrently in the worker pool, skipping documents that were already rendered
+    known_html = {sha256: rendered_html_for(db, sha256) for _, _, _, sha256 in staged}
+    to_render = [staging_path for _, _, staging_path, sha256 in staged if known_html[sha256] is None]
+    rendered = iter(map_ordered(render_html, to_render))
+
+    for file_data, version_number, staging_path, sha256 in staged:
+        if known_html[sha256] is not None:
+            html_content, error = known_html[sha256], None
+        else:
+            html_content, error = next(rendered)
+        if error:
+            print(f"HTML rendering failed: {error}")
             html_content = "<p>Error rendering document.</p>"
 
         # Create DB record
@@ -211,22 +330,134 @@ def commit_batch_versions(
 
         db_version = models.Version(
             contract_id=contract_id,
-            version_number=next_version_number,
-            file_path=final_path,
+            version_number=version_number,
+            file_path=store_blob(db, staging_path, sha256),
+            original_filename=file_data.original_filename,
+            sha256=sha256,
             commit_message=file_data.commit_message or f"Batch upload: {file_data.original_filename}",
             html_content=html_content,
             created_at=created_at
         )
         db.add(db_version)
         created_versions.append(db_version)
-        
-        next_version_number += 1
 
     db.commit()
+    for _, _, staging_path, sha256 in staged:
+        place_blob(staging_path, sha256)
+
+    # 按版本顺序增量更新条款状态索引与条款谱系
+    for db_version in created_versions:
+        try:
+            update_clause_index(db, contract_id, db_version)
+        except Exception as e:
+            print(f"Clause index update failed: {e}")
+    try:
+        ensure_contract_lineage(db, contract_id)
+    except Exception as e:
+        print(f"Clause lineage update failed: {e}")
     
     # Cleanup staging dir
     staging_dir = os.path.join(UPLOAD_DIR, "staging", str(contract_id))
     if os.path.exists(staging_dir):
         shutil.rmtree(staging_dir)
 
+    # 后台批量生成条款演变总结（整批提交后只触发一次）
+    if created_versions and created_versions[-1].version_number > 1:
+        background_tasks.add_task(generate_contract_clause_summaries, contract_id)
+
     return created_versions
+
+@router.post("/import/stream")
+async def import_versions(
+    contract_id: int,
+    background_tasks: BackgroundTasks,
+    archive: Optional[UploadFile] = File(None),
+    source_path: Optional[str] = Form(None),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Imports a contract's full history from an uploaded zip archive, or from a zip/directory
+    under IMPORT_ROOT on the server. Progress is streamed as server-sent events:
+    `progress` ({stage, done, total}), then `result` or `error`.
+    """
+    contract = await run_in_threadpool(
+        lambda: db.query(models.Contract).filter(models.Contract.id == contract_id).first()
+    )
+    if not contract:
+        raise HTTPException(status_code=404, detail="Contract not found")
+
+    archive_path = None
+    if archive is not None:
+        archive_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4()}.zip")
+        await save_upload(archive, archive_path, max_bytes=IMPORT_MAX_ARCHIVE_BYTES)
+        source = archive_path
+    elif source_path:
+        try:
+            source = resolve_import_source(source_path)
+        except PermissionError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    else:
+        raise HTTPException(status_code=400, detail="Provide an archive file or a source_path")
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    created = {"versions": 0}
+
+    def emit(event: str, data: dict) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def run_import() -> None:
+        # The request session is closed before a streaming response starts; use our own
+        session = database.SessionLocal()
+        try:
+            last_number = session.query(func.max(models.Version.version_number)).filter(
+                models.Version.contract_id == contract_id
+            ).scalar() or 0
+            try:
+                result = import_documents(
+                    session, contract_id, source,
+                    progress=lambda stage, done, total: emit("progress", {"stage": stage, "done": done, "total": total})
+                )
+                emit("result", result)
+            except Exception as e:
+                session.rollback()
+                print(f"Archive import failed: {e}")
+                emit("error", {"detail": f"Import failed: {str(e)}"})
+            # 导入按批提交，失败前已提交的批次同样算作新建的版本
+            created["versions"] = session.query(func.count(models.Version.id)).filter(
+                models.Version.contract_id == contract_id, models.Version.version_number > last_number
+            ).scalar()
+        finally:
+            session.close()
+            if archive_path and os.path.exists(archive_path):
+                os.remove(archive_path)
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    # 导入在线程池中进行，与响应流（以及客户端是否断开）无关
+    import_task = asyncio.ensure_future(run_in_threadpool(run_import))
+
+    async def event_stream():
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+
+    async def after_import() -> None:
+        # 确实新建了版本时才重建条款索引与谱系，并批量生成条款演变总结
+        await import_task
+        if not created["versions"]:
+            return
+        await run_in_threadpool(rebuild_clause_index_task, contract_id)
+        await run_in_threadpool(rebuild_lineage_task, contract_id)
+        await generate_contract_clause_summaries(contract_id)
+
+    background_tasks.add_task(after_import)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
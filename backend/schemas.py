@@ -44,6 +44,8 @@ class Version(VersionBase):
     created_at: datetime
     created_at: datetime
     file_path: str
+    original_filename: Optional[str] = None
+    sha256: Optional[str] = None
     html_content: Optional[str] = None
     
     class Config:
@@ -56,6 +58,7 @@ class DiffItem(BaseModel):
     original: Optional[str]
     modified: Optional[str]
     similarity: float
+    old_clause_id: Optional[str] = None # ID of the matched clause in the old version
     old_number: Optional[str] = None
     new_number: Optional[str] = None
     old_title: Optional[str] = None
@@ -73,6 +76,11 @@ class DiffResponse(BaseModel):
 class AnalysisResponse(BaseModel):
     summary: str
     risk_assessments: dict
+    cached: bool = False # True if served from the AI result cache
+    partial: bool = False # True if some batches of a chunked analysis failed
+    failed_batches: int = 0
+    token_report: Optional[dict] = None # Estimated prompt tokens and tokens saved by compaction
+    prescreen: Optional[dict] = None # Changes resolved by local rules and extracted numeric deltas
     
     class Config:
         from_attributes = True
@@ -109,3 +117,9 @@ class Comment(CommentBase):
     
     class Config:
         from_attributes = True
+
+class ClauseHistoryBulkRequest(BaseModel):
+    clause_ids: Optional[List[str]] = None # None = every clause that changed in the range
+    from_version: Optional[int] = None
+    to_version: Optional[int] = None
+    include_ai_summary: bool = False # Stored summaries first; misses are generated in one batched call
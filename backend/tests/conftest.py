@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# database 导入时会按 DATABASE_URL 建立默认引擎；测试不使用开发数据库
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("AI_CACHE_ENABLED", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+
+class StubLLM:
+    """在后台线程运行的 llm_stub_server。options 可在测试中直接修改（延迟、错误率等），active 为进行中的请求数。"""
+
+    def __init__(self):
+        import llm_stub_server
+
+        self.options = llm_stub_server.build_parser().parse_args(["--port", "0"])
+        self.active = 0
+        self._lock = threading.Lock()
+        stub = self
+        handler = llm_stub_server.make_handler(self.options)
+
+        class TrackedHandler(handler):
+            def handle(self):
+                with stub._lock:
+                    stub.active += 1
+                try:
+                    super().handle()
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+        self.server = llm_stub_server.ThreadingHTTPServer((self.options.host, 0), TrackedHandler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{self.options.host}:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_llm():
+    stub = StubLLM()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def db():
+    """独立的内存数据库会话，已建好全部表。"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+    from database import Base
+    import models  # noqa: F401  注册全部模型
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def statements(db):
+    """记录测试期间 db 会话执行的 SQL 语句。"""
+    from sqlalchemy import event
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import socket
+import subprocess
+
+import httpx
+
+import ai_benchmark
+import llm_stub_server
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = '[{"clause_id":"c1"},{"clause_id":"c2"}]'
+
+
+def _completion(stub, **body):
+    return httpx.post(f"{stub.base_url}/chat/completions", timeout=10,
+                      json={"model": "stub-model", "messages": [{"role": "user", "content": PROMPT}], **body})
+
+
+def test_stub_returns_analysis_json(stub_llm):
+    response = _completion(stub_llm)
+    assert response.status_code == 200
+    content = json.loads(response.json()["choices"][0]["message"]["content"])
+    assert set(content["risk_assessments"]) == {"c1", "c2"}
+
+
+def test_stub_injects_errors(stub_llm):
+    stub_llm.options.error_rate = 1.0
+    stub_llm.options.error_status = 429
+    assert _completion(stub_llm).status_code == 429
+
+
+def test_stub_streams_chunks_then_done(stub_llm):
+    response = _completion(stub_llm, stream=True)
+    events = [line[len("data: "):] for line in response.text.split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e)["choices"][0] for e in events[:-1]]
+    assert chunks[-1]["finish_reason"] == "stop"
+    assert "".join(c["delta"].get("content", "") for c in chunks) == llm_stub_server.build_content(PROMPT)
+
+
+def test_percentile_uses_nearest_rank():
+    values = [i / 100 for i in range(1, 101)]
+    assert ai_benchmark.percentile(values, 50) == 0.5
+    assert ai_benchmark.percentile(values, 99) == 0.99
+    assert ai_benchmark.percentile([0.2], 95) == 0.2
+    assert ai_benchmark.percentile([], 50) == 0.0
+
+
+def test_benchmark_runs_offline(tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    result = subprocess.run(
+        [sys.executable, os.path.join(BACKEND_DIR, "tools", "ai_benchmark.py"), "--requests", "4", "--concurrency", "2",
+         "--versions", "2", "--clauses", "5", "--latency", "0", "--latency-jitter", "0",
+         "--stub-port", str(port), "--fail-on-error"],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    reports = {line.split(":", 1)[0]: json.loads(line.split(":", 1)[1]) for line in result.stdout.splitlines()
+               if line.startswith(("analysis:", "history:"))}
+    assert set(reports) == {"analysis", "history"}
+    assert all(report["errors"] == 0 and report["p99_ms"] >= report["p50_ms"] for report in reports.values())
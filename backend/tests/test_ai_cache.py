@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+from lib import ai_cache
+from lib.ai_cache import cached_ai_call, get_cached, make_cache_key, set_cached
+
+
+@pytest.fixture
+def cache(db, monkeypatch):
+    """缓存读写使用测试数据库；返回一个记录调用次数的 compute。"""
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(ai_cache, "AI_CACHE_ENABLED", True)
+    calls = []
+
+    def compute(result):
+        async def run():
+            calls.append(result)
+            return result
+        return run
+
+    return compute, calls
+
+
+def _call(compute, template_version="v1", payload=None, refresh=False):
+    return asyncio.run(cached_ai_call(kind="diff_analysis", model="m", template_version=template_version,
+                                      payload=payload or {"clauses": ["c1"]}, compute=compute, refresh=refresh))
+
+
+def test_key_covers_kind_model_template_and_payload():
+    base = make_cache_key("diff_analysis", "m", "v1", {"a": 1, "b": [1, 2]})
+    assert make_cache_key("diff_analysis", "m", "v1", {"b": [1, 2], "a": 1}) == base
+    assert make_cache_key("diff_analysis", "m", "v2", {"a": 1, "b": [1, 2]}) != base
+    assert make_cache_key("diff_analysis", "other", "v1", {"a": 1, "b": [1, 2]}) != base
+    assert make_cache_key("clause_evolution", "m", "v1", {"a": 1, "b": [1, 2]}) != base
+    assert make_cache_key("diff_analysis", "m", "v1", {"a": 1, "b": [2, 1]}) != base
+
+
+def test_second_call_is_served_from_cache(cache):
+    compute, calls = cache
+    assert _call(compute({"summary": "s"})) == {"summary": "s", "cached": False}
+    assert _call(compute({"summary": "other"})) == {"summary": "s", "cached": True}
+    assert calls == [{"summary": "s"}]
+
+
+def test_template_version_change_misses(cache):
+    compute, calls = cache
+    _call(compute({"summary": "old prompt"}), template_version="v1")
+    assert _call(compute({"summary": "new prompt"}), template_version="v2")["summary"] == "new prompt"
+    assert len(calls) == 2
+
+
+def test_refresh_bypasses_and_replaces_entry(cache):
+    compute, calls = cache
+    _call(compute({"summary": "first"}))
+    assert _call(compute({"summary": "second"}), refresh=True) == {"summary": "second", "cached": False}
+    assert _call(compute({"summary": "third"})) == {"summary": "second", "cached": True}
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("result", [None, {"summary": "s", "partial": True}])
+def test_failed_and_partial_results_are_not_cached(cache, db, result):
+    compute, calls = cache
+    _call(compute(result))
+    _call(compute(result))
+    assert len(calls) == 2
+    assert db.query(models.AICacheEntry).count() == 0
+
+
+def test_expired_entry_is_a_miss_and_removed(cache, db, monkeypatch):
+    monkeypatch.setattr(ai_cache, "AI_CACHE_TTL_SECONDS", 60)
+    set_cached("k", "diff_analysis", "m", {"summary": "s"})
+    assert get_cached("k") == {"summary": "s"}
+
+    entry = db.get(models.AICacheEntry, "k")
+    entry.created_at = datetime.utcnow() - timedelta(seconds=61)
+    db.commit()
+    assert get_cached("k") is None
+    db.expire_all()
+    assert db.get(models.AICacheEntry, "k") is None
+
+
+def test_hits_update_access_time_for_lru_eviction(cache, db, monkeypatch):
+    monkeypatch.setattr(ai_cache, "AI_CACHE_MAX_ENTRIES", 2)
+    set_cached("a", "diff_analysis", "m", {"summary": "a"})
+    set_cached("b", "diff_analysis", "m", {"summary": "b"})
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    for key in ("a", "b"):
+        db.get(models.AICacheEntry, key).last_accessed_at = long_ago
+    db.commit()
+
+    # 命中 a 后，b 成为最久未访问的条目，写入 c 时被淘汰
+    assert get_cached("a") == {"summary": "a"}
+    set_cached("c", "diff_analysis", "m", {"summary": "c"})
+
+    db.expire_all()
+    assert {entry.key for entry in db.query(models.AICacheEntry)} == {"a", "c"}
+    assert db.get(models.AICacheEntry, "a").hit_count == 1
+
+
+def test_disabled_cache_always_computes(cache, db, monkeypatch):
+    compute, calls = cache
+    monkeypatch.setattr(ai_cache, "AI_CACHE_ENABLED", False)
+    _call(compute({"summary": "s"}))
+    assert _call(compute({"summary": "s"})) == {"summary": "s", "cached": False}
+    assert len(calls) == 2
+    assert db.query(models.AICacheEntry).count() == 0
@@ -0,0 +1,84 @@
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+import models
+from lib import blob_refs, blob_store
+from routers import versions
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    local = blob_store.LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store, "_store", local)
+    return local
+
+
+@pytest.fixture
+def contract_id(db):
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.commit()
+    return contract.id
+
+
+def _upload(tmp_path, content: bytes):
+    path = tmp_path / "upload.part"
+    path.write_bytes(content)
+    return str(path), hashlib.sha256(content).hexdigest()
+
+
+def test_conflicting_upload_leaves_no_blob(db, store, contract_id, tmp_path, monkeypatch):
+    temp_path, sha256 = _upload(tmp_path, b"PK\x03\x04 v1")
+    commit = db.commit
+
+    def conflict():
+        monkeypatch.setattr(db, "commit", commit)
+        raise IntegrityError("INSERT INTO versions", {}, Exception("UNIQUE constraint failed"))
+
+    monkeypatch.setattr(db, "commit", conflict)
+    with pytest.raises(HTTPException) as excinfo:
+        versions._store_version(db, contract_id, "a.docx", "v1", temp_path, sha256)
+
+    assert excinfo.value.status_code == 409
+    assert not store.exists(sha256)
+    assert db.query(models.Blob).count() == 0
+
+
+def test_upload_places_blob_after_commit(db, store, contract_id, tmp_path):
+    temp_path, sha256 = _upload(tmp_path, b"PK\x03\x04 v1")
+    version = versions._store_version(db, contract_id, "a.docx", "v1", temp_path, sha256)
+
+    assert version.file_path == blob_store.blob_ref(sha256)
+    assert store.exists(sha256)
+    assert db.get(models.Blob, sha256).ref_count == 1
+
+
+def test_purge_skips_blob_referenced_again(db, store, tmp_path):
+    temp_path, sha256 = _upload(tmp_path, b"PK\x03\x04 v1")
+    blob_refs.store_blob(db, temp_path, sha256)
+    db.commit()
+    blob_refs.place_blob(temp_path, sha256)
+
+    blob_refs.purge_files(db, [blob_store.blob_ref(sha256)])
+    assert store.exists(sha256)
+
+
+def test_place_after_purge_restores_blob(db, store, tmp_path):
+    temp_path, sha256 = _upload(tmp_path, b"PK\x03\x04 v1")
+    store.put_file(temp_path, sha256)
+
+    # 清理时复查不到引用；并发的重新上传随后提交，放入时重新写入文件
+    blob_refs.purge_files(db, [blob_store.blob_ref(sha256)])
+    assert not store.exists(sha256)
+
+    temp_path, _ = _upload(tmp_path, b"PK\x03\x04 v1")
+    blob_refs.store_blob(db, temp_path, sha256)
+    db.commit()
+    blob_refs.place_blob(temp_path, sha256)
+    assert store.exists(sha256)
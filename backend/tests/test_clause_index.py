@@ -0,0 +1,35 @@
+import models
+from lib.clause_index import get_clause_index, rebuild_clause_index, update_clause_index
+
+
+def _seed(db, count=3):
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.flush()
+    for n in range(1, count + 1):
+        # 没有文件的版本不会被解析，测试只关心读取版本时加载了哪些列
+        db.add(models.Version(contract_id=contract.id, version_number=n, file_path=None,
+                              commit_message=f"v{n}", html_content="<p>" + "x" * 1000 + "</p>"))
+    db.commit()
+    return contract.id
+
+
+def test_index_reads_do_not_load_html(db, statements):
+    contract_id = _seed(db)
+
+    rebuild_clause_index(db, contract_id)
+    assert get_clause_index(db, contract_id) == {}
+    latest = db.query(models.Version).filter(models.Version.version_number == 3).one()
+    statements.clear()
+
+    get_clause_index(db, contract_id)
+    update_clause_index(db, contract_id, latest)
+    db.expire_all()
+    rebuild_clause_index(db, contract_id)
+
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert selects
+    assert not any("html_content" in s for s in selects)
@@ -0,0 +1,67 @@
+import models
+from lib.clause_lineage import ensure_contract_lineage, walk_lineage
+
+
+def _seed(db):
+    """三个版本：c1 在第 2 版改名为 c1b，第 3 版未变；c2 在第 3 版被删除。"""
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.flush()
+    versions = []
+    for n in (1, 2, 3):
+        version = models.Version(contract_id=contract.id, version_number=n, file_path=f"blob:{n}",
+                                 commit_message=f"v{n}", html_content="<p>" + "x" * 1000 + "</p>")
+        db.add(version)
+        db.flush()
+        versions.append(version)
+    v1, v2, v3 = versions
+
+    def row(version, clause_id, prev_version=None, prev_clause_id=None, change_type="unchanged"):
+        db.add(models.ClauseLineage(
+            contract_id=contract.id, version_id=version.id, version_number=version.version_number,
+            clause_id=clause_id, prev_version_id=prev_version.id if prev_version else None,
+            prev_clause_id=prev_clause_id, change_type=change_type, content=f"{clause_id}@{version.version_number}"
+        ))
+
+    row(v1, "c1", change_type="added")
+    row(v1, "c2", change_type="added")
+    row(v2, "c1b", v1, "c1", "renumbered")
+    row(v2, "c2", v1, "c2")
+    row(v3, "c1b", v2, "c1b")
+    row(v3, None, v2, "c2", "deleted")
+    for prev, version in ((None, v1), (v1, v2), (v2, v3)):
+        db.add(models.ClauseLineageState(version_id=version.id, contract_id=contract.id,
+                                         prev_version_id=prev.id if prev else None))
+    ids = contract.id, [v.id for v in versions]
+    db.commit()
+    db.expunge_all()
+    return ids
+
+
+def test_walk_lineage_follows_renames_with_indexed_steps(db, statements):
+    contract_id, (v1, v2, v3) = _seed(db)
+    statements.clear()
+
+    chain = walk_lineage(db, contract_id, "c1b")
+    assert {version_id: row.clause_id for version_id, row in chain.items()} == {v1: "c1", v2: "c1b", v3: "c1b"}
+    # 锚点、回溯两步、向后一次未命中：每一步一次按键查询，不读取合同的其他谱系行
+    assert len(statements) == 4
+    assert all("clause_id = ?" in s for s in statements)
+
+    # 以旧 ID 查询同样能追踪到后续版本；版本范围限制链的两端
+    assert set(walk_lineage(db, contract_id, "c1")) == {v1, v2, v3}
+    assert set(walk_lineage(db, contract_id, "c1b", from_version=2)) == {v2, v3}
+    assert set(walk_lineage(db, contract_id, "c2", to_version=2)) == {v1, v2}
+    assert walk_lineage(db, contract_id, "c2", from_version=3) == {}
+
+
+def test_ensure_contract_lineage_does_not_load_html(db, statements):
+    contract_id, _ = _seed(db)
+    statements.clear()
+
+    ensure_contract_lineage(db, contract_id)
+    assert len(statements) == 2
+    assert not any("html_content" in statement for statement in statements)
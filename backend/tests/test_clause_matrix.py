@@ -0,0 +1,97 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import database
+import main
+import models
+from lib.clause_matrix import iter_clause_rows
+
+
+def _seed(db):
+    """
+    四个版本：c1 在第 2 版改名为 c1b 并在第 4 版修改；c2 在第 3 版被删除；c3 在第 3 版新增。
+    """
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.flush()
+    versions = []
+    for n in (1, 2, 3, 4):
+        version = models.Version(contract_id=contract.id, version_number=n, file_path=f"blob:{n}", commit_message=f"v{n}")
+        db.add(version)
+        db.flush()
+        versions.append(version)
+    v1, v2, v3, v4 = versions
+
+    def row(version, clause_id, prev_clause_id=None, change_type="unchanged", content=None):
+        prev = versions[version.version_number - 2] if prev_clause_id else None
+        db.add(models.ClauseLineage(
+            contract_id=contract.id, version_id=version.id, version_number=version.version_number,
+            clause_id=clause_id, prev_version_id=prev.id if prev else None, prev_clause_id=prev_clause_id,
+            change_type=change_type, content=content or f"{clause_id} text"
+        ))
+
+    row(v1, "c1", change_type="added", content="c1b text")
+    row(v1, "c2", change_type="added")
+    row(v2, "c1b", "c1", "renamed")
+    row(v2, "c2", "c2")
+    row(v3, "c1b", "c1b")
+    row(v3, None, "c2", "deleted")
+    row(v3, "c3", change_type="added")
+    row(v4, "c1b", "c1b", "modified", content="c1b changed")
+    row(v4, "c3", "c3")
+    for prev, version in zip([None] + versions, versions):
+        db.add(models.ClauseLineageState(version_id=version.id, contract_id=contract.id,
+                                         prev_version_id=prev.id if prev else None))
+    db.commit()
+    return contract.id, [(v.id, v.version_number) for v in versions]
+
+
+def test_rows_follow_lineage_in_latest_document_order(db):
+    _, columns = _seed(db)
+    rows = list(iter_clause_rows(db, [version_id for version_id, _ in columns]))
+
+    # 最后一版中的条款按文档顺序在前，第 3 版删除的 c2 排在其后
+    assert [(r["clauseId"], r["status"]) for r in rows] == [
+        ("c1b", "AR=M"),
+        ("c3", "..A="),
+        ("c2", "A=D."),
+    ]
+    c1b = rows[0]
+    assert c1b["hashColumns"] == [0, 1, 3]
+    assert c1b["hashes"][0] == c1b["hashes"][1] != c1b["hashes"][2]
+
+
+def test_matrix_endpoint_streams_rows(db, monkeypatch):
+    contract_id, columns = _seed(db)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    main.app.dependency_overrides[database.get_db] = lambda: db
+    try:
+        response = TestClient(main.app).get(f"/contracts/{contract_id}/clauses/matrix", params={"from_version": 2})
+    finally:
+        main.app.dependency_overrides.pop(database.get_db, None)
+
+    assert response.status_code == 200
+    matrix = json.loads(response.content)
+    assert [v["versionNumber"] for v in matrix["versions"]] == [2, 3, 4]
+    assert matrix["statusCodes"]["deleted"] == "D"
+    assert [(r["clauseId"], r["status"]) for r in matrix["rows"]] == [("c1b", "R=M"), ("c3", ".A="), ("c2", "=D.")]
+
+
+def test_row_order_does_not_depend_on_insertion_order(db):
+    """c3 先于 c1b 写入第 4 版时，按第 4 版的文档顺序排列。"""
+    _, columns = _seed(db)
+    v4 = columns[-1][0]
+    rows = db.query(models.ClauseLineage).filter(models.ClauseLineage.version_id == v4).order_by(models.ClauseLineage.id).all()
+    for row in rows:
+        db.expunge(row)
+    db.query(models.ClauseLineage).filter(models.ClauseLineage.version_id == v4).delete()
+    for row in reversed(rows):
+        db.add(models.ClauseLineage(**{c.name: getattr(row, c.name) for c in models.ClauseLineage.__table__.columns if c.name != "id"}))
+    db.commit()
+
+    assert [r["clauseId"] for r in iter_clause_rows(db, [version_id for version_id, _ in columns])] == ["c3", "c1b", "c2"]
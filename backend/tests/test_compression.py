@@ -0,0 +1,47 @@
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from lib.compression import CompressionMiddleware
+from lib.http_cache import REVALIDATE, is_not_modified, make_etag, not_modified
+
+ETAG = make_etag("test")
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/document")
+    def document(request: Request, size: int = 5000):
+        if is_not_modified(request, ETAG):
+            return not_modified(ETAG, REVALIDATE)
+        return Response("x" * size, media_type="text/plain", headers={"ETag": ETAG})
+
+    return TestClient(app)
+
+
+def test_compressed_response_gets_weak_etag_and_vary():
+    response = _client().get("/document", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f"W/{ETAG}"
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_uncompressed_response_keeps_strong_etag():
+    client = _client()
+    identity = client.get("/document", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == ETAG
+    assert identity.headers["vary"] == "Accept-Encoding"
+
+    small = client.get("/document?size=10", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["etag"] == ETAG
+    assert small.headers["vary"] == "Accept-Encoding"
+
+
+def test_weak_etag_revalidates():
+    client = _client()
+    etag = client.get("/document", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    response = client.get("/document", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
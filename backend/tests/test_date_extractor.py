@@ -0,0 +1,123 @@
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from lib import date_extractor
+from lib.date_extractor import extract_date_from_docx, extract_date_from_text
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _core(modified=None, created=None):
+    parts = []
+    if created is not None:
+        parts.append(f'<dcterms:created xsi:type="dcterms:W3CDTF">{created}</dcterms:created>')
+    if modified is not None:
+        parts.append(f'<dcterms:modified xsi:type="dcterms:W3CDTF">{modified}</dcterms:modified>')
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dcterms="http://purl.org/dc/terms/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        + "".join(parts) + "</cp:coreProperties>"
+    )
+
+
+def _paragraph(*runs):
+    return "<w:p>" + "".join(f"<w:r><w:t>{text}</w:t></w:r>" for text in runs) + "</w:p>"
+
+
+def _document(*paragraphs):
+    return f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W}"><w:body>{"".join(paragraphs)}</w:body></w:document>'
+
+
+@pytest.fixture
+def docx(tmp_path):
+    """写出只包含 document.xml（以及可选 core.xml）的最小 DOCX。"""
+    def build(body, core=None, name="doc.docx"):
+        path = tmp_path / name
+        with zipfile.ZipFile(path, "w") as archive:
+            if body is not None:
+                archive.writestr("word/document.xml", body)
+            if core is not None:
+                archive.writestr("docProps/core.xml", core)
+        return str(path)
+    return build
+
+
+BODY_DATE = _document(_paragraph("合同签订日期：2022年3月8日"))
+
+
+def test_core_modified_date_wins_over_body(docx):
+    path = docx(BODY_DATE, _core(modified="2023-05-12T08:30:00Z", created="2021-01-01T00:00:00Z"))
+    assert extract_date_from_docx(path) == datetime(2023, 5, 12)
+
+
+def test_core_created_date_used_without_modified(docx):
+    assert extract_date_from_docx(docx(BODY_DATE, _core(created="2021-07-01T00:00:00Z"))) == datetime(2021, 7, 1)
+
+
+@pytest.mark.parametrize("core", [
+    None,
+    _core(),
+    _core(modified="2023-13-45T00:00:00Z"),
+    _core(modified="yesterday"),
+    "<cp:coreProperties",
+])
+def test_missing_or_malformed_core_falls_back_to_body(docx, core):
+    assert extract_date_from_docx(docx(BODY_DATE, core)) == datetime(2022, 3, 8)
+
+
+def test_metadata_can_be_disabled(docx, monkeypatch):
+    monkeypatch.setattr(date_extractor, "DATE_USE_DOCX_METADATA", False)
+    assert extract_date_from_docx(docx(BODY_DATE, _core(modified="2023-05-12T08:30:00Z"))) == datetime(2022, 3, 8)
+
+
+def test_body_joins_runs_and_scans_table_cells(docx):
+    body = _document(
+        _paragraph("甲方：某公司"),
+        f"<w:tbl><w:tr><w:tc>{_paragraph('签署日期 ', '2023', '年', '5', '月', '12', '日')}</w:tc></w:tr></w:tbl>",
+    )
+    assert extract_date_from_docx(docx(body)) == datetime(2023, 5, 12)
+
+
+def test_body_scan_stops_at_paragraph_window(docx):
+    filler = [_paragraph(f"第{i}段，无日期") for i in range(5)]
+    path = docx(_document(*filler, _paragraph("2023-05-12")))
+
+    assert extract_date_from_docx(path, max_paragraphs=5) is None
+    assert extract_date_from_docx(path, max_paragraphs=6) == datetime(2023, 5, 12)
+    # 0 表示不限制
+    assert extract_date_from_docx(path, max_paragraphs=0) == datetime(2023, 5, 12)
+
+
+@pytest.mark.parametrize("body", [
+    _document(_paragraph("本合同未注明日期。")),
+    _document(),
+    None,
+    "<w:document",
+])
+def test_absent_or_unreadable_body_returns_none(docx, body):
+    assert extract_date_from_docx(docx(body)) is None
+
+
+def test_not_a_docx_returns_none(tmp_path):
+    path = tmp_path / "plain.docx"
+    path.write_text("2023-05-12")
+    assert extract_date_from_docx(str(path)) is None
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("2023年5月12日", datetime(2023, 5, 12)),
+    ("2023/05/12", datetime(2023, 5, 12)),
+    ("2023.5.12", datetime(2023, 5, 12)),
+    # 无效日期跳过，继续匹配后面的日期
+    ("2023-02-30 或 2023-03-01", datetime(2023, 3, 1)),
+    ("1899-01-01", None),
+    # 前后分隔符必须一致
+    ("2023-05/12", None),
+    ("", None),
+    (None, None),
+])
+def test_extract_date_from_text(text, expected):
+    assert extract_date_from_text(text) == expected
@@ -0,0 +1,99 @@
+import pytest
+
+import models
+from lib import clause_lineage, diff_composer
+from lib.diff_composer import compose_diff
+from lib.smart_diff import match_clauses
+
+
+def _clause(clause_id, number, title, body):
+    return {"id": clause_id, "number": number, "title": title, "body": body,
+            "text": f"{number} {title} {body}", "indent": 0}
+
+
+PAYMENT = ("第一条", "付款", "乙方应于合同签订后三十日内向甲方支付全部合同价款。")
+BREACH = ("第二条", "违约责任", "任何一方违反本合同约定的，应当赔偿对方因此遭受的全部损失。")
+SECRECY = ("第三条", "保密", "双方对在履行本合同过程中知悉的对方商业秘密负有保密义务。")
+TERM = ("第四条", "合同期限", "本合同自双方签字盖章之日起生效，有效期为一年。")
+
+# 第 2、3 版连续修改付款条款，第 4 版删除违约责任条款（其后的条款编号前移）
+DOCUMENTS = {
+    1: [_clause("pay", *PAYMENT), _clause("breach", *BREACH), _clause("secret", *SECRECY), _clause("term", *TERM)],
+    2: [_clause("pay", "第一条", "付款", "乙方应于合同签订后六十日内向甲方支付全部合同价款。"),
+        _clause("breach", *BREACH), _clause("secret", *SECRECY), _clause("term", *TERM)],
+    3: [_clause("pay", "第一条", "付款", "乙方应于合同签订后六十日内向甲方支付全部合同价款，逾期按日支付违约金。"),
+        _clause("breach", *BREACH), _clause("secret", *SECRECY), _clause("term", *TERM)],
+    4: [_clause("pay", "第一条", "付款", "乙方应于合同签订后六十日内向甲方支付全部合同价款，逾期按日支付违约金。"),
+        _clause("secret", "第二条", "保密", SECRECY[2]), _clause("term", "第三条", "合同期限", TERM[2])],
+}
+
+
+@pytest.fixture
+def versions(db, monkeypatch):
+    """四个版本的合同，谱系由 ensure_contract_lineage 按上面的条款建立。"""
+    monkeypatch.setattr(clause_lineage, "extract_clauses", lambda file_path: [dict(c) for c in DOCUMENTS[int(file_path[5:])]])
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.flush()
+    result = []
+    for n in DOCUMENTS:
+        version = models.Version(contract_id=contract.id, version_number=n, file_path=f"blob:{n}", commit_message=f"v{n}")
+        db.add(version)
+        db.flush()
+        result.append(version)
+    db.commit()
+    clause_lineage.ensure_contract_lineage(db, contract.id)
+    db.commit()
+    return contract.id, result
+
+
+@pytest.mark.parametrize("base,target", [(1, 2), (1, 3), (1, 4), (2, 4)])
+def test_composed_diff_matches_direct_diff(db, versions, base, target):
+    contract_id, vs = versions
+    composed = compose_diff(db, contract_id, vs[base - 1], vs[target - 1])
+    assert composed == match_clauses(DOCUMENTS[base], DOCUMENTS[target])
+
+
+def test_chained_edits_compose_to_modify_and_delete(db, versions):
+    contract_id, vs = versions
+    composed = compose_diff(db, contract_id, vs[0], vs[3])
+    changes = {d["clause_id"]: d["change_type"] for d in composed}
+    assert changes == {"pay": "modified", "secret": "renumbered", "term": "renumbered", "breach": "deleted"}
+
+
+def test_falls_back_when_lineage_is_missing(db, versions, monkeypatch):
+    contract_id, vs = versions
+    # 谱系补建失败：中间版本没有状态记录，无法确认链路
+    monkeypatch.setattr(diff_composer, "ensure_contract_lineage", lambda db, contract_id: None)
+    db.query(models.ClauseLineageState).filter(models.ClauseLineageState.version_id == vs[1].id).delete()
+    db.commit()
+    assert compose_diff(db, contract_id, vs[0], vs[3]) is None
+
+
+def test_falls_back_when_lineage_is_stale(db, versions, monkeypatch):
+    contract_id, vs = versions
+    # 中间版本的谱系是与其他版本匹配得到的（上一版本被删除后尚未重建）
+    monkeypatch.setattr(diff_composer, "ensure_contract_lineage", lambda db, contract_id: None)
+    state = db.get(models.ClauseLineageState, vs[2].id)
+    state.prev_version_id = vs[0].id
+    db.commit()
+    assert compose_diff(db, contract_id, vs[0], vs[3]) is None
+
+
+def test_falls_back_when_clause_ids_are_ambiguous(db, versions):
+    contract_id, vs = versions
+    # 第 3 版中两个条款 ID 相同，无法确定沿哪条链追溯
+    row = db.query(models.ClauseLineage).filter(
+        models.ClauseLineage.version_id == vs[2].id, models.ClauseLineage.clause_id == "secret"
+    ).one()
+    row.clause_id = "breach"
+    db.commit()
+    assert compose_diff(db, contract_id, vs[0], vs[3]) is None
+
+
+def test_falls_back_for_reversed_range(db, versions):
+    contract_id, vs = versions
+    assert compose_diff(db, contract_id, vs[3], vs[0]) is None
@@ -0,0 +1,126 @@
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from lib import ai_cache, ai_engine, diff_engine
+from lib.llm_client import LLMClient
+from routers import diffs
+
+PATH = "/contracts/1/versions/2/diff/analysis/stream"
+CHANGES = [
+    {"type": "modified", "change_type": "modified", "clause_id": "c1",
+     "original": "乙方应于30日内付款。", "modified": "乙方应于60日内付款，逾期按日支付违约金。"},
+    {"type": "modified", "change_type": "modified", "clause_id": "c2",
+     "original": "合同有效期一年。", "modified": "合同有效期三年，期满自动续期。"},
+]
+
+
+@pytest.fixture
+def stream_app(stub_llm, monkeypatch):
+    versions = (SimpleNamespace(file_path="blob:target"), SimpleNamespace(file_path="blob:base"))
+    monkeypatch.setattr(diffs, "_resolve_versions", lambda *args: versions)
+    monkeypatch.setattr(diff_engine, "compare_versions", lambda base, target: CHANGES)
+    monkeypatch.setattr(ai_engine, "OPENROUTER_API_KEY", "stub")
+    monkeypatch.setattr(ai_cache, "AI_CACHE_ENABLED", False)
+    monkeypatch.setattr(ai_engine, "client", LLMClient(stub_llm.base_url, "stub"))
+    return main.app
+
+
+def _parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_event_order(stream_app, stub_llm):
+    stub_llm.options.token_rate = 2000
+    with TestClient(stream_app).stream("GET", PATH) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "content-encoding" not in response.headers
+        events = _parse_events(response.read().decode("utf-8"))
+
+    names = [name for name, _ in events]
+    assert names[0] == "meta"
+    assert names[-1] == "result"
+    assert names.count("result") == 1
+    # 摘要增量先于条款风险到达（模型输出中 summary 字段在前）
+    assert "summary" in names
+    assert max(i for i, n in enumerate(names) if n == "summary") < min(i for i, n in enumerate(names) if n == "risk")
+
+    summary = "".join(data["text"] for name, data in events if name == "summary")
+    result = events[-1][1]
+    assert result["summary"] == summary
+    streamed_risks = {data["clause_id"] for name, data in events if name == "risk"}
+    assert streamed_risks == set(result["risk_assessments"]) == {"c1", "c2"}
+
+
+def test_stream_stops_upstream_on_client_disconnect(stream_app, stub_llm):
+    # 约 2000 字的摘要按每块 8 字、每秒 100 token 输出，完整读完需要十秒以上
+    stub_llm.options.canned = json.dumps({"summary": "修订" * 1000, "risk_assessments": {}}, ensure_ascii=False)
+    stub_llm.options.token_rate = 100
+
+    async def run():
+        disconnected = asyncio.Event()
+        received = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and b"event: summary" in message.get("body", b""):
+                disconnected.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": PATH, "raw_path": PATH.encode(), "query_string": b"",
+            "root_path": "", "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+        }
+        started = time.perf_counter()
+        await asyncio.wait_for(stream_app(scope, receive, send), timeout=5)
+        assert time.perf_counter() - started < 5
+
+        # 上游连接随之关闭（事件循环仍在运行，不依赖退出时的清理），stub 不再继续输出
+        deadline = time.monotonic() + 2
+        while stub_llm.active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert stub_llm.active == 0
+
+    asyncio.run(run())
+
+
+def test_token_report_is_returned_and_counted(stream_app, stub_llm, monkeypatch, capsys):
+    monkeypatch.setattr(ai_engine, "_token_totals", dict(ai_engine._token_totals, analyses=0, prompt_tokens=0))
+    result = asyncio.run(ai_engine.analyze_diffs(CHANGES))
+
+    assert result["token_report"]["requests"] == 1
+    totals = ai_engine.get_ai_metrics()["prompt_tokens"]
+    assert totals["analyses"] == 1
+    assert totals["prompt_tokens"] == result["token_report"]["prompt_tokens"]
+    assert "prompt tokens" not in capsys.readouterr().out
+
+
+def test_batched_analysis_and_stream_share_runner(stream_app, stub_llm, monkeypatch):
+    monkeypatch.setattr(ai_engine, "AI_BATCH_TOKEN_BUDGET", 1)
+    result = asyncio.run(ai_engine.analyze_diffs(CHANGES))
+    assert result["token_report"]["requests"] == 2
+    assert set(result["risk_assessments"]) == {"c1", "c2"}
+    assert not result["partial"]
+
+    async def collect():
+        return [event async for event in ai_engine.stream_diff_analysis(CHANGES)]
+
+    events = asyncio.run(collect())
+    assert {e["data"]["clause_id"] for e in events if e["event"] == "risk"} == {"c1", "c2"}
+    assert events[-1]["data"]["risk_assessments"] == result["risk_assessments"]
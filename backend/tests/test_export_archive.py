@@ -0,0 +1,85 @@
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import database
+import main
+import models
+from lib import export_archive
+
+
+@pytest.fixture
+def contract_id(db, tmp_path, monkeypatch):
+    # 输出阶段按需读取内容的会话也使用测试数据库
+    monkeypatch.setattr(export_archive, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    main.app.dependency_overrides[database.get_db] = lambda: db
+
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="合同")
+    db.add(contract)
+    db.flush()
+    versions = []
+    for n in (1, 2):
+        path = tmp_path / f"v{n}.docx"
+        path.write_bytes(b"docx %d" % n)
+        version = models.Version(contract_id=contract.id, version_number=n, file_path=str(path),
+                                 commit_message=f"v{n}", html_content=f"<p>第{n}版</p>")
+        db.add(version)
+        db.flush()
+        versions.append(version)
+    db.add(models.Diff(version_id=versions[1].id, previous_version_id=versions[0].id, content='[{"type":"modified"}]'))
+    db.commit()
+    yield contract.id
+    main.app.dependency_overrides.pop(database.get_db, None)
+
+
+def test_export_contents_and_revalidation(db, contract_id, statements):
+    client = TestClient(main.app)
+    response = client.get(f"/contracts/{contract_id}/export")
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    names = archive.namelist()
+    html = [n for n in names if "/html/" in n]
+    assert [archive.read(n).decode("utf-8") for n in html] == ["<p>第1版</p>", "<p>第2版</p>"]
+    diff = json.loads(archive.read(next(n for n in names if "/diffs/" in n)))
+    assert diff == {"base_version": 1, "target_version": 2, "items": [{"type": "modified"}]}
+
+    statements.clear()
+    cached = client.get(f"/contracts/{contract_id}/export", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    # 304 不读取 HTML / diff 内容，也不写入
+    assert not any("html_content" in s or "diffs.content" in s for s in statements)
+    assert not any(s.lstrip().upper().startswith(("INSERT", "UPDATE")) for s in statements)
+
+
+def test_repeat_export_does_not_reread_content(db, contract_id, statements):
+    contract = db.get(models.Contract, contract_id)
+    fingerprint, build = export_archive.build_contract_export(db, contract)
+    first, final = build()
+    assert final == fingerprint
+    # 首次完整输出时顺带计算并缓存 CRC
+    assert zipfile.ZipFile(io.BytesIO(b"".join(first.iter_bytes()))).testzip() is None
+
+    statements.clear()
+    _, build = export_archive.build_contract_export(db, contract)
+    second, _ = build()
+    assert not any("html_content" in s or "diffs.content" in s for s in statements)
+    assert [e.size for e in second.entries] == [e.size for e in first.entries]
+    assert b"".join(second.iter_bytes()) == b"".join(first.iter_bytes())
+
+
+def test_project_export_revalidates(db, contract_id):
+    project_id = db.get(models.Contract, contract_id).project_id
+    client = TestClient(main.app)
+    response = client.get(f"/projects/{project_id}/export")
+    assert response.status_code == 200
+    assert len(zipfile.ZipFile(io.BytesIO(response.content)).namelist()) == 6
+    cached = client.get(f"/projects/{project_id}/export", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import database
+import main
+import models
+from routers import versions
+
+
+@pytest.fixture
+def importer(db, tmp_path, monkeypatch):
+    """导入接口：使用测试数据库，记录导入后排队的后台任务。"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / versions.UPLOAD_DIR).mkdir()
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    main.app.dependency_overrides[database.get_db] = lambda: db
+
+    calls = []
+    monkeypatch.setattr(versions, "rebuild_clause_index_task", lambda contract_id: calls.append("index"))
+    monkeypatch.setattr(versions, "rebuild_lineage_task", lambda contract_id: calls.append("lineage"))
+
+    async def summaries(contract_id):
+        calls.append("summaries")
+
+    monkeypatch.setattr(versions, "generate_contract_clause_summaries", summaries)
+
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.commit()
+
+    def run(import_documents):
+        monkeypatch.setattr(versions, "import_documents", import_documents)
+        response = TestClient(main.app).post(f"/contracts/{contract.id}/versions/import/stream",
+                                             files={"archive": ("history.zip", b"PK\x03\x04", "application/zip")})
+        assert response.status_code == 200, response.text
+        return response.text
+
+    yield run, calls, contract.id
+    main.app.dependency_overrides.pop(database.get_db, None)
+
+
+def test_failed_import_queues_nothing(importer):
+    run, calls, _ = importer
+
+    def failing(db, contract_id, source, progress=None):
+        raise ValueError("not a zip")
+
+    assert "event: error" in run(failing)
+    assert calls == []
+
+
+def test_empty_import_queues_nothing(importer):
+    run, calls, _ = importer
+    assert "event: result" in run(lambda db, contract_id, source, progress=None: {"created": 0, "errors": []})
+    assert calls == []
+
+
+def test_partially_committed_import_still_rebuilds(importer):
+    run, calls, contract_id = importer
+
+    def fails_after_first_batch(db, contract_id, source, progress=None):
+        db.add(models.Version(contract_id=contract_id, version_number=1, file_path="blob:1", commit_message="v1"))
+        db.commit()
+        raise OSError("disk full")
+
+    assert "event: error" in run(fails_after_first_batch)
+    assert calls == ["index", "lineage", "summaries"]
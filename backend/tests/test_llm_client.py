@@ -0,0 +1,151 @@
+import time
+import asyncio
+
+import pytest
+from openai import BadRequestError
+
+from lib import llm_client
+from lib.llm_client import BulkheadFullError, CircuitBreaker, CircuitOpenError, LLMClient
+
+MESSAGES = [{"role": "user", "content": '[{"clause_id":"c1"}]'}]
+
+
+@pytest.fixture
+def client(stub_llm, monkeypatch):
+    monkeypatch.setattr(llm_client, "AI_MAX_RETRIES", 0)
+    monkeypatch.setattr(llm_client, "AI_TIMEOUT_SECONDS", 5.0)
+    client = LLMClient(stub_llm.base_url, "stub")
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.2)
+    return client
+
+
+def _call(client):
+    return asyncio.run(client.chat_json(MESSAGES, model="stub-model"))
+
+
+def _fail(client, expected=Exception):
+    with pytest.raises(expected):
+        _call(client)
+
+
+def test_breaker_opens_after_consecutive_upstream_failures(client, stub_llm):
+    stub_llm.options.error_rate = 1.0
+    _fail(client)
+    assert client.breaker.state == "closed"
+    _fail(client)
+    assert client.breaker.state == "open"
+
+    # 打开期间不再请求上游
+    started = time.perf_counter()
+    _fail(client, CircuitOpenError)
+    assert time.perf_counter() - started < 0.1
+    assert client.stats["rejected_open_circuit"] == 1
+
+
+def test_half_open_trial_success_closes_breaker(client, stub_llm):
+    stub_llm.options.error_rate = 1.0
+    _fail(client)
+    _fail(client)
+    stub_llm.options.error_rate = 0.0
+    time.sleep(0.25)
+
+    assert "risk_assessments" in _call(client)
+    assert client.breaker.snapshot()["state"] == "closed"
+    assert client.breaker.consecutive_failures == 0
+
+
+def test_half_open_trial_failure_reopens_breaker(client, stub_llm):
+    stub_llm.options.error_rate = 1.0
+    _fail(client)
+    _fail(client)
+    time.sleep(0.25)
+
+    _fail(client)
+    assert client.breaker.state == "open"
+    assert client.breaker.open_count == 2
+    _fail(client, CircuitOpenError)
+
+
+def test_cancelled_trial_releases_half_open_slot(client, stub_llm):
+    stub_llm.options.error_rate = 1.0
+    _fail(client)
+    _fail(client)
+    time.sleep(0.25)
+    stub_llm.options.error_rate = 0.0
+    stub_llm.options.latency = 1.0
+
+    async def cancel_trial():
+        task = asyncio.create_task(client.chat_json(MESSAGES, model="stub-model"))
+        await asyncio.sleep(0.2)
+        assert client.breaker.trial_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert not client.breaker.trial_in_flight
+    assert client.stats["in_flight"] == 0
+
+    # 下一个请求仍可作为试探请求发出，并在成功后关闭熔断器
+    stub_llm.options.latency = 0.0
+    _call(client)
+    assert client.breaker.state == "closed"
+
+
+def test_client_errors_do_not_count_toward_breaker(client, stub_llm):
+    stub_llm.options.error_rate = 1.0
+    stub_llm.options.error_status = 400
+    for _ in range(3):
+        _fail(client, BadRequestError)
+    assert client.breaker.state == "closed"
+    assert client.breaker.consecutive_failures == 0
+    assert client.stats["failures"] == 3
+
+
+def test_malformed_json_does_not_count_toward_breaker(client, stub_llm):
+    stub_llm.options.canned = "not json"
+    for _ in range(3):
+        _fail(client, ValueError)
+    assert client.breaker.state == "closed"
+    assert client.breaker.consecutive_failures == 0
+
+
+def test_stream_closes_upstream_when_reader_stops(client, stub_llm):
+    stub_llm.options.canned = '{"summary": "' + "修订" * 1000 + '"}'
+    stub_llm.options.token_rate = 100
+
+    async def read_one():
+        stream = client.stream_text(MESSAGES, model="stub-model")
+        async for _ in stream:
+            break
+        await stream.aclose()
+
+        deadline = time.monotonic() + 2
+        while stub_llm.active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert stub_llm.active == 0
+
+    asyncio.run(read_one())
+
+
+def test_streams_hold_bulkhead_slot_until_closed(client, stub_llm, monkeypatch):
+    monkeypatch.setattr(llm_client, "AI_BULKHEAD_SIZE", 1)
+    monkeypatch.setattr(llm_client, "AI_BULKHEAD_WAIT_SECONDS", 0.2)
+    stub_llm.options.canned = '{"summary": "' + "修订" * 100 + '"}'
+    stub_llm.options.token_rate = 400
+
+    async def run():
+        first = client.stream_text(MESSAGES, model="stub-model")
+        await first.__anext__()
+        assert client.metrics()["bulkhead"]["in_flight"] == 1
+
+        # 第一个流尚未读完，第二个请求在舱壁外排队后被拒绝
+        with pytest.raises(BulkheadFullError):
+            await client.chat_json(MESSAGES, model="stub-model")
+
+        async for _ in first:
+            pass
+        assert client.metrics()["bulkhead"]["in_flight"] == 0
+        await client.chat_json(MESSAGES, model="stub-model")
+
+    asyncio.run(run())
@@ -0,0 +1,196 @@
+import os
+import re
+import sqlite3
+import importlib.util
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import database
+import main
+import models
+from lib import blob_refs, blob_store
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _load_migrate_db():
+    spec = importlib.util.spec_from_file_location("migrate_db", os.path.join(REPO_DIR, "migrate_db.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+migrate_db = _load_migrate_db()
+
+
+def _create_old_schema(path):
+    """
+    迁移前的数据库：外键没有 ON DELETE，后来新增的列与索引尚不存在，也还没有 blobs 表。
+    """
+    engine = database.create_db_engine(f"sqlite:///{path}")
+    dialect = engine.dialect
+    engine.dispose()
+    added = {(table, column) for table, column, _ in migrate_db.COLUMNS}
+    later_indexes = {name for name, _, _, _ in migrate_db.INDEXES}
+
+    conn = sqlite3.connect(path)
+    for table in database.Base.metadata.sorted_tables:
+        if table.name == "blobs":
+            continue
+        sql = str(CreateTable(table).compile(dialect=dialect))
+        conn.execute(re.sub(r"\s+ON DELETE (?:CASCADE|SET NULL)", "", sql))
+        for index in table.indexes:
+            if index.name not in later_indexes and not any((table.name, c.name) in added for c in index.columns):
+                conn.execute(str(CreateIndex(index).compile(dialect=dialect)))
+        for table_name, column in added:
+            if table_name == table.name:
+                conn.execute(f"ALTER TABLE {table_name} DROP COLUMN {column}")
+    conn.commit()
+    conn.close()
+
+
+def _foreign_keys(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            (table, key[3]): key[6]
+            for table in {table for table, _, _, _ in migrate_db.FOREIGN_KEYS}
+            for key in conn.execute(f"PRAGMA foreign_key_list({table})")
+        }
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _create_old_schema(str(tmp_path / "lextrace.db"))
+    migrate_db.migrate()
+
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'lextrace.db'}")
+    # 应用启动时补建新增的表（blobs）
+    database.Base.metadata.create_all(engine)
+    monkeypatch.setattr(blob_store, "_store", blob_store.LocalBlobStore(str(tmp_path / "blobs")))
+    monkeypatch.setattr(blob_refs, "SessionLocal", sessionmaker(bind=engine))
+    yield tmp_path / "lextrace.db", engine
+    engine.dispose()
+
+
+def _seed_contract(db, project, shas, tmp_path):
+    contract = models.Contract(project_id=project.id, name=f"{project.name}-c")
+    db.add(contract)
+    db.flush()
+    versions = []
+    for n, sha256 in enumerate(shas, start=1):
+        src = tmp_path / f"{project.name}-{n}.docx"
+        src.write_bytes(sha256.encode())
+        version = models.Version(contract_id=contract.id, version_number=n, sha256=sha256, commit_message=f"v{n}",
+                                 original_filename=src.name, file_path=blob_refs.store_blob(db, str(src), sha256))
+        db.add(version)
+        db.flush()
+        versions.append((version, src))
+    first, last = versions[0][0], versions[-1][0]
+    db.add_all([
+        models.Diff(version_id=last.id, previous_version_id=first.id, content="[]"),
+        models.OperationLog(contract_id=contract.id, action="upload_version", details="v1"),
+        models.Comment(contract_id=contract.id, version_id=first.id, element_id="c1", content="note"),
+        models.ClauseSummary(contract_id=contract.id, clause_id="c1", from_version=1, to_version=len(shas), summary="{}"),
+        models.ClauseIndexEntry(contract_id=contract.id, clause_id="c1"),
+        models.ClauseIndexState(contract_id=contract.id, version_id=last.id, version_number=last.version_number),
+        models.ClauseLineage(contract_id=contract.id, version_id=first.id, version_number=1, clause_id="c1", change_type="added"),
+        models.ClauseLineageState(version_id=first.id, contract_id=contract.id),
+    ])
+    return contract, versions
+
+
+CHILD_TABLES = [models.Contract, models.Version, models.Diff, models.OperationLog, models.Comment, models.ClauseSummary,
+                models.ClauseIndexEntry, models.ClauseIndexState, models.ClauseLineage, models.ClauseLineageState]
+
+
+def test_migration_adds_cascades_columns_and_indexes(migrated):
+    path, _ = migrated
+    keys = _foreign_keys(str(path))
+    for table, column, _, action in migrate_db.FOREIGN_KEYS:
+        assert keys[(table, column)] == action, (table, column)
+
+    conn = sqlite3.connect(str(path))
+    try:
+        for table, column, _ in migrate_db.COLUMNS:
+            assert column in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    finally:
+        conn.close()
+    assert {name for name, _, _, _ in migrate_db.INDEXES} <= indexes
+
+
+def test_migration_is_idempotent(migrated, capsys):
+    path, _ = migrated
+    before = _foreign_keys(str(path))
+    migrate_db.migrate()
+    assert "Foreign keys already cascade." in capsys.readouterr().out
+    assert _foreign_keys(str(path)) == before
+
+
+def test_delete_project_cascades_after_migration(migrated):
+    _, engine = migrated
+    shared, only_deleted, only_kept = "a" * 64, "b" * 64, "c" * 64
+    with Session(engine) as db:
+        doomed = models.Project(name="doomed")
+        kept = models.Project(name="kept")
+        db.add_all([doomed, kept])
+        db.flush()
+        _, doomed_versions = _seed_contract(db, doomed, [shared, only_deleted], migrated[0].parent)
+        kept_contract, kept_versions = _seed_contract(db, kept, [shared, only_kept], migrated[0].parent)
+        db.commit()
+        for version, src in doomed_versions + kept_versions:
+            blob_refs.place_blob(str(src), version.sha256)
+        doomed_id, kept_contract_id = doomed.id, kept_contract.id
+        counts_before = {model: db.query(model).count() for model in CHILD_TABLES}
+
+    main.app.dependency_overrides[database.get_db] = lambda: Session(engine)
+    try:
+        response = TestClient(main.app).delete(f"/projects/{doomed_id}")
+    finally:
+        main.app.dependency_overrides.pop(database.get_db, None)
+    assert response.status_code == 200, response.text
+
+    with Session(engine) as db:
+        assert db.get(models.Project, doomed_id) is None
+        for model in CHILD_TABLES:
+            # 每张子表只剩保留项目的那一半
+            assert db.query(model).count() == counts_before[model] // 2, model.__tablename__
+        assert {c.id for c in db.query(models.Contract)} == {kept_contract_id}
+        assert db.query(models.Diff).one().previous_version_id is not None
+
+        refs = {blob.sha256: blob.ref_count for blob in db.query(models.Blob)}
+    assert refs == {shared: 1, only_kept: 1}
+
+    store = blob_store.get_blob_store()
+    assert store.exists(shared) and store.exists(only_kept)
+    assert not store.exists(only_deleted)
+
+
+def test_delete_before_migration_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _create_old_schema(str(tmp_path / "lextrace.db"))
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'lextrace.db'}")
+    database.Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        project = models.Project(name="p")
+        db.add(project)
+        db.flush()
+        db.add(models.Contract(project_id=project.id, name="c"))
+        db.commit()
+        project_id = project.id
+
+    main.app.dependency_overrides[database.get_db] = lambda: Session(engine)
+    try:
+        response = TestClient(main.app).delete(f"/projects/{project_id}")
+    finally:
+        main.app.dependency_overrides.pop(database.get_db, None)
+        engine.dispose()
+    assert response.status_code == 409
+    assert "migrate_db.py" in response.json()["detail"]
@@ -0,0 +1,146 @@
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+import database
+import main
+import models
+from lib.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+ROWS = 5
+# 日志与评论的 created_at 全部相同，只能靠 id 区分先后
+CREATED_AT = datetime(2024, 5, 1, 8, 0, 0)
+
+
+@pytest.fixture
+def api(tmp_path):
+    """文件数据库：同步引擎建表造数，分页接口通过异步会话读取。"""
+    path = tmp_path / "pagination.db"
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        project = models.Project(name="p")
+        db.add(project)
+        db.flush()
+        contracts = [models.Contract(project_id=project.id, name=f"c{i}") for i in range(ROWS)]
+        db.add_all(contracts)
+        db.flush()
+        contract = contracts[0]
+        versions = [models.Version(contract_id=contract.id, version_number=n, file_path=f"blob:{n}", commit_message=f"v{n}")
+                    for n in range(1, ROWS + 1)]
+        db.add_all(versions)
+        db.flush()
+        db.add_all(models.OperationLog(contract_id=contract.id, action="upload_version", details=f"log {i}", created_at=CREATED_AT)
+                   for i in range(ROWS))
+        db.add_all(models.Comment(contract_id=contract.id, version_id=versions[0].id, element_id="c1", content=f"comment {i}",
+                                  created_at=CREATED_AT)
+                   for i in range(ROWS))
+        db.commit()
+        ids = {"project": project.id, "contract": contract.id, "version": versions[0].id}
+    engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    sessions = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with sessions() as db:
+            yield db
+
+    main.app.dependency_overrides[database.get_async_db] = get_async_db
+    try:
+        yield TestClient(main.app), ids
+    finally:
+        main.app.dependency_overrides.pop(database.get_async_db, None)
+
+
+# (路径, 每行的标识, 期望顺序是否为 id 降序)
+ENDPOINTS = {
+    "versions": ("/contracts/{contract}/versions/", lambda row: row["version_number"], True),
+    "logs": ("/contracts/{contract}/logs", lambda row: row["id"], True),
+    "comments": ("/contracts/{contract}/versions/{version}/comments/", lambda row: row["id"], True),
+    "contracts": ("/contracts/?project_id={project}", lambda row: row["id"], False),
+}
+
+
+def _walk(client, path, limit):
+    """按游标逐页读取，返回 (全部行, 页数)。"""
+    rows, pages, cursor = [], 0, None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        pages += 1
+        rows += response.json()
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return rows, pages
+
+
+@pytest.mark.parametrize("name", ENDPOINTS)
+def test_cursor_round_trip_visits_every_row_once(api, name):
+    client, ids = api
+    template, identity, descending = ENDPOINTS[name]
+    path = template.format(**ids)
+
+    everything, pages = _walk(client, path, ROWS + 1)
+    assert pages == 1
+    keys = [identity(row) for row in everything]
+    assert len(keys) == ROWS
+    assert keys == sorted(keys, reverse=descending)
+
+    rows, pages = _walk(client, path, 2)
+    assert pages == 3
+    assert [identity(row) for row in rows] == keys
+
+
+@pytest.mark.parametrize("name", ENDPOINTS)
+def test_full_last_page_has_no_cursor(api, name):
+    client, ids = api
+    template, _, _ = ENDPOINTS[name]
+    response = client.get(template.format(**ids), params={"limit": ROWS})
+    assert response.status_code == 200
+    assert len(response.json()) == ROWS
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+BAD_CURSORS = [
+    "!!!",
+    _b64("not json"),
+    _b64('{"created_at": 1}'),
+    _b64("[1, 2, 3]"),
+    _b64('["yesterday", 1]'),
+    _b64('[null, "x"]'),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode("ascii"),
+]
+
+
+@pytest.mark.parametrize("name", ENDPOINTS)
+@pytest.mark.parametrize("cursor", BAD_CURSORS)
+def test_bad_cursor_returns_400(api, name, cursor):
+    client, ids = api
+    template, _, _ = ENDPOINTS[name]
+    response = client.get(template.format(**ids), params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_cursor_round_trips_datetimes_and_ids():
+    cursor = encode_cursor([CREATED_AT, 7])
+    assert decode_cursor(cursor, (datetime, int)) == [CREATED_AT, 7]
+    assert decode_cursor(None, (int,)) is None
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor, (int,))
+    assert excinfo.value.status_code == 400
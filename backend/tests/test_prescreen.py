@@ -0,0 +1,34 @@
+from lib.prescreen import _normalize_cosmetic, prescreen_changes
+
+
+def _modified(original, modified, change_type="modified"):
+    return {"type": "modified", "change_type": change_type, "clause_id": "1",
+            "original": original, "modified": modified}
+
+
+def test_decimal_and_thousands_changes_are_not_cosmetic():
+    change = _modified("违约金为合同总价的1.5%，即人民币1,000元。", "违约金为合同总价的15%，即人民币10,00元。")
+    llm_changes, local, report = prescreen_changes([change])
+
+    assert local == {}
+    assert llm_changes == [change]
+    kinds = {delta["kind"] for delta in report["numeric_deltas"]["1"]}
+    assert {"money", "percentage"} <= kinds
+
+
+def test_separators_between_digits_are_kept():
+    assert _normalize_cosmetic("1.5") != _normalize_cosmetic("15")
+    assert _normalize_cosmetic("1,000") != _normalize_cosmetic("10,00")
+    assert _normalize_cosmetic("1．5") != _normalize_cosmetic("15")
+    assert _normalize_cosmetic("1，000") != _normalize_cosmetic("10，00")
+    # 句末标点仍视为格式调整
+    assert _normalize_cosmetic("付款。") == _normalize_cosmetic("付款")
+
+
+def test_whitespace_and_punctuation_only_is_resolved_locally():
+    change = _modified("甲方 应于30日内付款。", "甲方应于30日内付款")
+    llm_changes, local, report = prescreen_changes([change])
+
+    assert llm_changes == []
+    assert local["1"]["risk"] == "low"
+    assert report["resolved_locally"] == 1
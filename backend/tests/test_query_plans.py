@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import event
+
+from check_query_plans import explain_problems, hot_queries, plan_problems
+from database import Base
+import models
+from lib.clause_index import get_clause_index
+from lib.clause_lineage import blame_clause, ensure_contract_lineage, lineage_histories, walk_lineage
+from lib.clause_matrix import iter_clause_rows
+from lib.export_archive import build_contract_export
+
+TABLES = set(Base.metadata.tables)
+
+
+def _hot_query_names():
+    from sqlalchemy.orm import Session
+
+    with Session() as db:
+        return [name for name, _, _ in hot_queries(db)]
+
+
+@pytest.mark.parametrize("name", _hot_query_names())
+def test_hot_query_uses_indexes(db, name):
+    query, ordered = next((q, o) for n, q, o in hot_queries(db) if n == name)
+    details, problems = plan_problems(db.connection(), query, ordered)
+    assert not problems, "\n".join(details)
+
+
+def _seed(db):
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.flush()
+    versions = []
+    for n in (1, 2, 3):
+        version = models.Version(contract_id=contract.id, version_number=n, file_path=f"blob:{n:064d}",
+                                 sha256=f"{n:064d}", commit_message=f"v{n}")
+        db.add(version)
+        db.flush()
+        versions.append(version)
+    for prev, version in zip([None] + versions, versions):
+        db.add(models.ClauseLineage(
+            contract_id=contract.id, version_id=version.id, version_number=version.version_number, clause_id="c1",
+            prev_version_id=prev.id if prev else None, prev_clause_id="c1" if prev else None,
+            change_type="unchanged" if prev else "added", content="text"
+        ))
+        db.add(models.ClauseLineageState(version_id=version.id, contract_id=contract.id,
+                                         prev_version_id=prev.id if prev else None))
+    db.commit()
+    return contract, versions
+
+
+CODE_PATHS = {
+    "walk_lineage": lambda db, contract, versions: walk_lineage(db, contract.id, "c1", 1, 3),
+    "blame_clause": lambda db, contract, versions: blame_clause(db, contract.id, "c1"),
+    "lineage_histories": lambda db, contract, versions: lineage_histories(db, contract.id, None, versions),
+    "clause matrix": lambda db, contract, versions: list(iter_clause_rows(db, [v.id for v in versions])),
+    "ensure_contract_lineage": lambda db, contract, versions: ensure_contract_lineage(db, contract.id),
+    "get_clause_index": lambda db, contract, versions: get_clause_index(db, contract.id),
+    "export fingerprint": lambda db, contract, versions: build_contract_export(db, contract),
+}
+
+
+@pytest.mark.parametrize("name", list(CODE_PATHS))
+def test_code_path_queries_use_indexes(db, name):
+    """热点函数实际执行的每条 SELECT 都不能全表扫描。"""
+    contract, versions = _seed(db)
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            executed.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        CODE_PATHS[name](db, contract, versions)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert executed
+    for statement, parameters in executed:
+        details, problems = explain_problems(db.connection(), statement, parameters, TABLES, ordered=False)
+        assert not problems, f"{statement}\n" + "\n".join(details)
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+from lib import blob_store, uploads
+from lib.uploads import ZIP_SIGNATURE, save_upload
+from routers import versions
+
+CONTENT = ZIP_SIGNATURE + b"word/document.xml" * 1000
+
+
+def _save(tmp_path, content, size=None, max_bytes=uploads.MAX_UPLOAD_BYTES):
+    upload = UploadFile(io.BytesIO(content), size=size, filename="a.docx")
+    dest = tmp_path / "upload.part"
+    return asyncio.run(save_upload(upload, str(dest), max_bytes)), dest
+
+
+def test_hashes_while_writing_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1000)
+    (size, sha256), dest = _save(tmp_path, CONTENT)
+    assert size == len(CONTENT)
+    assert sha256 == hashlib.sha256(CONTENT).hexdigest()
+    assert dest.read_bytes() == CONTENT
+
+
+@pytest.mark.parametrize("declared_size", [None, len(CONTENT)])
+def test_size_cap_rejects_and_removes_partial_file(tmp_path, monkeypatch, declared_size):
+    # 声明了大小时直接拒绝；未声明时边读边计数，超出时删除已写入的部分
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1000)
+    with pytest.raises(HTTPException) as excinfo:
+        _save(tmp_path, CONTENT, size=declared_size, max_bytes=len(CONTENT) - 1)
+    assert excinfo.value.status_code == 413
+    assert not (tmp_path / "upload.part").exists()
+
+
+def test_upload_exactly_at_cap_is_accepted(tmp_path):
+    (size, _), _ = _save(tmp_path, CONTENT, max_bytes=len(CONTENT))
+    assert size == len(CONTENT)
+
+
+@pytest.mark.parametrize("content", [b"", b"%PDF-1.7 not a docx", b"PK"])
+def test_rejects_empty_or_non_zip_upload(tmp_path, content):
+    with pytest.raises(HTTPException) as excinfo:
+        _save(tmp_path, content)
+    assert excinfo.value.status_code == 400
+    assert not (tmp_path / "upload.part").exists()
+
+
+@pytest.fixture
+def client(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / versions.UPLOAD_DIR).mkdir()
+    monkeypatch.setattr(blob_store, "_store", blob_store.LocalBlobStore(str(tmp_path / "blobs")))
+    main.app.dependency_overrides[database.get_db] = lambda: db
+    project = models.Project(name="p")
+    db.add(project)
+    db.flush()
+    contract = models.Contract(project_id=project.id, name="c")
+    db.add(contract)
+    db.commit()
+    yield TestClient(main.app), contract.id
+    main.app.dependency_overrides.pop(database.get_db, None)
+
+
+def test_identical_upload_is_rejected(client, db, tmp_path):
+    http, contract_id = client
+
+    def upload(content):
+        return http.post(f"/contracts/{contract_id}/versions/", data={"commit_message": "m"},
+                         files={"file": ("a.docx", content, "application/octet-stream")})
+
+    first = upload(CONTENT)
+    assert first.status_code == 200, first.text
+    assert first.json()["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+
+    second = upload(CONTENT)
+    assert second.status_code == 409
+    assert "v1" in second.json()["detail"]
+    assert db.query(models.Version).count() == 1
+    assert db.get(models.Blob, first.json()["sha256"]).ref_count == 1
+    # 临时文件在两种情况下都已清理
+    assert list((tmp_path / versions.UPLOAD_DIR).glob(".*.part")) == []
@@ -0,0 +1,241 @@
+"""
+AI 分析链路的离线延迟/吞吐基准测试。
+
+脚本在后台启动 llm_stub_server，使用临时目录中的 SQLite 数据库和生成的 DOCX 合同，
+通过进程内 ASGI 传输（不监听端口、不访问外网）并发请求：
+- GET /contracts/{id}/versions/{vid}/diff/analysis
+- GET /contracts/{id}/clauses/{clause_id}/history
+并输出每个接口的 p50/p95/p99 延迟、吞吐量与错误数，以及 /metrics/ai 的上游调用统计。
+
+用法:
+    python tools/ai_benchmark.py --requests 200 --concurrency 20 --latency 0.3 --token-rate 400
+    python tools/ai_benchmark.py --error-rate 0.2 --fail-on-error   # 用于 CI：出现非 2xx 响应时返回非零退出码
+    python tools/ai_benchmark.py --cache   # 保留 AI 结果缓存，测量缓存命中路径
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_stub_server  # noqa: E402
+
+STUB_PORT = 9301
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for the AI analysis endpoints")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent in-flight requests per endpoint")
+    parser.add_argument("--versions", type=int, default=4, help="Number of contract versions to generate")
+    parser.add_argument("--clauses", type=int, default=30, help="Number of clauses per generated version")
+    parser.add_argument("--endpoints", default="analysis,history", help="Comma-separated subset of: analysis,history")
+    parser.add_argument("--cache", action="store_true", help="Keep the AI result cache enabled (default: disabled)")
+    parser.add_argument("--fail-on-error", action="store_true", help="Exit with status 1 if any request is not 2xx")
+    parser.add_argument("--stub-port", type=int, default=STUB_PORT)
+    # 透传给 stub 服务器的参数
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--latency-jitter", type=float, default=0.1)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--canned", default=None, help="Path to a file whose content the stub returns verbatim")
+    return parser
+
+
+def configure_environment(options, workdir: str) -> None:
+    """
+    必须在导入 main / lib.* 之前调用：模块级配置在导入时读取环境变量。
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["AI_BASE_URL"] = f"http://127.0.0.1:{options.stub_port}/v1"
+    os.environ["OPENROUTER_API_KEY"] = "stub"
+    os.environ["DEFAULT_AI_MODEL"] = "stub-model"
+    os.environ["AI_CACHE_ENABLED"] = "true" if options.cache else "false"
+    # 上传目录等相对路径都落在临时目录中
+    os.chdir(workdir)
+
+
+def start_stub(options):
+    stub_options = llm_stub_server.build_parser().parse_args(["--port", str(options.stub_port)])
+    for key in ("latency", "latency_jitter", "token_rate", "error_rate", "error_status"):
+        setattr(stub_options, key, getattr(options, key))
+    if options.canned:
+        with open(options.canned, encoding="utf-8") as f:
+            stub_options.canned = f.read()
+    server = llm_stub_server.serve(stub_options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_contract_docx(path: str, version: int, clause_count: int) -> None:
+    """
+    生成一份合同：每个版本修改部分条款的金额/期限，并在后续版本中新增、删除条款。
+    """
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph("股权投资协议")
+    for i in range(1, clause_count + 1):
+        if version > 1 and i % 7 == 0:
+            continue  # 后续版本删除部分条款
+        document.add_paragraph(f"第{i}条 条款标题{i}")
+        amount = 1000 * i + (version - 1) * 50 * (i % 3)
+        days = 30 + (version - 1) * (i % 4)
+        document.add_paragraph(
+            f"甲方应于本协议签署后{days}日内向乙方支付人民币{amount}万元，"
+            f"逾期按每日万分之{5 + (i % 2) * version}支付违约金。"
+        )
+    for extra in range(version - 1):
+        n = clause_count + extra + 1
+        document.add_paragraph(f"第{n}条 补充条款{n}")
+        document.add_paragraph(f"双方同意就第{n}项事宜另行签署补充协议。")
+    document.save(path)
+
+
+async def seed(client, workdir: str, options) -> dict:
+    """
+    通过 API 创建项目、合同并上传各版本，返回后续请求所需的 ID。
+    """
+    from lib.doc_parser import extract_clauses
+
+    response = await client.post("/projects/", json={"name": "Benchmark", "description": "ai_benchmark"})
+    response.raise_for_status()
+    project_id = response.json()["id"]
+
+    response = await client.post("/contracts/", json={"name": "Benchmark Contract", "project_id": project_id})
+    response.raise_for_status()
+    contract_id = response.json()["id"]
+
+    version_ids = []
+    last_path = None
+    for version in range(1, options.versions + 1):
+        last_path = os.path.join(workdir, f"contract_v{version}.docx")
+        write_contract_docx(last_path, version, options.clauses)
+        with open(last_path, "rb") as f:
+            response = await client.post(
+                f"/contracts/{contract_id}/versions/",
+                files={"file": (os.path.basename(last_path), f,
+                                "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
+                data={"commit_message": f"v{version}"},
+            )
+        response.raise_for_status()
+        version_ids.append(response.json()["id"])
+
+    clause_ids = [c["id"] for c in extract_clauses(last_path)]
+    return {"contract_id": contract_id, "version_ids": version_ids, "clause_ids": clause_ids}
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """最近秩法计算百分位数。"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_load(client, urls, concurrency: int) -> dict:
+    """
+    以固定并发度依次发送 urls 中的请求，统计延迟与状态码。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(url: str):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(urls),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(urls) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "statuses": statuses,
+        "errors": sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 300)),
+    }
+
+
+def build_urls(endpoint: str, ids: dict, count: int):
+    contract_id = ids["contract_id"]
+    version_ids = ids["version_ids"]
+    clause_ids = ids["clause_ids"]
+    urls = []
+    for i in range(count):
+        if endpoint == "analysis":
+            # 轮流分析相邻版本对
+            version_id = version_ids[1 + i % (len(version_ids) - 1)]
+            urls.append(f"/contracts/{contract_id}/versions/{version_id}/diff/analysis")
+        else:
+            clause_id = clause_ids[i % len(clause_ids)]
+            urls.append(f"/contracts/{contract_id}/clauses/{clause_id}/history")
+    return urls
+
+
+async def main_async(options) -> int:
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        ids = await seed(client, os.getcwd(), options)
+        print(f"seeded contract {ids['contract_id']}: {len(ids['version_ids'])} versions, "
+              f"{len(ids['clause_ids'])} clauses in latest version")
+
+        results = {}
+        for endpoint in [e.strip() for e in options.endpoints.split(",") if e.strip()]:
+            urls = build_urls(endpoint, ids, options.requests)
+            results[endpoint] = await run_load(client, urls, options.concurrency)
+            print(f"{endpoint}: {json.dumps(results[endpoint], ensure_ascii=False)}")
+
+        response = await client.get("/metrics/ai")
+        print("ai metrics:", json.dumps(response.json(), ensure_ascii=False))
+
+    if options.fail_on_error and any(r["errors"] for r in results.values()):
+        return 1
+    return 0
+
+
+def main():
+    options = build_parser().parse_args()
+    if options.versions < 2:
+        print("--versions must be at least 2")
+        return 2
+    if options.canned:
+        options.canned = os.path.abspath(options.canned)
+
+    workdir = tempfile.mkdtemp(prefix="lextrace-bench-")
+    configure_environment(options, workdir)
+    server = start_stub(options)
+    try:
+        return asyncio.run(main_async(options))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
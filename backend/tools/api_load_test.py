@@ -0,0 +1,76 @@
+"""
+对运行中的 API 做并发读压测，报告吞吐、延迟分位数与服务端实际达到的并发度。
+
+以固定并发数（默认 200 个协程）循环请求给定路径，持续 --seconds 秒。"并发度"用 Little 定律估算
+（吞吐 × 平均延迟），即服务端同时在处理的请求数；同步路由受线程池大小（默认 40）限制，异步路由不受。
+对比改造前后：分别启动两个版本的服务（单 worker），用相同参数运行本脚本。
+
+用法（在 backend 目录下运行）:
+    uvicorn main:app --port 8000 --workers 1
+    python tools/api_load_test.py --base-url http://127.0.0.1:8000 /projects/ /contracts/1/logs /contracts/1/versions/
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(base_url: str, paths, concurrency: int, seconds: float):
+    import httpx
+
+    latencies, failures = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def loop(index: int) -> None:
+            nonlocal failures
+            i = index
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        failures += 1
+                        continue
+                except httpx.HTTPError:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="轮流请求的路径")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    args = parser.parse_args()
+
+    latencies, failures, elapsed = asyncio.run(run(args.base_url, args.paths, args.concurrency, args.seconds))
+    if not latencies:
+        sys.exit(f"no successful requests ({failures} failed)")
+    throughput = len(latencies) / elapsed
+    mean = sum(latencies) / len(latencies)
+    print(f"{len(latencies)} requests in {elapsed:.1f}s, {failures} failed")
+    print(f"throughput {throughput:.1f} req/s, in flight ~{throughput * mean:.0f} (client concurrency {args.concurrency})")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.1f}ms, p95 {percentile(latencies, 0.95) * 1000:.1f}ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+批量上传处理（日期识别 + HTML 渲染）的串行与进程池并行耗时对比。
+
+生成 N 份带日期的合同 DOCX（默认 50 份），分别：
+1. 在当前进程内逐个处理（与改造前的 batch-stage / batch-commit 循环相同）
+2. 通过 lib.worker_pool.map_ordered 在进程池中处理
+并校验两种方式的结果完全一致、顺序一致。
+
+用法:
+    python tools/batch_stage_benchmark.py --files 50 --workers 4 --clauses 80
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_docx(path: str, index: int, clause_count: int) -> None:
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph("股权投资协议")
+    document.add_paragraph(f"签署日期：2023年{index % 12 + 1}月{index % 28 + 1}日")
+    for i in range(1, clause_count + 1):
+        document.add_paragraph(f"第{i}条 条款标题{i}")
+        document.add_paragraph(
+            f"甲方应于本协议签署后{30 + index}日内向乙方支付人民币{1000 * i + index}万元，"
+            f"逾期按每日万分之五支付违约金。"
+        )
+    table = document.add_table(rows=3, cols=3)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = "附表"
+    document.save(path)
+
+
+def run_serial(fn, paths):
+    results = []
+    for path in paths:
+        try:
+            results.append((fn(path), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs process-pool batch staging benchmark")
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--clauses", type=int, default=80, help="Clauses per generated document")
+    parser.add_argument("--workers", type=int, default=None, help="Overrides BATCH_WORKERS")
+    options = parser.parse_args()
+
+    if options.workers is not None:
+        os.environ["BATCH_WORKERS"] = str(options.workers)
+
+    from lib import worker_pool
+
+    workdir = tempfile.mkdtemp(prefix="lextrace-batch-")
+    paths = []
+    for i in range(options.files):
+        path = os.path.join(workdir, f"draft_{i:03d}.docx")
+        write_docx(path, i, options.clauses)
+        paths.append(path)
+    print(f"generated {len(paths)} documents in {workdir}; workers={worker_pool.BATCH_WORKERS}")
+
+    # 预热进程池，避免把 spawn 启动时间计入第一项
+    worker_pool.map_ordered(worker_pool.detect_date, paths[:2])
+
+    try:
+        for name, fn in (("detect_date", worker_pool.detect_date), ("render_html", worker_pool.render_html)):
+            started = time.perf_counter()
+            serial = run_serial(fn, paths)
+            serial_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            pooled = worker_pool.map_ordered(fn, paths)
+            pooled_s = time.perf_counter() - started
+
+            assert pooled == serial, f"{name}: pooled results differ from serial results"
+            errors = sum(1 for _, error in pooled if error)
+            print(f"{name}: serial {serial_s:.2f}s, pool {pooled_s:.2f}s, "
+                  f"speedup x{serial_s / pooled_s:.1f}, errors {errors}")
+    finally:
+        worker_pool.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+热点查询的执行计划回归检查（SQLite EXPLAIN QUERY PLAN）。
+
+对每个热点查询（与路由/lib 中的写法一致）执行 EXPLAIN QUERY PLAN，出现以下情况即视为回归：
+- 对被查询表的全表扫描（SCAN <table>，包括只按索引顺序整表扫描）
+- 查询声明了排序需要由索引满足，但计划中出现 USE TEMP B-TREE FOR ORDER BY
+任何一项回归时以退出码 1 结束。tests/test_query_plans.py 在 pytest 中对同一组查询逐条断言，
+并对 lib 中热点函数实际执行的 SQL 做同样的检查。
+
+默认在内存数据库中按 models.py 建表；--url 可检查已迁移的实际数据库（验证 migrate_db.py 是否补齐了索引）。
+
+用法（在 backend 目录下运行）:
+    python tools/check_query_plans.py
+    python tools/check_query_plans.py --url sqlite:///./data/lextrace.db -v
+"""
+import os
+import re
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# models 导入时会按 DATABASE_URL 建立连接；检查只需要 SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def hot_queries(db):
+    """(名称, 查询, 排序是否必须由索引满足)"""
+    import models
+
+    from datetime import datetime
+    from lib.pagination import after
+
+    contract_id, version_id, other_version_id = 1, 10, 9
+    sha256 = "0" * 64
+    since, cursor_time = datetime(2024, 1, 1), datetime(2024, 6, 1)
+    log_key = (models.OperationLog.created_at, models.OperationLog.id)
+    comment_key = (models.Comment.created_at, models.Comment.id)
+    return [
+        ("latest version of a contract",
+         db.query(models.Version.id).filter(models.Version.contract_id == contract_id)
+         .order_by(models.Version.version_number.desc()).limit(1), True),
+        ("versions of a contract in order",
+         db.query(models.Version.id).filter(models.Version.contract_id == contract_id)
+         .order_by(models.Version.version_number), True),
+        ("versions in a number range",
+         db.query(models.Version.id).filter(
+             models.Version.contract_id == contract_id,
+             models.Version.version_number >= 2, models.Version.version_number <= 5
+         ).order_by(models.Version.version_number), True),
+        ("version by id within a contract",
+         db.query(models.Version.id).filter(models.Version.id == version_id, models.Version.contract_id == contract_id), False),
+        ("rendered HTML by content hash",
+         db.query(models.Version.html_content).filter(models.Version.sha256 == sha256), False),
+        ("contracts of a project",
+         db.query(models.Contract.id).filter(models.Contract.project_id == contract_id), False),
+        ("comments on a version",
+         db.query(models.Comment.id).filter(
+             models.Comment.contract_id == contract_id, models.Comment.version_id == version_id
+         ).order_by(models.Comment.created_at.desc()), True),
+        ("comments cascaded with a version",
+         db.query(models.Comment.id).filter(models.Comment.version_id == version_id), False),
+        ("operation logs of a contract",
+         db.query(models.OperationLog.id).filter(models.OperationLog.contract_id == contract_id)
+         .order_by(models.OperationLog.created_at.desc()), True),
+        ("operation log page after a cursor",
+         db.query(models.OperationLog.id).filter(
+             models.OperationLog.contract_id == contract_id, after(log_key, (cursor_time, 500), descending=True)
+         ).order_by(*(column.desc() for column in log_key)).limit(101), True),
+        ("operation log page filtered by action and time range",
+         db.query(models.OperationLog.id).filter(
+             models.OperationLog.contract_id == contract_id, models.OperationLog.action == "view_diff",
+             models.OperationLog.created_at >= since, models.OperationLog.created_at < cursor_time,
+             after(log_key, (cursor_time, 500), descending=True)
+         ).order_by(*(column.desc() for column in log_key)).limit(101), True),
+        ("comment page after a cursor",
+         db.query(models.Comment.id).filter(
+             models.Comment.contract_id == contract_id, models.Comment.version_id == version_id,
+             after(comment_key, (cursor_time, 500), descending=True)
+         ).order_by(*(column.desc() for column in comment_key)).limit(101), True),
+        ("version page after a cursor",
+         db.query(models.Version.id).filter(
+             models.Version.contract_id == contract_id, after((models.Version.version_number,), (50,), descending=True)
+         ).order_by(models.Version.version_number.desc()).limit(101), True),
+        ("contract page of a project",
+         db.query(models.Contract.id).filter(
+             models.Contract.project_id == contract_id, after((models.Contract.id,), (500,))
+         ).order_by(models.Contract.id).limit(101), True),
+        ("project page",
+         db.query(models.Project.id).filter(after((models.Project.id,), (500,))).order_by(models.Project.id).limit(101), True),
+        ("stored diff for a version pair",
+         db.query(models.Diff.id).filter(
+             models.Diff.version_id == version_id, models.Diff.previous_version_id == other_version_id
+         ), False),
+        ("stored diffs of several versions",
+         db.query(models.Diff.id).filter(models.Diff.version_id.in_([version_id, other_version_id])), False),
+        ("stored diffs against a deleted version",
+         db.query(models.Diff.id).filter(models.Diff.previous_version_id == version_id), False),
+        ("clause index of a contract",
+         db.query(models.ClauseIndexEntry.id).filter(models.ClauseIndexEntry.contract_id == contract_id), False),
+        ("clause lineage of a version",
+         db.query(models.ClauseLineage.id).filter(models.ClauseLineage.version_id == version_id)
+         .order_by(models.ClauseLineage.id), False),
+        ("clause lineage of one clause",
+         db.query(models.ClauseLineage.id).filter(
+             models.ClauseLineage.contract_id == contract_id, models.ClauseLineage.clause_id == "1"
+         ).order_by(models.ClauseLineage.version_number), True),
+        ("latest lineage row of a clause in a version range (walk_lineage anchor)",
+         db.query(models.ClauseLineage.id).filter(
+             models.ClauseLineage.contract_id == contract_id, models.ClauseLineage.clause_id == "1",
+             models.ClauseLineage.version_number >= 2, models.ClauseLineage.version_number <= 5
+         ).order_by(models.ClauseLineage.version_number.desc()).limit(1), True),
+        ("lineage row of a clause in a version (walk_lineage backward step)",
+         db.query(models.ClauseLineage.id).filter(
+             models.ClauseLineage.contract_id == contract_id, models.ClauseLineage.clause_id == "1",
+             models.ClauseLineage.version_id == version_id
+         ).order_by(models.ClauseLineage.id).limit(1), False),
+        ("lineage rows matched against a clause (walk_lineage forward step)",
+         db.query(models.ClauseLineage.id).filter(
+             models.ClauseLineage.prev_version_id == version_id, models.ClauseLineage.prev_clause_id == "1",
+             models.ClauseLineage.clause_id.isnot(None)
+         ).order_by(models.ClauseLineage.id).limit(1), False),
+        ("lineage rows of several versions (lineage_histories, clause matrix)",
+         db.query(models.ClauseLineage.id).filter(
+             models.ClauseLineage.version_id.in_([version_id, other_version_id]), models.ClauseLineage.clause_id.isnot(None)
+         ).order_by(models.ClauseLineage.id), False),
+        ("lineage states of a contract",
+         db.query(models.ClauseLineageState.version_id).filter(models.ClauseLineageState.contract_id == contract_id), False),
+        ("clause summaries of a contract",
+         db.query(models.ClauseSummary.id).filter(models.ClauseSummary.contract_id == contract_id), False),
+    ]
+
+
+def explain_problems(conn, sql: str, parameters, tables, ordered: bool):
+    """
+    对一条 SQL（DBAPI 形式的 ? 占位符与参数）执行 EXPLAIN QUERY PLAN，返回 (计划各行, 问题列表)。
+    tables 为需要检查全表扫描的表名。
+    """
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", tuple(parameters or ())).fetchall()
+    details = [row[-1] for row in rows]
+
+    problems = []
+    for detail in details:
+        match = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+        if match and match.group(1) in tables:
+            problems.append(f"full scan: {detail}")
+        if ordered and "USE TEMP B-TREE FOR ORDER BY" in detail:
+            problems.append(f"sort not served by an index: {detail}")
+    return details, problems
+
+
+def plan_problems(conn, query, ordered: bool):
+    sql = str(query.statement.compile(conn.engine, compile_kwargs={"literal_binds": True}))
+    tables = {t.name for t in query.statement.get_final_froms()}
+    return explain_problems(conn, sql, (), tables, ordered)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="检查已有数据库（默认：按 models.py 新建内存数据库）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个查询的完整执行计划")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from database import Base
+    import models  # noqa: F401  注册所有表
+
+    engine = create_engine(args.url or "sqlite://")
+    if engine.dialect.name != "sqlite":
+        sys.exit("Query plan checks run against SQLite only")
+    if not args.url:
+        Base.metadata.create_all(engine)
+
+    failures = 0
+    with engine.connect() as conn:
+        db = Session(bind=conn)
+        for name, query, ordered in hot_queries(db):
+            details, problems = plan_problems(conn, query, ordered)
+            status = "FAIL" if problems else "ok"
+            print(f"[{status:>4}] {name}")
+            for problem in problems:
+                print(f"         {problem}")
+            if args.verbose:
+                for detail in details:
+                    print(f"         | {detail}")
+            failures += bool(problems)
+        db.close()
+
+    print(f"{failures} regression(s)" if failures else "all hot queries use indexes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
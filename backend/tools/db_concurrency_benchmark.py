@@ -0,0 +1,167 @@
+"""
+SQLite 并发读写吞吐对比：改造前的连接配置（回滚日志、默认 pragma）与 database.create_db_engine 的生产配置。
+
+模拟 `uvicorn --workers N`：启动 N 个进程、每个进程 T 个线程，在同一个数据库文件上混合执行
+读（合同的操作日志、版本列表）与写（插入操作日志并提交）。journal_mode 会持久化在数据库文件中，
+因此每种配置都使用新建的数据库。报告读写吞吐、p50/p95 延迟以及 "database is locked" 错误数。
+
+用法（在 backend 目录下运行）:
+    python tools/db_concurrency_benchmark.py
+    python tools/db_concurrency_benchmark.py --workers 2 --threads 8 --seconds 10 --write-ratio 0.3
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# database 导入时会按 DATABASE_URL 建立默认引擎；基准测试使用自己的数据库文件
+os.environ["DATABASE_URL"] = "sqlite://"
+
+PROFILES = ("baseline", "tuned")
+CONTRACTS = 20
+
+
+def make_engine(profile: str, url: str):
+    from sqlalchemy import create_engine
+    from database import create_db_engine
+
+    if profile == "baseline":
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_db_engine(url)
+
+
+def seed(profile: str, url: str, versions: int, logs: int) -> None:
+    from sqlalchemy.orm import Session
+    from database import Base
+    import models
+
+    engine = make_engine(profile, url)
+    Base.metadata.create_all(engine)
+    html = "<p>" + "条款内容 " * 2000 + "</p>"
+    with Session(engine) as db:
+        project = models.Project(name="benchmark")
+        db.add(project)
+        db.flush()
+        for c in range(CONTRACTS):
+            contract = models.Contract(project_id=project.id, name=f"contract {c}")
+            db.add(contract)
+            db.flush()
+            db.add_all(models.Version(contract_id=contract.id, version_number=n, file_path=f"blob:{c:032d}{n:032d}",
+                                      commit_message=f"v{n}", html_content=html) for n in range(1, versions + 1))
+            db.add_all(models.OperationLog(contract_id=contract.id, action="upload_version", details=f"seed {n}")
+                       for n in range(logs))
+        db.commit()
+    engine.dispose()
+
+
+def run_worker(profile: str, url: str, threads: int, seconds: float, write_ratio: float, results) -> None:
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import Session
+    import models
+
+    engine = make_engine(profile, url)
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    totals = {"read": [], "write": [], "locked": 0, "errors": 0}
+
+    def loop(seed_value: int) -> None:
+        rng = random.Random(seed_value)
+        reads, writes, locked, errors = [], [], 0, 0
+        while time.perf_counter() < deadline:
+            contract_id = rng.randint(1, CONTRACTS)
+            is_write = rng.random() < write_ratio
+            started = time.perf_counter()
+            try:
+                with Session(engine) as db:
+                    if is_write:
+                        db.add(models.OperationLog(contract_id=contract_id, action="benchmark", details="x" * 512))
+                        db.commit()
+                    elif rng.random() < 0.5:
+                        db.query(models.OperationLog).filter(models.OperationLog.contract_id == contract_id).order_by(
+                            models.OperationLog.created_at.desc()
+                        ).limit(50).all()
+                    else:
+                        db.query(models.Version.id, models.Version.version_number, models.Version.commit_message).filter(
+                            models.Version.contract_id == contract_id
+                        ).order_by(models.Version.version_number).all()
+            except OperationalError as e:
+                if "locked" in str(e):
+                    locked += 1
+                else:
+                    errors += 1
+                continue
+            (writes if is_write else reads).append(time.perf_counter() - started)
+        with lock:
+            totals["read"].extend(reads)
+            totals["write"].extend(writes)
+            totals["locked"] += locked
+            totals["errors"] += errors
+
+    workers = [threading.Thread(target=loop, args=(os.getpid() * 1000 + i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    engine.dispose()
+    results.put(totals)
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def benchmark(profile: str, options) -> None:
+    workdir = tempfile.mkdtemp(prefix="lextrace-db-")
+    url = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    seed(profile, url, options.versions, options.logs)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_worker, args=(profile, url, options.threads, options.seconds, options.write_ratio, results))
+        for _ in range(options.workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = [t for total in totals for t in total["read"]]
+    writes = [t for total in totals for t in total["write"]]
+    locked = sum(total["locked"] for total in totals)
+    errors = sum(total["errors"] for total in totals)
+    print(f"{profile:<8} reads {len(reads) / options.seconds:8.1f}/s "
+          f"(p50 {percentile(reads, 0.5) * 1000:6.1f}ms, p95 {percentile(reads, 0.95) * 1000:6.1f}ms)  "
+          f"writes {len(writes) / options.seconds:7.1f}/s "
+          f"(p50 {percentile(writes, 0.5) * 1000:6.1f}ms, p95 {percentile(writes, 0.95) * 1000:6.1f}ms)  "
+          f"locked {locked}  errors {errors}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2, help="进程数（对应 uvicorn --workers）")
+    parser.add_argument("--threads", type=int, default=8, help="每个进程的并发线程数")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="写操作占比")
+    parser.add_argument("--versions", type=int, default=50, help="每个合同预置的版本数")
+    parser.add_argument("--logs", type=int, default=200, help="每个合同预置的操作日志数")
+    parser.add_argument("--profile", choices=PROFILES, action="append", help="只运行指定配置（可重复）")
+    options = parser.parse_args()
+
+    print(f"{options.workers} worker(s) x {options.threads} thread(s), {options.seconds:.0f}s, "
+          f"write ratio {options.write_ratio:.0%}")
+    for profile in options.profile or PROFILES:
+        benchmark(profile, options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+从 zip 压缩包或目录导入一个合同的完整历史版本（与 POST /contracts/{id}/versions/import/stream 相同的流程）。
+
+条目逐个流式解压，日期识别与 HTML 渲染在进程池中分批进行，版本按日期排序后每 IMPORT_BATCH_SIZE 个
+一个事务写入。导入完成后重建条款索引与谱系；加 --summaries 时再批量生成条款演变总结。
+
+用法（在 backend 目录下运行）:
+    python tools/import_archive.py 12 /data/matters/acme-spa.zip
+    python tools/import_archive.py 12 /data/matters/acme-spa/ --summaries
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("contract_id", type=int)
+    parser.add_argument("source", help="zip 压缩包或包含 DOCX 的目录")
+    parser.add_argument("--summaries", action="store_true", help="导入后生成条款演变总结（调用 AI）")
+    args = parser.parse_args()
+
+    import models
+    from database import SessionLocal
+    from lib.archive_import import import_documents
+    from lib.clause_index import rebuild_clause_index_task
+    from lib.clause_lineage import rebuild_lineage_task
+    from lib.worker_pool import shutdown_pool
+
+    started = time.perf_counter()
+
+    def report(stage, done, total):
+        suffix = f"/{total}" if total is not None else ""
+        print(f"\r[{time.perf_counter() - started:7.1f}s] {stage:<8} {done}{suffix}", end="", flush=True)
+
+    db = SessionLocal()
+    try:
+        if db.get(models.Contract, args.contract_id) is None:
+            sys.exit(f"Contract {args.contract_id} not found")
+        result = import_documents(db, args.contract_id, args.source, progress=report)
+    finally:
+        db.close()
+        shutdown_pool()
+    print()
+
+    print(f"created {result['created']} versions"
+          + (f" (v{result['first_version']}-v{result['last_version']})" if result["created"] else ""))
+    for item in result["skipped"]:
+        print(f"  skipped {item['filename']}: {item['reason']}")
+    for item in result["errors"]:
+        print(f"  error   {item['filename']}: {item['error']}")
+
+    if result["created"]:
+        print("rebuilding clause index and lineage...")
+        rebuild_clause_index_task(args.contract_id)
+        rebuild_lineage_task(args.contract_id)
+        if args.summaries:
+            from lib.clause_summaries import generate_contract_clause_summaries
+            print("generating clause summaries...")
+            print(asyncio.run(generate_contract_clause_summaries(args.contract_id)))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+针对本地 stub 服务器验证 LLMClient 的超时、重试、舱壁与熔断行为。
+
+脚本会在后台启动 llm_stub_server（注入延迟与错误），然后依次检查：
+1. 上游正常时调用成功
+2. 上游持续返回 5xx 时重试耗尽，连续失败后熔断器打开，后续调用立即被拒绝
+3. 上游响应慢于截止时间时按时失败
+4. 熔断期间 analyze_clause_evolution 立即返回规则降级结果
+
+用法:
+    python tools/llm_resilience_check.py
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 在导入 lib.* 之前配置较小的阈值，使检查快速完成
+os.environ.setdefault("AI_TIMEOUT_SECONDS", "1")
+os.environ.setdefault("AI_MAX_RETRIES", "1")
+os.environ.setdefault("AI_RETRY_BACKOFF_SECONDS", "0.05")
+os.environ.setdefault("AI_BREAKER_FAILURE_THRESHOLD", "3")
+os.environ.setdefault("AI_BREAKER_RESET_SECONDS", "60")
+os.environ["AI_CACHE_ENABLED"] = "false"
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+import llm_stub_server  # noqa: E402
+from lib.llm_client import LLMClient, LLMUnavailableError  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": '[{"clause_id":"c1"}]'}]
+
+
+def start_stub(port: int, **overrides):
+    options = llm_stub_server.build_parser().parse_args(["--port", str(port)])
+    for key, value in overrides.items():
+        setattr(options, key, value)
+    server = llm_stub_server.serve(options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def expect_failure(client: LLMClient, expected=Exception) -> float:
+    started = time.perf_counter()
+    try:
+        await client.chat_json(MESSAGES, model="stub-model")
+    except expected:
+        return time.perf_counter() - started
+    raise AssertionError(f"expected {expected.__name__}")
+
+
+async def main():
+    healthy = start_stub(9201)
+    failing = start_stub(9202, error_rate=1.0, error_status=503)
+    slow = start_stub(9203, latency=3.0)
+
+    try:
+        client = LLMClient("http://127.0.0.1:9201/v1", "stub")
+        result = await client.chat_json(MESSAGES, model="stub-model")
+        assert "c1" in result["risk_assessments"], result
+        print("ok   healthy upstream:", client.metrics()["calls"])
+
+        client = LLMClient("http://127.0.0.1:9202/v1", "stub")
+        for _ in range(3):
+            await expect_failure(client)
+        assert client.breaker.snapshot()["state"] == "open", client.breaker.snapshot()
+        elapsed = await expect_failure(client, LLMUnavailableError)
+        assert elapsed < 0.05, elapsed
+        print(f"ok   circuit opened after errors, rejected in {elapsed * 1000:.1f} ms:", client.metrics()["calls"])
+
+        client = LLMClient("http://127.0.0.1:9203/v1", "stub")
+        elapsed = await expect_failure(client)
+        assert elapsed < 1.5, elapsed
+        print(f"ok   deadline enforced against slow upstream ({elapsed:.2f}s):", client.metrics()["calls"])
+
+        import lib.ai_engine as ai_engine
+        ai_engine.client = LLMClient("http://127.0.0.1:9202/v1", "stub")
+        ai_engine.client.breaker.record_failure()
+        ai_engine.client.breaker.record_failure()
+        ai_engine.client.breaker.record_failure()
+        started = time.perf_counter()
+        summary = await ai_engine.analyze_clause_evolution(
+            "c1", ["1.1 付款"], [{"versionNumber": 1, "content": "a", "changeFromPrev": None},
+                                 {"versionNumber": 2, "content": "b", "changeFromPrev": {"type": "modified"}}]
+        )
+        elapsed = time.perf_counter() - started
+        assert summary["oneLiner"], summary
+        print(f"ok   fallback summary served in {elapsed * 1000:.1f} ms while circuit is open")
+        print(ai_engine.get_ai_metrics())
+    finally:
+        for server in (healthy, failing, slow):
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,198 @@
+"""
+本地 OpenAI 兼容 stub 服务器，用于在离线环境下测试/压测 AI 分析链路。
+
+只依赖标准库。支持 POST /v1/chat/completions（含 stream=True 的 SSE 流式输出）。
+默认根据 prompt 内容生成合法的分析 JSON：
+- 变更分析 prompt：为出现的每个 clause_id 生成风险评估
+- 条款演变 prompt：返回 oneLiner / evolutionSummary / riskNotes
+- 批量条款演变 prompt：返回 {"clauses": {clause_id: {...}}}
+
+用法:
+    python tools/llm_stub_server.py --port 9100 --latency 0.5 --token-rate 200
+    python tools/llm_stub_server.py --error-rate 0.3 --latency-jitter 2   # 注入错误与延迟抖动
+    AI_BASE_URL=http://127.0.0.1:9100/v1 OPENROUTER_API_KEY=stub uvicorn main:app
+"""
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CLAUSE_ID_RE = re.compile(r'"clause_id"\s*:\s*"([^"]+)"')
+
+
+def build_content(prompt: str, canned: str = None) -> str:
+    """
+    生成模型回复内容（JSON 字符串）。指定 canned 时直接返回该内容。
+    """
+    if canned is not None:
+        return canned
+
+    clause_ids = CLAUSE_ID_RE.findall(prompt)
+
+    if '"clauses"' in prompt and "oneLiner" in prompt:
+        return json.dumps({
+            "clauses": {
+                clause_id: {
+                    "oneLiner": "条款经历了多次修改（stub）",
+                    "evolutionSummary": "该条款在多个版本中有所调整（stub 生成）。",
+                    "riskNotes": None
+                }
+                for clause_id in dict.fromkeys(clause_ids)
+            }
+        }, ensure_ascii=False)
+
+    if "oneLiner" in prompt:
+        return json.dumps({
+            "oneLiner": "条款经历了多次修改（stub）",
+            "evolutionSummary": "该条款在多个版本中有所调整（stub 生成）。",
+            "riskNotes": None
+        }, ensure_ascii=False)
+
+    return json.dumps({
+        "summary": f"本次修订共涉及 {len(clause_ids)} 处条款变更（stub 生成）。",
+        "risk_assessments": {
+            clause_id: {"risk": "low", "reason": "stub 评估"} for clause_id in dict.fromkeys(clause_ids)
+        }
+    }, ensure_ascii=False)
+
+
+def make_handler(options):
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            if options.verbose:
+                super().log_message(format, *args)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": options.model, "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+            content = build_content(prompt, options.canned)
+            model = body.get("model") or options.model
+
+            latency = options.latency + random.uniform(0, options.latency_jitter)
+            if latency > 0:
+                time.sleep(latency)
+
+            if options.error_rate > 0 and random.random() < options.error_rate:
+                self._send_json(options.error_status, {"error": {"message": "injected stub error", "type": "server_error"}})
+                return
+
+            if body.get("stream"):
+                self._stream(content, model)
+            else:
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(content) // 2,
+                              "total_tokens": (len(prompt) + len(content)) // 2}
+                })
+
+        def _stream(self, content: str, model: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            # 每个 chunk 约 options.chunk_chars 个字符，按 token_rate 控制输出速度
+            delay = options.chunk_chars / 2 / options.token_rate if options.token_rate > 0 else 0
+            for i in range(0, len(content), options.chunk_chars):
+                self._write_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + options.chunk_chars]}, "finish_reason": None}]
+                })
+                if delay:
+                    time.sleep(delay)
+
+            self._write_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _write_event(self, payload: dict):
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return StubHandler
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--model", default="stub-model")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before the first byte")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Extra random latency in [0, N) seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status used for injected errors")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Streamed tokens per second (0 = unlimited)")
+    parser.add_argument("--chunk-chars", type=int, default=8, help="Characters per streamed chunk")
+    parser.add_argument("--canned", default=None, help="Path to a file whose content is returned verbatim")
+    parser.add_argument("--verbose", action="store_true")
+    return parser
+
+
+def serve(options) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((options.host, options.port), make_handler(options))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    options = build_parser().parse_args()
+    if options.canned:
+        with open(options.canned, encoding="utf-8") as f:
+            options.canned = f.read()
+    server = serve(options)
+    print(f"LLM stub listening on http://{options.host}:{options.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+测量 SSE 流式分析接口的首字节时间（TTFB）、首个事件时间和总耗时。
+
+用法:
+    python tools/measure_sse.py http://127.0.0.1:8000/contracts/1/versions/2/diff/analysis/stream?refresh=true
+"""
+import sys
+import time
+import httpx
+
+
+def measure(url: str) -> dict:
+    started = time.perf_counter()
+    ttfb = None
+    first_event = None
+    events = {}
+
+    with httpx.stream("GET", url, timeout=None) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            now = time.perf_counter()
+            if ttfb is None:
+                ttfb = now - started
+            if line.startswith("event:"):
+                name = line[len("event:"):].strip()
+                events[name] = events.get(name, 0) + 1
+                if first_event is None:
+                    first_event = (name, now - started)
+
+    return {
+        "ttfb_ms": round((ttfb or 0) * 1000, 1),
+        "first_event": first_event[0] if first_event else None,
+        "first_event_ms": round(first_event[1] * 1000, 1) if first_event else None,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "events": events,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    for key, value in measure(sys.argv[1]).items():
+        print(f"{key}: {value}")
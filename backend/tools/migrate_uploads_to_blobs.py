@@ -0,0 +1,72 @@
+"""
+把旧版按文件名保存的上传文件（uploads/{contract_id}_v{n}_{filename}）迁移到内容寻址的 blob 存储。
+
+逐个版本：复制文件存入 blob 存储并登记引用计数，Version.file_path 改为 blob 引用，
+补齐 sha256 / original_filename，提交后删除旧文件。内容相同的文件只保存一份。
+可重复运行：已经是 blob 引用的版本会跳过。
+
+用法（在 backend 目录下运行）:
+    python tools/migrate_uploads_to_blobs.py [--dry-run] [--keep-files]
+"""
+import os
+import re
+import sys
+import shutil
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要迁移的版本")
+    parser.add_argument("--keep-files", action="store_true", help="迁移后保留旧文件")
+    args = parser.parse_args()
+
+    import models
+    from database import SessionLocal
+    from lib.blob_refs import place_blob, store_blob
+    from lib.blob_store import blob_sha256
+
+    db = SessionLocal()
+    migrated = missing = 0
+    try:
+        versions = db.query(models.Version.id).order_by(models.Version.id).all()
+        for (version_id,) in versions:
+            version = db.get(models.Version, version_id)
+            legacy_path = version.file_path
+            if not legacy_path or blob_sha256(legacy_path):
+                continue
+            if not os.path.exists(legacy_path):
+                print(f"v{version.version_number} (version {version.id}): file missing: {legacy_path}")
+                missing += 1
+                continue
+            if args.dry_run:
+                print(f"v{version.version_number} (version {version.id}): {legacy_path}")
+                migrated += 1
+                continue
+
+            # place_blob 会移走源文件，先复制一份，提交成功后再放入存储并删除旧文件
+            temp_path = f"{legacy_path}.migrating"
+            shutil.copyfile(legacy_path, temp_path)
+            version.file_path = store_blob(db, temp_path, version.sha256)
+            version.sha256 = blob_sha256(version.file_path)
+            if not version.original_filename:
+                match = re.match(r"^\d+_v\d+_(.+)$", os.path.basename(legacy_path))
+                version.original_filename = match.group(1) if match else os.path.basename(legacy_path)
+            db.commit()
+            place_blob(temp_path, blob_sha256(version.file_path))
+            db.expunge(version)
+
+            if not args.keep_files:
+                os.remove(legacy_path)
+            migrated += 1
+    finally:
+        db.close()
+
+    action = "would migrate" if args.dry_run else "migrated"
+    print(f"{action} {migrated} versions, {missing} missing files")
+
+
+if __name__ == "__main__":
+    main()
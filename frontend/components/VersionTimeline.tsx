@@ -43,6 +43,14 @@ const getVersionColor = (num: number) => {
     return colors[(num - 1) % colors.length]
 }
 
+// Uploaded file name; file_path is a content-addressed "blob:<sha256>" reference for new versions,
+// so only legacy rows without original_filename fall back to the stored path's basename
+const versionFileName = (version: Version) => {
+    if (version.original_filename) return version.original_filename
+    if (version.file_path && !version.file_path.startsWith('blob:')) return version.file_path.split('/').pop()
+    return 'Unknown File'
+}
+
 interface VersionTimelineProps {
     versions: Version[]
     contractId: number
@@ -128,7 +136,7 @@ export function VersionTimeline({ versions, contractId, onDelete }: VersionTimel
                                         <p className="text-sm font-medium">{version.commit_message}</p>
                                         <div className="mt-2 flex items-center text-xs text-muted-foreground">
                                             <FileText className="mr-1 h-3 w-3" />
-                                            {version.file_path ? version.file_path.split('/').pop() : 'Unknown File'}
+                                            {versionFileName(version)}
                                         </div>
                                     </CardContent>
                                 </Card >
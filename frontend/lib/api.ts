@@ -29,11 +29,25 @@ function getApiBaseUrl(): string {
 
 const API_BASE_URL = getApiBaseUrl();
 
+// 列表接口按游标分页：下一页游标在 X-Next-Cursor 响应头中，依次请求直到没有该响应头
+async function fetchAllPages<T>(url: string, errorMessage: string): Promise<T[]> {
+    const items: T[] = []
+    let cursor: string | null = null
+    do {
+        const pageUrl: string = cursor
+            ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`
+            : url
+        const res = await fetch(pageUrl)
+        if (!res.ok) throw new Error(errorMessage)
+        items.push(...(await res.json()))
+        cursor = res.headers.get('X-Next-Cursor')
+    } while (cursor)
+    return items
+}
+
 // Projects
 export async function getProjects(): Promise<Project[]> {
-    const res = await fetch(`${API_BASE_URL}/projects/`)
-    if (!res.ok) throw new Error('Failed to fetch projects')
-    return res.json()
+    return fetchAllPages<Project>(`${API_BASE_URL}/projects/`, 'Failed to fetch projects')
 }
 
 export async function createProject(name: string, description?: string): Promise<Project> {
@@ -54,9 +68,7 @@ export async function getProject(id: number): Promise<Project> {
 
 // Contracts
 export async function getContracts(projectId: number): Promise<Contract[]> {
-    const res = await fetch(`${API_BASE_URL}/contracts/?project_id=${projectId}`)
-    if (!res.ok) throw new Error('Failed to fetch contracts')
-    return res.json()
+    return fetchAllPages<Contract>(`${API_BASE_URL}/contracts/?project_id=${projectId}`, 'Failed to fetch contracts')
 }
 
 export async function createContract(projectId: number, name: string): Promise<Contract> {
@@ -76,9 +88,7 @@ export async function getContract(id: number) {
 }
 
 export async function getVersions(contractId: number) {
-    const res = await fetch(`${API_BASE_URL}/contracts/${contractId}/versions/`);
-    if (!res.ok) throw new Error('Failed to fetch versions');
-    return res.json();
+    return fetchAllPages<Version>(`${API_BASE_URL}/contracts/${contractId}/versions/`, 'Failed to fetch versions');
 }
 
 export async function getVersion(contractId: number, versionId: number) {
@@ -136,6 +146,7 @@ export async function deleteVersion(contractId: number, versionId: number) {
     return;
 }
 
+// 只取最近的一页（默认 100 条）
 export async function getContractLogs(contractId: number) {
     const res = await fetch(`${API_BASE_URL}/contracts/${contractId}/logs`);
     if (!res.ok) throw new Error('Failed to fetch logs');
@@ -168,9 +179,7 @@ export async function commitBatchVersions(contractId: number, files: any[]) {
 
 // Comments
 export async function getComments(contractId: number, versionId: number) {
-    const res = await fetch(`${API_BASE_URL}/contracts/${contractId}/versions/${versionId}/comments/`);
-    if (!res.ok) throw new Error('Failed to fetch comments');
-    return res.json();
+    return fetchAllPages(`${API_BASE_URL}/contracts/${contractId}/versions/${versionId}/comments/`, 'Failed to fetch comments');
 }
 
 export async function createComment(contractId: number, versionId: number, elementId: string, content: string, quote?: string) {
@@ -20,6 +20,8 @@ export interface Version {
     commit_message: string;
     created_at: string;
     file_path: string;
+    original_filename?: string | null;
+    sha256?: string | null;
     html_content?: string;
 }
 
@@ -23,6 +23,7 @@ CREATE TABLE IF NOT EXISTS contracts (
 
 CREATE INDEX IF NOT EXISTS idx_contracts_name ON contracts(name);
 CREATE INDEX IF NOT EXISTS idx_contracts_project_id ON contracts(project_id);
+CREATE INDEX IF NOT EXISTS ix_contracts_project_id ON contracts(project_id, id);
 
 -- 创建 versions 表
 CREATE TABLE IF NOT EXISTS versions (
@@ -30,12 +31,16 @@ CREATE TABLE IF NOT EXISTS versions (
     contract_id INTEGER REFERENCES contracts(id) ON DELETE CASCADE,
     version_number INTEGER NOT NULL,
     file_path VARCHAR(500),
+    original_filename VARCHAR(500),
+    sha256 VARCHAR(64),
     commit_message TEXT,
     html_content TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE INDEX IF NOT EXISTS idx_versions_contract_id ON versions(contract_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_versions_contract_number ON versions(contract_id, version_number);
+CREATE INDEX IF NOT EXISTS ix_versions_sha256 ON versions(sha256);
 
 -- 创建 diffs 表
 CREATE TABLE IF NOT EXISTS diffs (
@@ -47,6 +52,8 @@ CREATE TABLE IF NOT EXISTS diffs (
 );
 
 CREATE INDEX IF NOT EXISTS idx_diffs_version_id ON diffs(version_id);
+CREATE INDEX IF NOT EXISTS ix_diffs_version_pair ON diffs(version_id, previous_version_id);
+CREATE INDEX IF NOT EXISTS ix_diffs_previous_version ON diffs(previous_version_id);
 
 -- 创建 operation_logs 表
 CREATE TABLE IF NOT EXISTS operation_logs (
@@ -58,6 +65,9 @@ CREATE TABLE IF NOT EXISTS operation_logs (
 );
 
 CREATE INDEX IF NOT EXISTS idx_operation_logs_contract_id ON operation_logs(contract_id);
+DROP INDEX IF EXISTS ix_operation_logs_contract_created;
+CREATE INDEX IF NOT EXISTS ix_operation_logs_contract_created_id ON operation_logs(contract_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_operation_logs_contract_action_created_id ON operation_logs(contract_id, action, created_at, id);
 
 -- 创建 comments 表
 CREATE TABLE IF NOT EXISTS comments (
@@ -72,6 +82,34 @@ CREATE TABLE IF NOT EXISTS comments (
 
 CREATE INDEX IF NOT EXISTS idx_comments_contract_id ON comments(contract_id);
 CREATE INDEX IF NOT EXISTS idx_comments_version_id ON comments(version_id);
+DROP INDEX IF EXISTS ix_comments_contract_version_created;
+CREATE INDEX IF NOT EXISTS ix_comments_contract_version_created_id ON comments(contract_id, version_id, created_at, id);
+
+-- ============================================
+-- 条款相关表由应用启动时按 models.py 创建（外键带 ON DELETE CASCADE）；
+-- 早期创建的表外键没有级联，这里重建约束（可重复执行）
+-- ============================================
+ALTER TABLE IF EXISTS clause_summaries
+    DROP CONSTRAINT IF EXISTS clause_summaries_contract_id_fkey,
+    ADD CONSTRAINT clause_summaries_contract_id_fkey FOREIGN KEY (contract_id) REFERENCES contracts(id) ON DELETE CASCADE;
+ALTER TABLE IF EXISTS clause_index
+    DROP CONSTRAINT IF EXISTS clause_index_contract_id_fkey,
+    ADD CONSTRAINT clause_index_contract_id_fkey FOREIGN KEY (contract_id) REFERENCES contracts(id) ON DELETE CASCADE;
+ALTER TABLE IF EXISTS clause_index_state
+    DROP CONSTRAINT IF EXISTS clause_index_state_contract_id_fkey,
+    ADD CONSTRAINT clause_index_state_contract_id_fkey FOREIGN KEY (contract_id) REFERENCES contracts(id) ON DELETE CASCADE;
+ALTER TABLE IF EXISTS clause_lineage
+    DROP CONSTRAINT IF EXISTS clause_lineage_contract_id_fkey,
+    ADD CONSTRAINT clause_lineage_contract_id_fkey FOREIGN KEY (contract_id) REFERENCES contracts(id) ON DELETE CASCADE;
+ALTER TABLE IF EXISTS clause_lineage
+    DROP CONSTRAINT IF EXISTS clause_lineage_version_id_fkey,
+    ADD CONSTRAINT clause_lineage_version_id_fkey FOREIGN KEY (version_id) REFERENCES versions(id) ON DELETE CASCADE;
+ALTER TABLE IF EXISTS clause_lineage_state
+    DROP CONSTRAINT IF EXISTS clause_lineage_state_version_id_fkey,
+    ADD CONSTRAINT clause_lineage_state_version_id_fkey FOREIGN KEY (version_id) REFERENCES versions(id) ON DELETE CASCADE;
+ALTER TABLE IF EXISTS clause_lineage_state
+    DROP CONSTRAINT IF EXISTS clause_lineage_state_contract_id_fkey,
+    ADD CONSTRAINT clause_lineage_state_contract_id_fkey FOREIGN KEY (contract_id) REFERENCES contracts(id) ON DELETE CASCADE;
 
 -- ============================================
 -- 验证表创建
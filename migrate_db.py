@@ -1,17 +1,135 @@
+import re
 import sqlite3
 
+# (table, column, type) added after the table was first created
+COLUMNS = [
+    ("versions", "html_content", "TEXT"),
+    ("versions", "sha256", "VARCHAR(64)"),
+    ("versions", "original_filename", "VARCHAR"),
+    ("clause_lineage", "indent", "INTEGER DEFAULT 0"),
+]
+
+# (name, table, columns, unique) added after the table was first created
+INDEXES = [
+    ("ix_contracts_project_id", "contracts", "project_id, id", False),
+    ("ix_versions_contract_number", "versions", "contract_id, version_number", True),
+    ("ix_versions_sha256", "versions", "sha256", False),
+    ("ix_diffs_version_pair", "diffs", "version_id, previous_version_id", False),
+    ("ix_diffs_previous_version", "diffs", "previous_version_id", False),
+    ("ix_operation_logs_contract_created_id", "operation_logs", "contract_id, created_at, id", False),
+    ("ix_operation_logs_contract_action_created_id", "operation_logs", "contract_id, action, created_at, id", False),
+    ("ix_comments_contract_version_created_id", "comments", "contract_id, version_id, created_at, id", False),
+    ("ix_comments_version", "comments", "version_id", False),
+]
+
+# (table, column, referenced table, ON DELETE action) for foreign keys that now cascade in the database
+FOREIGN_KEYS = [
+    ("contracts", "project_id", "projects", "CASCADE"),
+    ("versions", "contract_id", "contracts", "CASCADE"),
+    ("diffs", "version_id", "versions", "CASCADE"),
+    ("diffs", "previous_version_id", "versions", "SET NULL"),
+    ("operation_logs", "contract_id", "contracts", "CASCADE"),
+    ("comments", "contract_id", "contracts", "CASCADE"),
+    ("comments", "version_id", "versions", "CASCADE"),
+    ("clause_summaries", "contract_id", "contracts", "CASCADE"),
+    ("clause_index", "contract_id", "contracts", "CASCADE"),
+    ("clause_index_state", "contract_id", "contracts", "CASCADE"),
+    ("clause_lineage", "contract_id", "contracts", "CASCADE"),
+    ("clause_lineage", "version_id", "versions", "CASCADE"),
+    ("clause_lineage_state", "version_id", "versions", "CASCADE"),
+    ("clause_lineage_state", "contract_id", "contracts", "CASCADE"),
+]
+
+# Indexes superseded by a wider one above (keyset pagination also orders by id)
+DROPPED_INDEXES = [
+    "ix_contracts_project",
+    "ix_operation_logs_contract_created",
+    "ix_comments_contract_version_created",
+]
+
+def rebuild_foreign_keys(conn):
+    """
+    SQLite cannot ALTER an existing foreign key, so tables whose keys lack the ON DELETE action are
+    rebuilt from their own CREATE statement (https://www.sqlite.org/lang_altertable.html#otheralter).
+    """
+    cursor = conn.cursor()
+    outdated = {}
+    for table, column, parent, action in FOREIGN_KEYS:
+        # foreign_key_list rows: (id, seq, table, from, to, on_update, on_delete, match)
+        keys = cursor.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+        if any(key[3] == column and key[6] != action for key in keys):
+            outdated.setdefault(table, []).append((column, parent, action))
+    if not outdated:
+        print("Foreign keys already cascade.")
+        return
+
+    conn.commit()
+    cursor.execute("PRAGMA foreign_keys=OFF")
+    try:
+        cursor.execute("BEGIN")
+        for table, keys in outdated.items():
+            sql = cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+            for column, parent, action in keys:
+                pattern = (rf'(FOREIGN KEY\s*\(\s*"?{column}"?\s*\)\s*REFERENCES\s+"?{parent}"?\s*\(\s*"?id"?\s*\))'
+                           r'(\s+ON DELETE\s+(?:SET NULL|SET DEFAULT|NO ACTION|RESTRICT|CASCADE))?')
+                sql, count = re.subn(pattern, rf"\1 ON DELETE {action}", sql)
+                if count != 1:
+                    raise RuntimeError(f"unexpected definition of {table}.{column}")
+            indexes = [row[0] for row in cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+            )]
+            cursor.execute(re.sub(rf'^CREATE TABLE\s+"?{table}"?', f'CREATE TABLE "_new_{table}"', sql, count=1))
+            cursor.execute(f'INSERT INTO "_new_{table}" SELECT * FROM "{table}"')
+            cursor.execute(f'DROP TABLE "{table}"')
+            cursor.execute(f'ALTER TABLE "_new_{table}" RENAME TO "{table}"')
+            for index_sql in indexes:
+                cursor.execute(index_sql)
+            print(f"Rebuilt {table} with ON DELETE {', '.join(sorted({k[2] for k in keys}))} foreign keys.")
+        orphans = cursor.execute("PRAGMA foreign_key_check").fetchall()
+        if orphans:
+            # Rows left behind by earlier deletes; they are harmless but never cascade
+            print(f"Warning: {len(orphans)} row(s) reference missing parents (PRAGMA foreign_key_check).")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Could not rebuild foreign keys: {e}")
+    finally:
+        cursor.execute("PRAGMA foreign_keys=ON")
+
 def migrate():
     conn = sqlite3.connect('lextrace.db')
     cursor = conn.cursor()
     
-    try:
-        cursor.execute("ALTER TABLE versions ADD COLUMN html_content TEXT")
-        print("Successfully added html_content column to versions table.")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e):
-            print("Column html_content already exists.")
-        else:
-            print(f"Error: {e}")
+    for table, column, column_type in COLUMNS:
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            print(f"Successfully added {column} column to {table} table.")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print(f"Column {column} already exists.")
+            elif "no such table" in str(e):
+                print(f"Table {table} does not exist yet; it will be created on startup.")
+            else:
+                print(f"Error: {e}")
+
+    rebuild_foreign_keys(conn)
+
+    for name in DROPPED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    for name, table, columns, unique in INDEXES:
+        try:
+            cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            print(f"Index {name} is in place.")
+        except sqlite3.IntegrityError as e:
+            # e.g. duplicate version numbers left by concurrent uploads; fix the rows and re-run
+            print(f"Could not create unique index {name}: {e}")
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                print(f"Table {table} does not exist yet; it will be created on startup.")
+            else:
+                print(f"Error: {e}")
+    cursor.execute("ANALYZE")
             
     conn.commit()
     conn.close()